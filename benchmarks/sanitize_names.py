@@ -0,0 +1,44 @@
+"""Sanitize a large set of generated file names and report the throughput.
+
+    PYTHONPATH=lib python benchmarks/sanitize_names.py [-n COUNT]
+"""
+import argparse
+import random
+import time
+
+from krautcat.audio.fs import FilesystemGeneric, FilesystemWindows
+
+
+def _names(count, seed=0):
+    rng = random.Random(seed)
+    ascii_names = ("01. Song Title", "Artist — 1999 — Album", "Track 12 (Live)")
+    unicode_names = ("Ünïcödé Sòng", "Жизнь за царя", "交響曲第9番", "AC/DC: Live?")
+    names = list()
+    for _ in range(count):
+        # Most library names are short and need no escaping at all.
+        pool = ascii_names if rng.random() < 0.8 else unicode_names
+        name = rng.choice(pool)
+        if rng.random() < 0.05:
+            name = name * 30
+        names.append(name)
+    return names
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-n", "--count", type=int, default=1_000_000,
+                           help="names to sanitize per filesystem")
+    args = argparser.parse_args()
+
+    names = _names(args.count)
+    for fs in (FilesystemGeneric, FilesystemWindows):
+        start = time.perf_counter()
+        for name in names:
+            fs.sanitize_filename(name, suffix=".flac")
+        elapsed = time.perf_counter() - start
+        print(f"{fs.__name__}: {args.count} names in {elapsed:.2f} s, "
+              f"{args.count / elapsed:,.0f} names/s")
+
+
+if __name__ == "__main__":
+    main()
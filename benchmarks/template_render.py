@@ -0,0 +1,46 @@
+"""Render the default dirnamer templates many times and report the timings.
+
+    PYTHONPATH=lib python benchmarks/template_render.py [-n COUNT]
+"""
+import argparse
+import time
+
+from krautcat.audio.library.fs.template import FIELDS, Template
+from krautcat.audio.metadata import Metadata
+from krautcat.audio.metadata.types import Date
+
+
+TEMPLATES = {
+    "dirname": "{artist} — {year} — {album}",
+    "filename": "[{disc_number}. ]{track_number:0>02}. {track_name}",
+}
+
+
+def _timed(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return time.perf_counter() - start
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("-n", "--count", type=int, default=1_000_000,
+                           help="renders per template")
+    args = argparser.parse_args()
+
+    metadata = Metadata(artist="Artist", album="Album", date=Date("1999-01-02"),
+                        track_number=7, track_name="Song", disc_number=None)
+
+    for name, source in TEMPLATES.items():
+        template = Template(source, FIELDS)
+        values = template.values(metadata)
+
+        full = _timed(lambda: template.render_metadata(metadata), args.count)
+        render = _timed(lambda: template.render(values), args.count)
+        print(f"{name}: {args.count} renders, render_metadata {full:.2f} s, "
+              f"render {render:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import zlib
+
+import numpy
+
+
+class CRC32Checksum:
+    def __init__(self) -> None:
+        self._value = 0
+
+    def update(self, samples: numpy.ndarray) -> None:
+        self._value = zlib.crc32(numpy.ascontiguousarray(samples), self._value)
+
+    @property
+    def value(self) -> int:
+        return self._value & 0xFFFFFFFF
+
+
+class AccurateRipChecksum:
+    SAMPLES_PER_SECTOR = 588
+    SKIPPED_SECTORS = 5
+
+    def __init__(self, *, first: bool = False, last: bool = False) -> None:
+        self._first = first
+        self._last = last
+
+        self._skip_head = self.SKIPPED_SECTORS * self.SAMPLES_PER_SECTOR - 1 if first else 0
+        self._skip_tail = self.SKIPPED_SECTORS * self.SAMPLES_PER_SECTOR if last else 0
+
+        self._position = 0
+        self._v1 = 0
+        self._v2 = 0
+
+        self._tail = numpy.empty(0, dtype=numpy.uint32)
+
+    def update(self, samples: numpy.ndarray) -> None:
+        lo, hi = self._sums(samples, self._position)
+        self._v1 = (self._v1 + lo) & 0xFFFFFFFF
+        self._v2 = (self._v2 + lo + hi) & 0xFFFFFFFF
+
+        self._position += len(samples)
+
+        if self._skip_tail > 0:
+            if len(samples) >= self._skip_tail:
+                self._tail = samples[-self._skip_tail:].copy()
+            else:
+                self._tail = numpy.concatenate((self._tail, samples))[-self._skip_tail:]
+
+    def _sums(self, samples: numpy.ndarray, position: int):
+        begin = max(self._skip_head - position, 0)
+        if begin >= len(samples):
+            return 0, 0
+
+        words = samples[begin:].astype(numpy.uint64)
+        words *= numpy.arange(position + begin + 1, position + len(samples) + 1, dtype=numpy.uint64)
+
+        lo = int(numpy.sum(words & 0xFFFFFFFF, dtype=numpy.uint64))
+        hi = int(numpy.sum(words >> 32, dtype=numpy.uint64))
+        return lo & 0xFFFFFFFF, hi & 0xFFFFFFFF
+
+    def _finalized(self):
+        if len(self._tail) == 0:
+            return self._v1, self._v2
+
+        lo, hi = self._sums(self._tail, self._position - len(self._tail))
+        return (self._v1 - lo) & 0xFFFFFFFF, (self._v2 - lo - hi) & 0xFFFFFFFF
+
+    @property
+    def v1(self) -> int:
+        return self._finalized()[0]
+
+    @property
+    def v2(self) -> int:
+        return self._finalized()[1]
+
+
+class TrackChecksum:
+    def __init__(self, *, first: bool = False, last: bool = False) -> None:
+        self.samples = 0
+
+        self._crc32 = CRC32Checksum()
+        self._accuraterip = AccurateRipChecksum(first=first, last=last)
+
+    def update(self, samples: numpy.ndarray) -> None:
+        self.samples += len(samples)
+
+        self._crc32.update(samples)
+        self._accuraterip.update(samples)
+
+    @property
+    def crc32(self) -> int:
+        return self._crc32.value
+
+    @property
+    def accuraterip_v1(self) -> int:
+        return self._accuraterip.v1
+
+    @property
+    def accuraterip_v2(self) -> int:
+        return self._accuraterip.v2
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TrackChecksum):
+            return NotImplemented
+
+        return (self.samples == other.samples
+                and self.crc32 == other.crc32
+                and self.accuraterip_v1 == other.accuraterip_v1
+                and self.accuraterip_v2 == other.accuraterip_v2)
+
+    def __str__(self) -> str:
+        return (f"CRC32 {self.crc32:08X}, AccurateRip v1 {self.accuraterip_v1:08X}, "
+                f"v2 {self.accuraterip_v2:08X} ({self.samples} samples)")
@@ -1,24 +1,18 @@
 import argparse
 import asyncio
-import concurrent.futures
+import json
 import os
 import pathlib
 import sys
 
-import asyncio_glib
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GObject, GLib
-Gst.init(None)
-
 from krautcat.audio.file.audio import open_audio_file, AudioFileMP3, AudioFileFLAC
+from krautcat.audio.file.audio.cue import AudioFileCueTrack, open_cuesheet_tracks
 from krautcat.audio.file.audio.mp3 import MP3Encoder
 from krautcat.audio.fs import FilesystemGeneric
-from krautcat.gstreamer import (ElementAudioConvert, ElementAudioParse, ElementAudioResample,
+from krautcat.gstreamer import (ElementAudioConvert, ElementAudioResample,
                                 ElementFileSink, ElementFileSource,
-                                ElementFLACDecoder, ElementFLACParser,
-                                ElementPipeline,
-                                ElementMP3Encoder)
+                                ElementMP3Encoder,
+                                PipelineError, PipelineTemplate)
                                       
 
 class TagStatistics:
@@ -78,6 +72,8 @@ class TagStatistics:
 class Converter:
     def __init__(self, cli_args):
         self._source_directory = cli_args.source_directory
+        self._profile_pipeline = cli_args.profile_pipeline
+        self._profile_dot_dir = cli_args.profile_dot_dir
       
         self._output_basedir = pathlib.Path("/tmp")
         self._output_dirname_format = "{artist} — {date} — {album}"
@@ -87,10 +83,20 @@ class Converter:
         audio_files = []
         stats = TagStatistics()
 
+        images = set()
+        for entry in sorted(self._source_directory.glob("*.cue")):
+            for track in open_cuesheet_tracks(entry):
+                images.add(track.path)
+                stats.update(track.metadata)
+                audio_files.append(track)
+
         for entry in self._source_directory.iterdir():
             if not entry.is_file() or entry.stat().st_size == 0:
                 continue
 
+            if entry.suffix == ".cue" or entry in images:
+                continue
+
             file = open_audio_file(entry)
             
             if file is None:
@@ -106,58 +112,75 @@ class Converter:
             album = stats.album
         )
 
-        await self._convert_files(audio_files, output_dir)
+        return await self._convert_files(audio_files, output_dir)
 
     async def _convert_files(self, files, output_dir):
         output_dir.mkdir(parents=True, exist_ok=True)
-       
-        total_tracks = len(files) 
-
-        tasks = list()             
-        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() * 2) as pool:
-            for file in files:
-                tasks.append(asyncio.get_event_loop().run_in_executor(pool,
-                                                                      self._convert_file,
-                                                                      file,
-                                                                      output_dir,
-                                                                      total_tracks))
-        await asyncio.wait(tasks)
-        return None
-            
 
-    def _convert_file(self, file, output_dir, total_tracks):
-        output_filename = output_dir / self._output_filename_format.format(
-            track=file.metadata.track_number,
-            name=FilesystemGeneric.escape_filename(str(file.metadata.track_name)),
-            extension=AudioFileMP3.EXTENSION
-        )
-        
-        pipeline = ElementPipeline()
+        total_tracks = len(files)
+        semaphore = asyncio.Semaphore(os.cpu_count() * 2)
 
-        source_file = ElementFileSource(file.path)
-        source_parser = file.gst_parser()
-        source_decoder = file.gst_decoder()
-       
-        audioconvert = ElementAudioConvert()
-        audioresample = ElementAudioResample(10)
+        async def _convert(file):
+            async with semaphore:
+                await self._convert_file(file, output_dir, total_tracks)
 
-        mp3_stream = ElementMP3Encoder(ElementMP3Encoder.Bitrate.CBR, bitrate=320)        
+        results = await asyncio.gather(*[_convert(file) for file in files],
+                                       return_exceptions=True)
 
-        sink_file = ElementFileSink(output_filename) 
+        status = 0
+        for file, result in zip(files, results):
+            if isinstance(result, Exception):
+                print(f"Failed to convert '{file.path}': {result}", file=sys.stderr)
+                status = 1
 
-        pipeline = pipeline << source_file << source_parser << source_decoder
-        pipeline = pipeline << audioconvert << audioresample << mp3_stream << sink_file
+        return status
 
-        audioconvert = source_file | source_parser | source_decoder | audioconvert 
-        sink_file = audioconvert | audioresample | mp3_stream | sink_file
-      
-        pipeline.state = Gst.State.PLAYING
+    async def _convert_file(self, file, output_dir, total_tracks):
+        from krautcat.gstreamer import Gst
 
-        pipeline.bus.timed_pop_filtered(
-            Gst.CLOCK_TIME_NONE,
-            Gst.MessageType.ERROR | Gst.MessageType.EOS
+        output_filename = output_dir / self._output_filename_format.format(
+            track=file.metadata.track_number,
+            name=FilesystemGeneric.escape_filename(str(file.metadata.track_name)),
+            extension=AudioFileMP3.EXTENSION
         )
-        pipeline.state = Gst.State.NULL
+        
+        template = PipelineTemplate.compile(
+            ("source", ElementFileSource),
+            ("parser", file.gst_parser),
+            ("decoder", file.gst_decoder),
+            ("convert", ElementAudioConvert),
+            ("resample", ElementAudioResample, {"quality": 10}),
+            ("encoder", ElementMP3Encoder, {"bitrate_type": ElementMP3Encoder.Bitrate.CBR,
+                                            "bitrate": 320}),
+            ("sink", ElementFileSink),
+        )
+        pipeline = template.instantiate(source={"location": file.path},
+                                        sink={"location": output_filename})
+
+        profiler = None
+        if self._profile_pipeline or self._profile_dot_dir is not None:
+            profiler = pipeline.attach_profiler()
+
+        try:
+            if isinstance(file, AudioFileCueTrack):
+                await pipeline.set_state(Gst.State.PAUSED)
+                pipeline.seek(file.begin, file.end)
+
+            await pipeline.set_state(Gst.State.PLAYING)
+            await pipeline.wait_eos()
+        except PipelineError:
+            if output_filename.exists():
+                output_filename.unlink()
+            raise
+        finally:
+            pipeline.close()
+
+        if profiler is not None:
+            if self._profile_pipeline:
+                print(json.dumps({"file": str(output_filename), **profiler.report()}),
+                      file=sys.stderr)
+            if self._profile_dot_dir is not None:
+                profiler.dump_dot(self._profile_dot_dir / f"{output_filename.stem}.dot")
 
         mp3_file = AudioFileMP3(output_filename)
         
@@ -174,6 +197,11 @@ class Argparser:
 
         argparser.add_argument("source_directory", action="store",
                                type=pathlib.Path, help="Path to directory with album")
+        argparser.add_argument("--profile-pipeline", action="store_true",
+                               help="Print per-element pipeline profile as JSON to stderr")
+        argparser.add_argument("--profile-dot-dir", action="store",
+                               type=pathlib.Path, default=None,
+                               help="Directory to dump pipeline graphs in DOT format to")
 
     def parse(self, args):
         return self._argparser.parse_args(args)
@@ -184,8 +212,14 @@ def main():
 
     cli_args = argparser.parse(sys.argv[1:])
 
+    import asyncio_glib
+
+    from krautcat.gstreamer import GObject
+
     GObject.threads_init()
     asyncio.set_event_loop_policy(asyncio_glib.GLibEventLoopPolicy())
     
     command = Converter(cli_args)
     status = asyncio.get_event_loop().run_until_complete(command())
+
+    return status
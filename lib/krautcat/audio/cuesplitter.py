@@ -1,99 +1,231 @@
-
 import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
 import pathlib
-import re
 import sys
 
-import mutagen
-import mutagen.flac
-import mutagen._vorbis
+from typing import Iterator, List, Optional
 
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GObject, GLib
-Gst.init(None)
+import numpy
 
+from krautcat.audio.checksum import TrackChecksum
+from krautcat.audio.file.audio.cue import AudioFileCueTrack, open_cuesheet_tracks
 from krautcat.audio.file.audio.flac import AudioFileFLAC
-from krautcat.audio.file.cuesheet import (ElementTrack as CuesheetElementTrack,
-                                          ElementRoot as CuesheetElementRoot,
-                                          Parser as CuesheetParser)
-from krautcat.audio.metadata.flac import Metadata as MetadataFLAC
-from krautcat.gstreamer import (ElementFileSink, ElementFileSource,
+from krautcat.audio.file.cuesheet import Parser as CuesheetParser
+from krautcat.audio.fs import FilesystemGeneric
+from krautcat.gstreamer import (ElementAppSink, ElementAudioConvert,
+                                ElementFileSink, ElementFileSource,
                                 ElementFLACDecoder, ElementFLACEncoder, ElementFLACParser,
-                                ElementPipeline)
+                                PipelineError, PipelineTemplate, SampleFormat)
 
 
 class _OutputFile:
-    def __init__(self, cuesheet_track: CuesheetElementTrack) -> None:
-        self.file_begin = cuesheet_track.begin
-        self.file_end = cuesheet_track.end
-
-        self.metadata = MetadataFLAC(
-            artist=cuesheet_track.track_artist,
-            track_name=cuesheet_track.track_name,
-            album=cuesheet_track.cue_root.album_artist,
-            date=cuesheet_track.cue_root.album_date,
-            track_number=cuesheet_track.track_number,
+    def __init__(self, cuesheet_track: AudioFileCueTrack) -> None:
+        self.track = cuesheet_track
+        self.metadata = cuesheet_track.metadata
+
+        track_name = FilesystemGeneric.escape_filename(str(self.metadata.track_name))
+        self.path = self.track.path.parent / f"{self.metadata.track_number:02}. {track_name}.{AudioFileFLAC.EXTENSION}"
+
+
+class _PCMReader:
+    BLOCK_SAMPLES = 1 << 18
+
+    def __init__(self, path: pathlib.Path, parser=ElementFLACParser,
+                 decoder=ElementFLACDecoder) -> None:
+        self.path = path
+        self.rate: Optional[int] = None
+
+        self._parser = parser
+        self._decoder = decoder
+
+    def __iter__(self) -> Iterator[numpy.ndarray]:
+        from krautcat.gstreamer import Gst
+
+        template = PipelineTemplate.compile(
+            ("source", ElementFileSource),
+            ("parser", self._parser),
+            ("decoder", self._decoder),
+            ("convert", ElementAudioConvert),
+            ("sink", ElementAppSink, {"sample_format": SampleFormat.S16LE, "channels": 2}),
         )
+        pipeline = template.instantiate(source={"location": self.path})
+        sink = pipeline["sink"]
+
+        pipeline.state = Gst.State.PLAYING
 
-        self.path = self.file_begin.file.path.parent / f"{cuesheet_track.track_number:02}. {cuesheet_track.track_name}.{AudioFileFLAC.EXTENSION}"
+        try:
+            for block in sink.blocks(self.BLOCK_SAMPLES):
+                self.rate = sink.rate
+                yield block.view("<u4").reshape(-1)
 
+            pipeline.check_errors()
+        finally:
+            pipeline.state = Gst.State.NULL
 
-def main():
-    cue_file_path = pathlib.Path(sys.argv[1]).resolve()
-    flac_file_path = cue_file_path.parent
-    cuesheet_info = CuesheetParser(cue_file_path).parse()
 
-    _output_tracks = list()
-    for track in cuesheet_info.tracks:
-        _output_tracks.append(_OutputFile(track))
+def _image_checksums(tracks: List[AudioFileCueTrack]) -> List[TrackChecksum]:
+    image = tracks[0].image
+    reader = _PCMReader(image.path, image.gst_parser, image.gst_decoder)
+
+    checksums = [TrackChecksum(first=track.is_first, last=track.is_last) for track in tracks]
+    bounds = None
+
+    position = 0
+    for block in reader:
+        if bounds is None:
+            bounds = [(track.begin_bounds.samples(reader.rate),
+                       track.end_bounds.samples(reader.rate) if track.end_bounds is not None else None)
+                      for track in tracks]
+
+        block_end = position + len(block)
+        for checksum, (begin, end) in zip(checksums, bounds):
+            lo = max(begin, position)
+            hi = block_end if end is None else min(end, block_end)
+            if lo < hi:
+                checksum.update(block[lo - position:hi - position])
+        position = block_end
+
+    return checksums
+
+
+def _file_checksum(output_file: _OutputFile) -> TrackChecksum:
+    checksum = TrackChecksum(first=output_file.track.is_first, last=output_file.track.is_last)
+    for block in _PCMReader(output_file.path):
+        checksum.update(block)
+    return checksum
+
+
+def verify(output_files: List[_OutputFile]) -> bool:
+    images = dict()
+    for output_file in output_files:
+        images.setdefault(output_file.track.path, list()).append(output_file)
+
+    verified = True
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        file_checksums = {output_file: pool.submit(_file_checksum, output_file)
+                          for output_file in output_files}
+
+        for image_files in images.values():
+            image_checksums = _image_checksums([f.track for f in image_files])
+
+            for output_file, expected in zip(image_files, image_checksums):
+                actual = file_checksums[output_file].result()
+                if expected == actual:
+                    print(f"{output_file.path}: OK, {actual}")
+                else:
+                    print(f"{output_file.path}: MISMATCH, expected {expected}, got {actual}",
+                          file=sys.stderr)
+                    verified = False
+
+    return verified
+
+
+async def split(output_file: _OutputFile, *, profile: bool = False,
+                profile_dot_dir: Optional[pathlib.Path] = None) -> None:
+    from krautcat.gstreamer import Gst
+
+    track = output_file.track
+
+    template = PipelineTemplate.compile(
+        ("source", ElementFileSource),
+        ("parser", track.gst_parser),
+        ("decoder", track.gst_decoder),
+        ("encoder", ElementFLACEncoder),
+        ("sink", ElementFileSink),
+    )
+    pipeline = template.instantiate(source={"location": track.path},
+                                    sink={"location": output_file.path})
+
+    profiler = None
+    if profile or profile_dot_dir is not None:
+        profiler = pipeline.attach_profiler()
+
+    try:
+        await pipeline.set_state(Gst.State.PAUSED)
+        pipeline.seek(track.begin, track.end)
+
+        await pipeline.set_state(Gst.State.PLAYING)
+        await pipeline.wait_eos()
+    except PipelineError:
+        if output_file.path.exists():
+            output_file.path.unlink()
+        raise
+    finally:
+        pipeline.close()
+
+    if profiler is not None:
+        if profile:
+            print(json.dumps({"file": str(output_file.path), **profiler.report()}),
+                  file=sys.stderr)
+        if profile_dot_dir is not None:
+            profiler.dump_dot(profile_dot_dir / f"{output_file.path.stem}.dot")
+
+    output_audiofile = AudioFileFLAC(output_file.path)
+    output_audiofile.metadata <<= output_file.metadata
+    output_audiofile.save_tags()
+
+
+async def split_all(output_files: List[_OutputFile], **kwargs) -> List[_OutputFile]:
+    semaphore = asyncio.Semaphore(os.cpu_count())
+
+    async def _split(output_file: _OutputFile) -> None:
+        async with semaphore:
+            await split(output_file, **kwargs)
+
+    results = await asyncio.gather(*[_split(f) for f in output_files], return_exceptions=True)
+
+    succeeded = list()
+    for output_file, result in zip(output_files, results):
+        if isinstance(result, Exception):
+            print(f"Failed to split '{output_file.path}': {result}", file=sys.stderr)
+        else:
+            succeeded.append(output_file)
 
-    for track in _output_tracks:
-        track.metadata.total_tracks = len(_output_tracks)
+    return succeeded
 
-    flac_file_path /= cuesheet_info.files[0].path
 
-    Gst.debug_set_active(True)
-    Gst.debug_set_default_threshold(3)
-    GObject.threads_init()
-    
-    pipeline = ElementPipeline()
+class Argparser:
+    def __init__(self):
+        argparser = self._argparser = argparse.ArgumentParser()
 
-    source_file = ElementFileSource(flac_file_path)
-    source_parser = ElementFLACParser()
-    source_decoder = ElementFLACDecoder()
-    sink_encoder = ElementFLACEncoder()
-    sink_file = ElementFileSink() 
+        argparser.add_argument("source", action="store",
+                               type=pathlib.Path,
+                               help="Path to .cue file or to FLAC image with embedded cuesheet")
+        argparser.add_argument("--no-verify", action="store_false", dest="verify",
+                               help="Don't verify split tracks against the image")
+        argparser.add_argument("--profile-pipeline", action="store_true",
+                               help="Print per-element pipeline profile as JSON to stderr")
+        argparser.add_argument("--profile-dot-dir", action="store",
+                               type=pathlib.Path, default=None,
+                               help="Directory to dump pipeline graphs in DOT format to")
 
-    pipeline = pipeline << source_file << source_parser << source_decoder
-    pipeline = pipeline << sink_encoder << sink_file
+    def parse(self, args):
+        return self._argparser.parse_args(args)
 
-    sink_file = source_file | source_parser | source_decoder | sink_encoder | sink_file 
 
-    source_file.__gobject__.get_static_pad("src").set_active(True)
-    for track in _output_tracks:
-        pipeline.__gobject__.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT,
-                                         (track.file_begin.time * 1000 + track.file_begin.mseconds) * Gst.MSECOND)
-        sink_file.location = track.path
+def main():
+    argparser = Argparser()
+    cli_args = argparser.parse(sys.argv[1:])
 
-        pipeline.state = Gst.State.PLAYING
+    from krautcat.gstreamer import GObject
 
-        if track.file_end.time == 0 and track.file_end.mseconds == 0:
-            pipeline.bus.timed_pop_filtered(
-                Gst.CLOCK_TIME_NONE,
-                Gst.MessageType.EOS
-            )
-            pipeline.state = Gst.State.NULL
-        else:
-            # clock_id = pipeline.__gobject__.get_pipeline_clock()
-            # id = clock_id.new_single_shot_id((track.file_end.time * 1000 + track.file_end.mseconds) * Gst.MSECOND)
-            # clk_ret, jitter = clock_id.id_wait(id)
-            # print(f"Jitter: {jitter}, {(track.file_end.time * 1000 + track.file_end.mseconds) * Gst.MSECOND}")
-            pipeline.bus.timed_pop_filtered(
-                (track.file_begin.time * 1000 + track.file_begin.mseconds) * Gst.MSECOND,
-            )
-            pipeline.state = Gst.State.PAUSED
-
-        output_audiofile = AudioFileFLAC(track.path)
-        output_audiofile.metadata <<= track.metadata
-        output_audiofile.save_tags() 
+    GObject.threads_init()
+
+    source = cli_args.source.resolve()
+    if source.suffix == f".{AudioFileFLAC.EXTENSION}":
+        cuesheet = CuesheetParser(AudioFileFLAC(source)).parse()
+    else:
+        cuesheet = source
+
+    output_files = [_OutputFile(track) for track in open_cuesheet_tracks(cuesheet)]
+
+    split_files = asyncio.run(split_all(output_files, profile=cli_args.profile_pipeline,
+                                        profile_dot_dir=cli_args.profile_dot_dir))
+
+    if cli_args.verify and not verify(split_files):
+        return 1
+
+    return 0 if len(split_files) == len(output_files) else 1
@@ -1,5 +1,3 @@
-import puremagic
-
 from .alac import AudioFileALAC
 from .flac import AudioFileFLAC
 from .mp3 import AudioFileMP3
@@ -16,6 +14,8 @@ _FILE_TYPENAME_MAPPING = {
 
 
 def open_audio_file(file_path):
+    import puremagic
+
     try:
         magic_info = puremagic.magic_file(str(file_path))
         if len(magic_info) > 0:
@@ -1,14 +1,8 @@
 from typing import Optional
 import sys
 
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst
-
-import mutagen.mp4
-
 from krautcat.audio.metadata import Metadata
-from krautcat.audio.metadata.types import Date
+from krautcat.audio.metadata.types import Date, ReplayGain
 from krautcat.audio.file.audio.generic import (
         AudioFile, TagsBackend as GenericTagsBackend
     )
@@ -16,6 +10,8 @@ from krautcat.audio.file.audio.generic import (
 
 class TagsBackend(GenericTagsBackend):
     def __init__(self, audio_file: "AudioFileALAC") -> None:
+        import mutagen.mp4
+
         super().__init__(audio_file)
 
         self._mutagen_file = mutagen.mp4.MP4(audio_file.path)
@@ -87,6 +83,20 @@ class TagsBackend(GenericTagsBackend):
 
         self._mutagen_file.save()
 
+    def save_replaygain(self, replaygain: ReplayGain) -> bool:
+        import mutagen.mp4
+
+        if self._mutagen_file.tags is None:
+            self._mutagen_file.add_tags()
+
+        for name, value in replaygain.tags().items():
+            self._mutagen_file.tags[f"----:com.apple.iTunes:{name.lower()}"] = [
+                mutagen.mp4.MP4FreeForm(value.encode("utf-8"))
+            ]
+
+        self._mutagen_file.save()
+        return True
+
 
 class AudioFileALAC(AudioFile):
     EXTENSION = "m4a"
@@ -114,6 +124,8 @@ class AudioFileALAC(AudioFile):
 
     @property
     def gst_encoder(self):
+        from krautcat.gstreamer import Gst
+
         return Gst.ElementFactory.make("acdec_alac", None)
 
 
@@ -0,0 +1,104 @@
+import pathlib
+
+from typing import List, Optional, Union
+
+from . import generic as _generic
+from krautcat.audio.file.cuesheet import (ElementRoot as CuesheetElementRoot,
+                                          ElementTrack as CuesheetElementTrack,
+                                          Parser as CuesheetParser,
+                                          TrackBounds as CuesheetTrackBounds)
+from krautcat.audio.file.mime import file_class
+from krautcat.audio.metadata import Metadata
+
+
+class AudioFileCueTrack(_generic.AudioFile):
+    EXTENSION = "cue"
+    SUFFIX = EXTENSION
+
+    def __init__(self, cuesheet_track: CuesheetElementTrack, image: _generic.AudioFile,
+                 *, end: Optional[CuesheetTrackBounds] = None) -> None:
+        super().__init__(image.path)
+
+        self._cuesheet_track = cuesheet_track
+        self._image = image
+
+        self.begin_bounds = cuesheet_track.begin
+        self.end_bounds = end
+
+        self.metadata = self._metadata_from_cuesheet()
+
+    @property
+    def begin(self) -> int:
+        return self.begin_bounds.nanoseconds
+
+    @property
+    def end(self) -> Optional[int]:
+        if self.end_bounds is None:
+            return None
+        return self.end_bounds.nanoseconds
+
+    @property
+    def is_first(self) -> bool:
+        return self._cuesheet_track is self._cuesheet_track.cue_root.tracks[0]
+
+    @property
+    def is_last(self) -> bool:
+        return self._cuesheet_track is self._cuesheet_track.cue_root.tracks[-1]
+
+    def load_tags(self) -> None:
+        self.metadata = self._metadata_from_cuesheet()
+
+    def _metadata_from_cuesheet(self) -> Metadata:
+        cue_root = self._cuesheet_track.cue_root
+
+        artist = self._cuesheet_track.track_artist
+        if artist == "None":
+            artist = cue_root.album_artist
+
+        return Metadata(artist=artist,
+                        track_name=self._cuesheet_track.track_name,
+                        track_number=self._cuesheet_track.track_number,
+                        album=cue_root.album_name,
+                        date=cue_root.album_date,
+                        tracks_total=len(cue_root.tracks),
+                        disc_number=cue_root.disc_number or None,
+                        discs_total=cue_root.disc_total or None)
+
+    @property
+    def image(self) -> _generic.AudioFile:
+        return self._image
+
+    @property
+    def gst_parser(self):
+        return self._image.gst_parser
+
+    @property
+    def gst_decoder(self):
+        return self._image.gst_decoder
+
+
+def open_cuesheet_tracks(cuesheet: Union[pathlib.Path, CuesheetElementRoot]) -> List[AudioFileCueTrack]:
+    if isinstance(cuesheet, pathlib.Path):
+        cuesheet = CuesheetParser(cuesheet).parse()
+
+    images = dict()
+    for cue_file in cuesheet.files:
+        image_klass = file_class(cue_file.path)
+        if image_klass is None:
+            continue
+        images[id(cue_file)] = image_klass(cue_file.path, open=False)
+
+    tracks = list()
+    for track, next_track in zip(cuesheet.tracks, cuesheet.tracks[1:] + [None]):
+        image = images.get(id(track.begin.file), None)
+        if image is None:
+            continue
+
+        if next_track is not None and next_track.begin.file is track.begin.file:
+            end = next_track.begin
+        else:
+            end = None
+
+        tracks.append(AudioFileCueTrack(track, image, end=end))
+
+    return tracks
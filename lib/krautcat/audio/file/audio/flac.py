@@ -1,17 +1,148 @@
-from typing import Optional, Type, Union
+import mmap
+import pathlib
+import re
 
-import mutagen
-import mutagen.flac
+from typing import Dict, Iterator, List, NamedTuple, Optional, Type, Union
 
 from . import generic as _generic
 from krautcat.audio.metadata import Metadata
-from krautcat.audio.metadata.types import Date
+from krautcat.audio.metadata.types import Date, ReplayGain
 from krautcat.audio.file.audio.generic import TagsBackend as GenericTagsBackend
 from krautcat.gstreamer import ElementFLACDecoder, ElementFLACEncoder, ElementFLACParser
 
 
+class FLACFrame(NamedTuple):
+    first_sample: int
+    byte_offset: int
+    num_samples: int
+
+
+SEEKPOINT_SIZE = 18
+SEEKPOINT_PLACEHOLDER = 0xFFFFFFFFFFFFFFFF
+
+_FRAME_SYNC = re.compile(rb"\xff[\xf8\xf9]")
+
+_CRC8_TABLE = list()
+for _byte in range(256):
+    _crc = _byte
+    for _ in range(8):
+        _crc = ((_crc << 1) ^ 0x07) & 0xFF if _crc & 0x80 else (_crc << 1) & 0xFF
+    _CRC8_TABLE.append(_crc)
+
+_BLOCK_SIZES = {1: 192, 2: 576, 3: 1152, 4: 2304, 5: 4608,
+                8: 256, 9: 512, 10: 1024, 11: 2048, 12: 4096, 13: 8192, 14: 16384, 15: 32768}
+
+
+def _crc8(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def _audio_offset(data: mmap.mmap) -> int:
+    offset = 0
+    if data[:3] == b"ID3":
+        size = data[6:10]
+        offset = 10 + (size[0] << 21 | size[1] << 14 | size[2] << 7 | size[3])
+
+    if data[offset:offset + 4] != b"fLaC":
+        raise ValueError("Not a FLAC stream")
+    offset += 4
+
+    last_block = False
+    while not last_block:
+        last_block = bool(data[offset] & 0x80)
+        offset += 4 + int.from_bytes(data[offset + 1:offset + 4], "big")
+
+    return offset
+
+
+def _parse_frame_header(data: mmap.mmap, pos: int, fixed_blocksize: int) -> Optional[FLACFrame]:
+    header = data[pos:pos + 16]
+    if len(header) < 6:
+        return None
+
+    blocksize_code = header[2] >> 4
+    sample_rate_code = header[2] & 0x0F
+    if blocksize_code == 0 or sample_rate_code == 0x0F:
+        return None
+    if header[3] >> 4 > 10 or (header[3] >> 1) & 0x07 == 3 or header[3] & 0x01:
+        return None
+
+    lead = header[4]
+    if lead < 0x80:
+        number, extra = lead, 0
+    elif 0xC0 <= lead < 0xE0:
+        number, extra = lead & 0x1F, 1
+    elif 0xE0 <= lead < 0xF0:
+        number, extra = lead & 0x0F, 2
+    elif 0xF0 <= lead < 0xF8:
+        number, extra = lead & 0x07, 3
+    elif 0xF8 <= lead < 0xFC:
+        number, extra = lead & 0x03, 4
+    elif 0xFC <= lead < 0xFE:
+        number, extra = lead & 0x01, 5
+    elif lead == 0xFE:
+        number, extra = 0, 6
+    else:
+        return None
+
+    cursor = 5
+    for byte in header[cursor:cursor + extra]:
+        if byte & 0xC0 != 0x80:
+            return None
+        number = number << 6 | byte & 0x3F
+    cursor += extra
+
+    if blocksize_code == 6:
+        num_samples = header[cursor] + 1
+        cursor += 1
+    elif blocksize_code == 7:
+        num_samples = int.from_bytes(header[cursor:cursor + 2], "big") + 1
+        cursor += 2
+    else:
+        num_samples = _BLOCK_SIZES[blocksize_code]
+
+    if sample_rate_code == 12:
+        cursor += 1
+    elif sample_rate_code in (13, 14):
+        cursor += 2
+
+    if cursor >= len(header) or _crc8(header[:cursor]) != header[cursor]:
+        return None
+
+    variable_blocksize = header[1] & 0x01
+    first_sample = number if variable_blocksize else number * fixed_blocksize
+    return FLACFrame(first_sample, pos, num_samples)
+
+
+def scan_frames(path: Union[pathlib.Path, str], fixed_blocksize: int,
+                min_framesize: int = 0) -> Iterator[FLACFrame]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        audio_offset = _audio_offset(data)
+
+        expected_sample = 0
+        pos = audio_offset
+        while True:
+            match = _FRAME_SYNC.search(data, pos)
+            if match is None:
+                break
+
+            frame = _parse_frame_header(data, match.start(), fixed_blocksize)
+            if frame is None or frame.first_sample != expected_sample:
+                pos = match.start() + 1
+                continue
+
+            yield frame._replace(byte_offset=frame.byte_offset - audio_offset)
+            expected_sample = frame.first_sample + frame.num_samples
+            pos = match.start() + max(min_framesize, 1)
+
+
 class TagsBackend(GenericTagsBackend):
     def __init__(self, audio_file: "AudioFileFLAC") -> None:
+        import mutagen.flac
+
         super().__init__(audio_file)
 
         self._mutagen_file = mutagen.flac.FLAC(audio_file.path)
@@ -99,6 +230,85 @@ class TagsBackend(GenericTagsBackend):
 
         self._mutagen_file.save()
 
+    def save_replaygain(self, replaygain: ReplayGain) -> bool:
+        if self._mutagen_file.tags is None:
+            self._mutagen_file.add_tags()
+
+        for name, value in replaygain.tags().items():
+            self._mutagen_file.tags[name] = value
+
+        self._mutagen_file.save()
+        return True
+
+    def load_cuesheet(self) -> Optional[Union[List[str], "mutagen.flac.CueSheet"]]:
+        mutagen_tags = self._mutagen_file.tags
+        if mutagen_tags is not None and "cuesheet" in mutagen_tags:
+            return mutagen_tags["cuesheet"][0].splitlines()
+
+        return self._mutagen_file.cuesheet
+
+    # Per-track tags of CD images, as written by foobar2000 and others.
+    _CUE_TRACK_TAG = re.compile(r"cue_track(\d+)_(\w+)", re.IGNORECASE)
+
+    def load_cuesheet_track_tags(self) -> Dict[int, Dict[str, str]]:
+        mutagen_tags = self._mutagen_file.tags
+        if mutagen_tags is None:
+            return dict()
+
+        track_tags = dict()
+        for name, value in mutagen_tags:
+            match = self._CUE_TRACK_TAG.fullmatch(name)
+            if match is not None:
+                track_tags.setdefault(int(match.group(1)), dict())[match.group(2).lower()] = value
+        return track_tags
+
+    @property
+    def sample_rate(self) -> int:
+        return self._mutagen_file.info.sample_rate
+
+    @property
+    def stream_info(self) -> "mutagen.flac.StreamInfo":
+        return self._mutagen_file.info
+
+    def load_seektable(self) -> List[FLACFrame]:
+        if self._mutagen_file.seektable is None:
+            return list()
+
+        return [FLACFrame(*seekpoint)
+                for seekpoint in self._mutagen_file.seektable.seekpoints
+                if seekpoint.first_sample != SEEKPOINT_PLACEHOLDER]
+
+    def seektable_capacity(self) -> int:
+        import mutagen.flac
+
+        budget = -4
+        for block in self._mutagen_file.metadata_blocks:
+            if isinstance(block, mutagen.flac.Padding):
+                budget += block.length + 4
+
+        if self._mutagen_file.seektable is not None:
+            budget += len(self._mutagen_file.seektable.seekpoints) * SEEKPOINT_SIZE
+        else:
+            budget -= 4
+
+        return max(budget // SEEKPOINT_SIZE, 0)
+
+    def save_seektable(self, seekpoints: List[FLACFrame], *, allow_rewrite: bool = False) -> bool:
+        import mutagen.flac
+
+        fits = len(seekpoints) <= self.seektable_capacity()
+        if not fits and not allow_rewrite:
+            return False
+
+        if self._mutagen_file.seektable is None:
+            self._mutagen_file.seektable = mutagen.flac.SeekTable(None)
+            self._mutagen_file.metadata_blocks.insert(1, self._mutagen_file.seektable)
+
+        self._mutagen_file.seektable.seekpoints = [mutagen.flac.SeekPoint(*p) for p in seekpoints]
+        self._mutagen_file.save(padding=(lambda info: info.padding) if fits else None)
+
+        return True
+
 
 class AudioFileFLAC(_generic.AudioFile):
     EXTENSION = "flac"
@@ -124,6 +334,27 @@ class AudioFileFLAC(_generic.AudioFile):
         else:
             raise ValueError()
 
+    @property
+    def sample_rate(self) -> int:
+        return self._tags_backend.sample_rate
+
+    @property
+    def stream_info(self) -> "mutagen.flac.StreamInfo":
+        return self._tags_backend.stream_info
+
+    def load_seektable(self) -> List[FLACFrame]:
+        return self._tags_backend.load_seektable()
+
+    def seektable_capacity(self) -> int:
+        return self._tags_backend.seektable_capacity()
+
+    def save_seektable(self, seekpoints: List[FLACFrame], *, allow_rewrite: bool = False) -> bool:
+        return self._tags_backend.save_seektable(seekpoints, allow_rewrite=allow_rewrite)
+
+    def scan_frames(self) -> Iterator[FLACFrame]:
+        stream_info = self.stream_info
+        return scan_frames(self.path, stream_info.max_blocksize, stream_info.min_framesize)
+
     @property
     def gst_parser(self) -> Type[ElementFLACParser]:
         return ElementFLACParser
@@ -1,10 +1,11 @@
 import pathlib
 
 from abc import abstractmethod
-from typing import Union
+from typing import Dict, Union
 
 from ... import exceptions as _exceptions
 from krautcat.audio.metadata.generic import Metadata
+from krautcat.audio.metadata.types import ReplayGain
 
 
 class FileNotExistsError(Exception):
@@ -25,6 +26,15 @@ class TagsBackend:
     def save_tags(self) -> bool:
         ...
 
+    def load_cuesheet(self):
+        return None
+
+    def load_cuesheet_track_tags(self) -> Dict[int, Dict[str, str]]:
+        return dict()
+
+    def save_replaygain(self, replaygain: ReplayGain) -> bool:
+        return False
+
 
 class AudioFile:
     def __init__(self, path: Union[pathlib.Path, str]):
@@ -46,3 +56,18 @@ class AudioFile:
         else:
             raise FileNotExistsError(self._path)
 
+    def load_cuesheet(self):
+        if self._tags_backend is None:
+            return None
+        return self._tags_backend.load_cuesheet()
+
+    def load_cuesheet_track_tags(self) -> Dict[int, Dict[str, str]]:
+        if self._tags_backend is None:
+            return dict()
+        return self._tags_backend.load_cuesheet_track_tags()
+
+    def save_replaygain(self, replaygain: ReplayGain) -> bool:
+        if self._tags_backend is None:
+            return False
+        return self._tags_backend.save_replaygain(replaygain)
+
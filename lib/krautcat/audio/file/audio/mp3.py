@@ -1,18 +1,18 @@
-from typing import Optional, Union
-
-import mutagen.id3
-import mutagen.mp3
+from typing import Optional, Type, Union
 
 from . import generic as _generic
 from ... import exceptions as _exceptions
 
 from krautcat.audio.file.audio.generic import TagsBackend as GenericTagsBackend
 from krautcat.audio.metadata import Metadata
-from krautcat.audio.metadata.types import Date
+from krautcat.audio.metadata.types import Date, ReplayGain
+from krautcat.gstreamer import ElementMP3Decoder, ElementMP3Parser
 
 
 class TagsBackend(GenericTagsBackend):
     def __init__(self, audio_file: "AudioFileMP3") -> None:
+        import mutagen.mp3
+
         super().__init__(audio_file)
 
         self._mutagen_file = mutagen.mp3.MP3(audio_file.path)
@@ -65,6 +65,8 @@ class TagsBackend(GenericTagsBackend):
         return krautcat_tags
 
     def save_tags(self, metadata: Optional[Metadata] = None) -> bool:
+        import mutagen.id3
+
         mutagen_tags = self._mutagen_file.tags
 
         mutagen_tags.setall("TIT2", [mutagen.id3.TIT2(encoding=3, text=metadata.track_name)])
@@ -100,6 +102,22 @@ class TagsBackend(GenericTagsBackend):
 
         self._mutagen_file.save()
 
+    def save_replaygain(self, replaygain: ReplayGain) -> bool:
+        import mutagen.id3
+
+        if self._mutagen_file.tags is None:
+            self._mutagen_file.add_tags()
+
+        for name, value in replaygain.tags().items():
+            self._mutagen_file.tags[f"TXXX:{name}"] = mutagen.id3.TXXX(
+                encoding=mutagen.id3.Encoding.UTF8,
+                desc=name,
+                text=value
+            )
+
+        self._mutagen_file.save()
+        return True
+
 
 class AudioFileMP3(_generic.AudioFile):
     EXTENSION = "mp3"
@@ -124,6 +142,13 @@ class AudioFileMP3(_generic.AudioFile):
         else:
             raise ValueError()
 
+    @property
+    def gst_parser(self) -> Type[ElementMP3Parser]:
+        return ElementMP3Parser
+
+    @property
+    def gst_decoder(self) -> Type[ElementMP3Decoder]:
+        return ElementMP3Decoder
 
 
 class MP3Encoder:
@@ -3,6 +3,7 @@ import pathlib
 
 from typing import List, Optional, Union
 
+from krautcat.audio.file.audio.generic import AudioFile
 from krautcat.audio.metadata.types import Date
 
 
@@ -12,12 +13,42 @@ class ParserError(Exception):
 
 
 class TrackBounds:
+    CD_FRAMES_PER_SECOND = 75
+
     def __init__(self) -> None:
         self.file = ElementFile()
         self.time = 0 
         self.mseconds = 0
         self.frames = 0
 
+        self.sample_offset: Optional[int] = None
+        self.sample_rate: Optional[int] = None
+
+    @property
+    def cd_frames(self) -> int:
+        return self.time * self.CD_FRAMES_PER_SECOND + self.frames
+
+    @property
+    def nanoseconds(self) -> int:
+        if self.sample_offset is not None:
+            return -(-self.sample_offset * 1_000_000_000 // self.sample_rate)
+        return -(-self.cd_frames * 1_000_000_000 // self.CD_FRAMES_PER_SECOND)
+
+    def samples(self, sample_rate: int = 44100) -> int:
+        if self.sample_offset is not None and sample_rate == self.sample_rate:
+            return self.sample_offset
+        elif self.sample_offset is not None:
+            return self.sample_offset * sample_rate // self.sample_rate
+        return self.cd_frames * sample_rate // self.CD_FRAMES_PER_SECOND
+
+    def set_samples(self, sample_offset: int, sample_rate: int) -> None:
+        self.sample_offset = sample_offset
+        self.sample_rate = sample_rate
+
+        self.time, remainder = divmod(sample_offset, sample_rate)
+        self.frames = remainder * self.CD_FRAMES_PER_SECOND // sample_rate
+        self.mseconds = remainder * 1000 // sample_rate
+
     def __str__(self) -> str:
         minutes = self.time // 60
         seconds = self.time % 60
@@ -92,22 +123,48 @@ class ElementRoot:
  
 
 class Parser:
-    def __init__(self, input: Union[pathlib.Path, List[str]]) -> None:
-        self.content = (input
-                                  if type(input) == List[str]
-                                  else input.open("r", encoding="utf-8").readlines())
+    LEAD_OUT_TRACK_NUMBERS = (170, 255)
+
+    def __init__(self, input: Union[pathlib.Path, List[str], AudioFile]) -> None:
+        self.audio_file = None
+        self.cuesheet_block = None
+
+        if isinstance(input, AudioFile):
+            self.audio_file = input
+
+            embedded = input.load_cuesheet()
+            if embedded is None:
+                raise ParserError(f"File '{input.path}' has no embedded cuesheet")
+            elif isinstance(embedded, list):
+                self.content = embedded
+            else:
+                self.content = list()
+                self.cuesheet_block = embedded
+        elif isinstance(input, list):
+            self.content = input
+        else:
+            self.content = input.open("r", encoding="utf-8").readlines()
+
         self.root_object = ElementRoot()
-        self.root_object_path = (input
-                            if isinstance(input, pathlib.Path)
-                            else pathlib.Path())
+        if isinstance(input, pathlib.Path):
+            self.root_object_path = input
+        elif self.audio_file is not None:
+            self.root_object_path = self.audio_file.path
+        else:
+            self.root_object_path = pathlib.Path()
 
         self.ctx = _Context()   
  
     def parse(self) -> ElementRoot:
+        if self.cuesheet_block is not None:
+            return self._parse_cuesheet_block(self.cuesheet_block)
+
         parent_object = self.root_object
  
         for line in self.content:
-            line = line.lstrip(" ").rstrip("\n")
+            line = line.strip(" \t\r\n")
+            if line == "":
+                continue
             tokens = line.split(" ")
             
             cmd = tokens[0]
@@ -118,6 +175,51 @@ class Parser:
         self.root_object.update_last_track(self.ctx)
         return self.root_object
 
+    def _parse_cuesheet_block(self, cuesheet_block) -> ElementRoot:
+        sample_rate = self.audio_file.sample_rate
+
+        file_obj = ElementFile()
+        file_obj.path = self.audio_file.path
+        file_obj.format = self.audio_file.EXTENSION.upper()
+        self.root_object <<= file_obj
+        self.ctx.file = file_obj
+
+        metadata = self.audio_file.metadata
+        if metadata is not None:
+            self.root_object.album_name = metadata.album or ""
+            self.root_object.album_artist = metadata.artist or ""
+            if metadata.date is not None:
+                self.root_object.album_date = metadata.date
+
+        # A CUESHEET block has no CD-TEXT, titles can only come from the
+        # image's vorbis comments.
+        track_tags = self.audio_file.load_cuesheet_track_tags()
+
+        for cue_track in cuesheet_block.tracks:
+            if cue_track.track_number in self.LEAD_OUT_TRACK_NUMBERS:
+                continue
+
+            track_obj = ElementTrack(self.root_object)
+            track_obj.track_number = cue_track.track_number
+            tags = track_tags.get(cue_track.track_number, dict())
+            track_obj.track_name = tags.get("title", None) or f"Track {cue_track.track_number:02}"
+            track_obj.track_artist = (tags.get("performer", None) or tags.get("artist", None)
+                                      or self.root_object.album_artist or "None")
+            self.root_object <<= track_obj
+
+            for index in cue_track.indexes:
+                if index.index_number == 1:
+                    bounds = track_obj.begin
+                elif index.index_number == 0:
+                    bounds = track_obj.pre_gap
+                else:
+                    continue
+
+                bounds.file = file_obj
+                bounds.set_samples(cue_track.start_offset + index.index_offset, sample_rate)
+
+        return self.root_object
+
     def _invoke(self, cmd: str, tokens: List[str]) -> ElementBase:
         handler_cmd = f"_handler_{cmd.lower()}"
         handler_method = getattr(self, handler_cmd, None)
@@ -126,6 +228,17 @@ class Parser:
 
         return handler_method(tokens)
 
+    def _handler_ignored(self, tokens: List[str]) -> ElementRoot:
+        return self.root_object
+
+    _handler_catalog = _handler_ignored
+    _handler_cdtextfile = _handler_ignored
+    _handler_flags = _handler_ignored
+    _handler_isrc = _handler_ignored
+    _handler_songwriter = _handler_ignored
+    _handler_pregap = _handler_ignored
+    _handler_postgap = _handler_ignored
+
     def _handler_rem(self, tokens: List[str]) -> ElementRoot:
         comment_name_to_attribute = {
             "DATE": self.root_object.album_date,
@@ -140,6 +253,9 @@ class Parser:
 
         attribute = " ".join(subcommand_args)
 
+        if subcommand not in comment_name_to_attribute:
+            return self.root_object
+
         attro = comment_name_to_attribute[subcommand]
 
         if type(attro) is list:
@@ -171,10 +287,11 @@ class Parser:
         file_obj = ElementFile()
         self.root_object <<= file_obj
 
-        file_obj.path = self.root_object_path.parent / pathlib.Path(" ".join(tokens[:-1]).strip('"'))
-        print(self.root_object_path)
-        print(file_obj.path) 
-        file_obj.format = tokens[1] 
+        if self.audio_file is not None:
+            file_obj.path = self.audio_file.path
+        else:
+            file_obj.path = self.root_object_path.parent / pathlib.Path(" ".join(tokens[:-1]).strip('"'))
+        file_obj.format = tokens[-1]
 
         self.ctx.file_previous = self.ctx.file
         self.ctx.file = file_obj
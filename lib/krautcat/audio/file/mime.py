@@ -1,5 +1,3 @@
-import puremagic
-
 from krautcat.audio.file.audio import *
 
 
@@ -14,6 +12,8 @@ _MIME_NAME_MAPPING = {
 }
 
 def file_class(entry):
+    import puremagic
+
     try:
         magic_info = puremagic.magic_file(str(entry))
         if len(magic_info) > 0:
@@ -0,0 +1,138 @@
+import functools
+import pathlib
+
+from typing import Optional, Tuple
+
+import numpy
+
+from krautcat.gstreamer import (ElementAppSink, ElementAudioConvert, ElementAudioResample,
+                                ElementFileSource, PipelineTemplate, SampleFormat)
+
+
+SAMPLE_RATE = 11025
+FRAME_SIZE = 4096
+FRAME_HOP = FRAME_SIZE // 3
+
+SEGMENT_FRAMES = 4
+SEGMENT_BITS = 16
+SEGMENT_MASK = (1 << SEGMENT_BITS) - 1
+
+_MIN_FREQUENCY = 28.0
+_MAX_FREQUENCY = 3520.0
+
+
+# Frames are transformed in blocks of this many, so only one block of
+# windowed frames and spectra is in memory at a time, whatever the track length.
+CHROMA_BLOCK_FRAMES = 256
+
+
+@functools.lru_cache(maxsize=1)
+def _chroma_bins() -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    frequencies = numpy.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    bins = numpy.nonzero((frequencies >= _MIN_FREQUENCY) & (frequencies <= _MAX_FREQUENCY))[0]
+    notes = numpy.round(12.0 * numpy.log2(frequencies[bins] / 440.0)).astype(numpy.int64) % 12
+
+    # Maps the power of every used bin onto its note.
+    note_matrix = numpy.zeros((len(bins), 12))
+    note_matrix[numpy.arange(len(bins)), notes] = 1.0
+    return bins, note_matrix, numpy.hanning(FRAME_SIZE)
+
+
+def chroma(samples: numpy.ndarray) -> numpy.ndarray:
+    if len(samples) < FRAME_SIZE:
+        return numpy.empty((0, 12))
+
+    # A strided view, the frames aren't copied until a block is windowed.
+    frames = numpy.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::FRAME_HOP]
+    bins, note_matrix, window = _chroma_bins()
+
+    features = numpy.empty((len(frames), 12))
+    for start in range(0, len(frames), CHROMA_BLOCK_FRAMES):
+        block = frames[start:start + CHROMA_BLOCK_FRAMES]
+        spectrum = numpy.abs(numpy.fft.rfft(block * window, axis=1)[:, bins]) ** 2
+        features[start:start + len(block)] = spectrum @ note_matrix
+
+    norm = numpy.linalg.norm(features, axis=1, keepdims=True)
+    return numpy.divide(features, norm, out=numpy.zeros_like(features), where=norm > 1e-9)
+
+
+def fingerprint(samples: numpy.ndarray) -> numpy.ndarray:
+    features = chroma(samples)
+    if len(features) == 0:
+        return numpy.empty(0, dtype=numpy.uint32)
+
+    # Sub-fingerprint bits: 0-11 note above frame mean, 12-23 note above the
+    # next semitone, 24-31 note above its fifth. All relations are between
+    # notes of the same frame, so they survive lossy encoding and gain changes.
+    above_mean = features > features.mean(axis=1, keepdims=True)
+    above_next = features > numpy.roll(features, -1, axis=1)
+    above_fifth = (features > numpy.roll(features, -7, axis=1))[:, :8]
+
+    bits = numpy.concatenate((above_mean, above_next, above_fifth), axis=1)
+    bits &= (features.sum(axis=1) > 0)[:, None]
+
+    weights = numpy.left_shift(numpy.uint64(1), numpy.arange(32, dtype=numpy.uint64))
+    return (bits.astype(numpy.uint64) @ weights).astype(numpy.uint32)
+
+
+def segment_hashes(fingerprint: numpy.ndarray, *, step: int = 1) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    if len(fingerprint) < SEGMENT_FRAMES:
+        return numpy.empty(0, dtype=numpy.int64), numpy.empty(0, dtype=numpy.int64)
+
+    # Segment hash is a per-bit majority vote over consecutive sub-fingerprints,
+    # using the bits that are most stable between encodings of the same audio.
+    bits = ((fingerprint[:, None] >> numpy.arange(SEGMENT_BITS, dtype=numpy.uint32)) & 1)
+    counts = numpy.concatenate((numpy.zeros((1, SEGMENT_BITS), dtype=numpy.int32),
+                                numpy.cumsum(bits.astype(numpy.int32), axis=0)))
+    votes = (counts[SEGMENT_FRAMES:] - counts[:-SEGMENT_FRAMES])[::step]
+
+    majority = (votes * 2 > SEGMENT_FRAMES).astype(numpy.int64)
+    hashes = majority @ (numpy.int64(1) << numpy.arange(SEGMENT_BITS, dtype=numpy.int64))
+    positions = numpy.arange(0, len(votes) * step, step, dtype=numpy.int64)
+
+    informative = (hashes != 0) & (hashes != SEGMENT_MASK)
+    return hashes[informative], positions[informative]
+
+
+def bit_error_rate(a: numpy.ndarray, b: numpy.ndarray, offset: int) -> Optional[float]:
+    if offset >= 0:
+        a = a[offset:]
+    else:
+        b = b[-offset:]
+
+    length = min(len(a), len(b))
+    if length == 0:
+        return None
+
+    differences = numpy.bitwise_xor(a[:length], b[:length])
+    return float(numpy.unpackbits(differences.view(numpy.uint8)).sum()) / (length * 32)
+
+
+def fingerprint_file(path: pathlib.Path, parser, decoder) -> Tuple[float, numpy.ndarray]:
+    from krautcat.gstreamer import Gst
+
+    template = PipelineTemplate.compile(
+        ("source", ElementFileSource),
+        ("parser", parser),
+        ("decoder", decoder),
+        ("convert", ElementAudioConvert),
+        ("resample", ElementAudioResample),
+        ("sink", ElementAppSink, {"sample_format": SampleFormat.F32LE, "channels": 1,
+                                  "rate": SAMPLE_RATE}),
+    )
+    pipeline = template.instantiate(source={"location": path})
+    sink = pipeline["sink"]
+
+    pipeline.state = Gst.State.PLAYING
+
+    blocks = list()
+    try:
+        for block in sink.blocks(1 << 16):
+            blocks.append(block[:, 0].copy())
+
+        pipeline.check_errors()
+    finally:
+        pipeline.state = Gst.State.NULL
+
+    samples = numpy.concatenate(blocks) if blocks else numpy.empty(0, dtype=numpy.float32)
+    return len(samples) / SAMPLE_RATE, fingerprint(samples)
@@ -1,54 +1,305 @@
 import os
 import pathlib
 import re
+import select
+import threading
+import time
 
-import psutil
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Pattern, Union
 
 
 class FilesystemGeneric:
-    @staticmethod
-    def escape_filename(filename):
-        replacements = [
-            (re.compile(r"[/:]"), r"_"),
-            (re.compile(r"[\?]"), r"!"),
-        ]
+    # Linux filesystems limit names in bytes of the encoded name.
+    NAME_MAX = 255
+    MAX_UNITS_PER_CHARACTER = 4
+
+    TRANSLATION = str.maketrans({
+        "/": "_",
+        ":": "_",
+        "?": "!",
+        "\0": None,
+    })
+
+    RESERVED_NAMES: FrozenSet[str] = frozenset()
+    TRAILING_CHARACTERS = ""
+
+    _FORBIDDEN: Pattern
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FORBIDDEN = _forbidden_pattern(cls.TRANSLATION)
+
+    @classmethod
+    def escape_filename(cls, filename):
+        # Most names need no escaping at all, and searching for a character
+        # class is much cheaper than translating a non-ASCII string.
+        if cls._FORBIDDEN.search(filename) is None:
+            return filename
+        return filename.translate(cls.TRANSLATION)
+
+    @classmethod
+    def name_length(cls, name):
+        return len(name.encode("utf-8", "surrogateescape"))
+
+    @classmethod
+    def truncate(cls, name, limit):
+        encoded = name.encode("utf-8", "surrogateescape")
+        if len(encoded) <= limit:
+            return name
+        # Back off to the start of a multibyte sequence, so bytes that were
+        # undecodable in the original name still round-trip.
+        end = limit
+        while end > limit - 3 and end > 0 and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        if encoded[end] & 0xC0 != 0x80:
+            limit = end
+        return encoded[:limit].decode("utf-8", "surrogateescape")
+
+    @classmethod
+    def name_limit(cls, path=None):
+        if path is None:
+            return cls.NAME_MAX
+        return min(cls.NAME_MAX, get_name_max(path))
+
+    @classmethod
+    def sanitize_filename(cls, filename, limit=None, *, suffix=""):
+        """Escape a complete file name and fit it into the filesystem limits.
+
+        The suffix (e.g. ".flac") is kept intact when the name is truncated.
+        """
+        limit = limit if limit is not None else cls.NAME_MAX
+
+        name = cls.escape_filename(filename)
+        if suffix:
+            suffix = cls.escape_filename(suffix)
+
+        # Names that can't exceed the limit even in the widest encoding skip
+        # encoding altogether.
+        if (len(name) + len(suffix)) * cls.MAX_UNITS_PER_CHARACTER > limit:
+            name = cls.truncate(name, max(limit - cls.name_length(suffix), 1))
+
+        if cls.TRAILING_CHARACTERS and not suffix:
+            name = name.rstrip(cls.TRAILING_CHARACTERS) or "_"
+
+        if cls.RESERVED_NAMES:
+            base = (name + suffix).partition(".")[0]
+            if len(base) <= 4 and base.upper() in cls.RESERVED_NAMES:
+                name = cls.truncate("_" + name, max(limit - cls.name_length(suffix), 1))
+
+        return name + suffix
 
-        for regexp_replace, regexp_substit in replacements:
-            filename = re.sub(regexp_replace, regexp_substit, filename)
 
-        return filename
+def _forbidden_pattern(translation):
+    return re.compile("[" + re.escape("".join(map(chr, translation))) + "]")
 
 
-class FilesystemExFAT(FilesystemGeneric):
+FilesystemGeneric._FORBIDDEN = _forbidden_pattern(FilesystemGeneric.TRANSLATION)
+
+
+class FilesystemWindows(FilesystemGeneric):
+    # FAT, exFAT and NTFS count UTF-16 code units instead of bytes.
+    NAME_MAX = 255
+    MAX_UNITS_PER_CHARACTER = 2
+
+    TRANSLATION = str.maketrans({
+        **{chr(c): None for c in range(0x20)},
+        "/": "_",
+        "\\": "_",
+        ":": "_",
+        "*": "_",
+        "?": "!",
+        "\"": "'",
+        "<": "(",
+        ">": ")",
+        "|": "_",
+    })
+
+    RESERVED_NAMES = frozenset(["CON", "PRN", "AUX", "NUL",
+                                *(f"COM{i}" for i in range(1, 10)),
+                                *(f"LPT{i}" for i in range(1, 10))])
+    TRAILING_CHARACTERS = ". "
+
+    @classmethod
+    def name_length(cls, name):
+        return len(name.encode("utf-16-le", "surrogatepass")) // 2
+
+    @classmethod
+    def truncate(cls, name, limit):
+        encoded = name.encode("utf-16-le", "surrogatepass")
+        if len(encoded) <= limit * 2:
+            return name
+        return encoded[:limit * 2].decode("utf-16-le", "ignore")
+
+    @classmethod
+    def name_limit(cls, path=None):
+        # statvfs reports the byte size of the longest encoded name for these,
+        # not the number of characters.
+        return cls.NAME_MAX
+
+
+class FilesystemFAT(FilesystemWindows):
+    ...
+
+
+class FilesystemExFAT(FilesystemWindows):
+    ...
+
+
+class FilesystemNTFS(FilesystemWindows):
     ...
 
 
 _fsname_klass = {
     "exfat": FilesystemExFAT,
+    "vfat": FilesystemFAT,
+    "msdos": FilesystemFAT,
+    "fat": FilesystemFAT,
+    "ntfs": FilesystemNTFS,
+    "ntfs3": FilesystemNTFS,
+    "fuseblk": FilesystemNTFS,
 }
 
 
+class MountEntry(NamedTuple):
+    device: int
+    mountpoint: pathlib.Path
+    fstype: str
+
+
+class MountTable:
+    MOUNTINFO = "/proc/self/mountinfo"
+    # Without mountinfo there is nothing to poll, so the psutil fallback is
+    # simply reloaded after a while.
+    RELOAD_SECONDS = 5.0
+
+    _ESCAPE = re.compile(r"\\([0-7]{3})")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+        self._mounts: Dict[int, MountEntry] = dict()
+        self._by_device: Dict[int, MountEntry] = dict()
+        self._name_max: Dict[int, int] = dict()
+
+        self._fd: Optional[int] = None
+        self._poll = None
+        self._loaded_at: Optional[float] = None
+
+        try:
+            self._fd = os.open(self.MOUNTINFO, os.O_RDONLY)
+        except OSError:
+            return
+
+        # The kernel flags mountinfo with POLLPRI | POLLERR whenever the mount
+        # namespace changes, which makes checking for changes a single syscall.
+        self._poll = select.poll()
+        self._poll.register(self._fd, select.POLLPRI | select.POLLERR)
+
+    def _changed(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self._poll is not None:
+            return len(self._poll.poll(0)) > 0
+        return time.monotonic() - self._loaded_at > self.RELOAD_SECONDS
+
+    def _load(self) -> None:
+        mounts = self._read_mountinfo() if self._fd is not None else self._read_psutil()
+
+        self._mounts = {m.device: m for m in mounts}
+        self._by_device = dict(self._mounts)
+        self._name_max = dict()
+        self._loaded_at = time.monotonic()
+
+    def _read_mountinfo(self) -> List[MountEntry]:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        chunks = list()
+        while True:
+            chunk = os.read(self._fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        mounts = list()
+        for line in b"".join(chunks).decode("utf-8", "surrogateescape").splitlines():
+            # <id> <parent> <major:minor> <root> <mountpoint> <options> [optional...] - <fstype> ...
+            fields = line.split(" ")
+            separator = fields.index("-", 6)
+            major, minor = fields[2].split(":")
+            mountpoint = self._ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), fields[4])
+            mounts.append(MountEntry(os.makedev(int(major), int(minor)),
+                                     pathlib.Path(mountpoint), fields[separator + 1]))
+        return mounts
+
+    @staticmethod
+    def _read_psutil() -> List[MountEntry]:
+        import psutil
+
+        mounts = list()
+        for part in psutil.disk_partitions(all=True):
+            try:
+                device = os.stat(part.mountpoint).st_dev
+            except OSError:
+                continue
+            mounts.append(MountEntry(device, pathlib.Path(part.mountpoint), part.fstype))
+        return mounts
+
+    def _find_by_path(self, path: pathlib.Path) -> Optional[MountEntry]:
+        # Devices of btrfs subvolumes, overlayfs and the like don't appear in
+        # the mount table, the closest mountpoint above the path is used then.
+        path = path.resolve()
+        best = None
+        for mount in self._mounts.values():
+            if path == mount.mountpoint or mount.mountpoint in path.parents:
+                if best is None or len(mount.mountpoint.parts) > len(best.mountpoint.parts):
+                    best = mount
+        return best
+
+    def lookup(self, path: Union[str, pathlib.Path]) -> Optional[MountEntry]:
+        path = pathlib.Path(path)
+        device = os.stat(path).st_dev
+
+        with self._lock:
+            if self._changed():
+                self._load()
+
+            if device in self._by_device:
+                return self._by_device[device]
+
+            mount = self._by_device[device] = self._find_by_path(path)
+            return mount
+
+    def name_max(self, path: Union[str, pathlib.Path]) -> int:
+        device = os.stat(path).st_dev
+
+        with self._lock:
+            name_max = self._name_max.get(device, None)
+        if name_max is None:
+            name_max = os.statvfs(path).f_namemax
+            with self._lock:
+                self._name_max[device] = name_max
+        return name_max
+
+
+_mount_table: Optional[MountTable] = None
+_mount_table_lock = threading.Lock()
+
+
+def mount_table() -> MountTable:
+    global _mount_table
+
+    with _mount_table_lock:
+        if _mount_table is None:
+            _mount_table = MountTable()
+        return _mount_table
+
+
 def get_fs_class(path):
-    path = pathlib.Path(path).resolve(strict=True)
-
-    partitions = {}
-    
-    for part in psutil.disk_partitions():
-        partitions[pathlib.Path(part.mountpoint)] = part.fstype
-   
-    if path in partitions:
-        if partitions[path] in _fsname_klass:
-            return _fsname_klass[partitions[path]]
-        else:
-            return FilesystemGeneric
-    
-    while path != pathlib.Path("/"):
-        path = path.parent
-
-        if path in partitions:
-            if partitions[path] in _fsname_klass:
-                return _fsname_klass[partitions[path]]
-            else:
-                return FilesystemGeneric
-    
-    return FilesystemGeneric
+    mount = mount_table().lookup(path)
+    if mount is None:
+        return FilesystemGeneric
+
+    return _fsname_klass.get(mount.fstype, FilesystemGeneric)
+
+
+def get_name_max(path):
+    return mount_table().name_max(path)
@@ -0,0 +1,133 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+
+from typing import Dict, Iterable, List
+
+from krautcat.audio.fingerprint import fingerprint_file
+from krautcat.audio.file.mime import file_class
+from krautcat.audio.library.index import LibraryIndex, default_index_path
+
+
+class _DisjointSet:
+    def __init__(self) -> None:
+        self._parent: Dict[pathlib.Path, pathlib.Path] = dict()
+
+    def find(self, item: pathlib.Path) -> pathlib.Path:
+        parent = self._parent.setdefault(item, item)
+        if parent != item:
+            parent = self._parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a: pathlib.Path, b: pathlib.Path) -> None:
+        self._parent[self.find(a)] = self.find(b)
+
+    def groups(self) -> List[List[pathlib.Path]]:
+        groups = dict()
+        for item in self._parent:
+            groups.setdefault(self.find(item), list()).append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def _audio_files(directories: List[pathlib.Path]) -> Iterable[pathlib.Path]:
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = pathlib.Path(root, name).resolve()
+                if path.stat().st_size == 0:
+                    continue
+
+                file_klass = file_class(path)
+                if file_klass is not None and hasattr(file_klass, "gst_decoder"):
+                    yield path
+
+
+def _fingerprint(path: pathlib.Path):
+    audio_file = file_class(path)(path, open=False)
+    return fingerprint_file(path, audio_file.gst_parser, audio_file.gst_decoder)
+
+
+def scan(index: LibraryIndex, paths: List[pathlib.Path], jobs: int) -> None:
+    pending = [path for path in paths if not index.is_fingerprinted(path)]
+    if len(pending) == 0:
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_fingerprint, path): path for path in pending}
+
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                duration, fingerprint = future.result()
+            except Exception as e:
+                print(f"Failed to fingerprint '{path}': {e}", file=sys.stderr)
+                continue
+
+            index.store_fingerprint(path, duration, fingerprint)
+
+
+def find_duplicates(index: LibraryIndex, paths: List[pathlib.Path],
+                    threshold: float) -> List[List[pathlib.Path]]:
+    clusters = _DisjointSet()
+    for path in paths:
+        fingerprint = index.fingerprint(path)
+        if fingerprint is None or len(fingerprint) == 0:
+            continue
+
+        for match in index.lookup(fingerprint, threshold=threshold):
+            if match.path != path:
+                clusters.union(path, match.path)
+
+    return sorted(clusters.groups())
+
+
+class Argparser:
+    def __init__(self):
+        argparser = self._argparser = argparse.ArgumentParser(
+                description="Find duplicate tracks by acoustic fingerprints")
+
+        argparser.add_argument("directory", action="store",
+                               type=pathlib.Path, nargs="+",
+                               help="Directories to scan recursively")
+        argparser.add_argument("--index", action="store",
+                               type=pathlib.Path, default=default_index_path(),
+                               help="Path to library index database")
+        argparser.add_argument("-t", "--threshold", action="store",
+                               type=float, default=0.35,
+                               help="Maximum fingerprint bit error rate for duplicates")
+        argparser.add_argument("--json", action="store_true",
+                               help="Print clusters as JSON lines")
+        argparser.add_argument("-j", "--jobs", action="store",
+                               type=int, default=os.cpu_count(),
+                               help="Number of parallel fingerprinting processes")
+
+    def parse(self, args):
+        return self._argparser.parse_args(args)
+
+
+def main():
+    argparser = Argparser()
+    cli_args = argparser.parse(sys.argv[1:])
+
+    paths = list(_audio_files(cli_args.directory))
+
+    with LibraryIndex(cli_args.index) as index:
+        scan(index, paths, cli_args.jobs)
+        clusters = find_duplicates(index, paths, cli_args.threshold)
+
+    for cluster in clusters:
+        if cli_args.json:
+            print(json.dumps({"files": [str(p) for p in cluster],
+                              "albums": sorted({str(p.parent) for p in cluster})}))
+        else:
+            print(f"Duplicates across {len({p.parent for p in cluster})} album(s):")
+            for path in cluster:
+                print(f"  {path}")
+
+    return 0
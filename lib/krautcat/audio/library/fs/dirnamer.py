@@ -4,34 +4,33 @@ import argparse
 import asyncio
 import concurrent
 import concurrent.futures
+import itertools
 import json
 import pathlib
-import re
-import shutil
-import string
+import signal
 import sys
 import threading
 
 from collections.abc import Iterable, Iterator
 from enum import Enum
 from pathlib import Path
-from typing import Tuple, Callable, Any, Optional, Union, Awaitable, Pattern, ClassVar
+from typing import Tuple, Callable, Any, List, Optional, Union, Awaitable, Pattern, ClassVar
 
 if sys.version_info >= (3, 8):
     from typing import Protocol
 else:
     from typing_extensions import Protocol
 
-import puremagic
-import puremagic.main
-import mutagen.mp3
-import mutagen.flac
-
 import krautcat.audio.fs
 
 from krautcat.audio.exceptions import MutagenOpenFileError
 from krautcat.audio.file.audio import *
 from krautcat.audio.file.mime import file_class
+from krautcat.audio.library.fs.journal import (JournalError, RenameJournal, default_journal_path,
+                                                plan_records, resume, undo)
+from krautcat.audio.library.fs.plan import AlbumPlan, RenamePlan
+from krautcat.audio.library.fs.template import FIELDS, Template, TemplateError
+from krautcat.audio.library.fs.view import LibraryView, ViewError, ViewLink
 from krautcat.ui.tui import TextMessageWithSpinner, UI as TUI
 
 
@@ -98,6 +97,14 @@ class StdinType(Enum):
         return self.value
 
 
+class PlanFormat(Enum):
+    TEXT = "text"
+    JSON = "json"
+
+    def __str__(self):
+        return self.value
+
+
 class StdinHandler:
     def readline(self):
         pass
@@ -128,6 +135,20 @@ class StdinHandlerJson(StdinHandler):
         return obj["directory"]
 
 
+def load_metadata(entry, file_kls, index=None):
+    stat = None
+    if index is not None:
+        stat = entry.stat()
+        metadata = index.metadata(entry, stat)
+        if metadata is not None:
+            return metadata
+
+    metadata = file_kls(entry).metadata
+    if index is not None and metadata is not None:
+        index.store_metadata(entry, metadata, stat)
+    return metadata
+
+
 class RenameAlbumDirWorker:
     def __init__(self, album_path, config):
         self.command_config = config.command_config
@@ -136,50 +157,45 @@ class RenameAlbumDirWorker:
         self.album_path = album_path 
 
     def __call__(self, *args, **kwargs):
-        self._rename_directory(self.album_path)
-        return self.album_path
-
-    def _rename_directory(self, directory):
-        directory_filesystem = krautcat.audio.fs.get_fs_class(directory)
+        return self.plan(self.album_path)
 
+    def plan(self, directory):
         if not directory.is_dir():
-            return 
+            return []
 
+        plans = list()
+        for entry in sorted(directory.iterdir()):
+            if entry.is_dir():
+                plans.extend(self.plan(entry))
+
+        directory_filesystem = krautcat.audio.fs.get_fs_class(directory)
         name, files = self._get_name_from_dir_content(directory, directory_filesystem)
-        old_name = directory.name
-        target_name = name
-
-        if target_name is not None and target_name != directory.name:
-            count = 2
-            renamed = False
-            while not renamed:
-                try:
-                    new_directory_name = self.command_config.directories[0] / target_name
-                    new_directory_name.mkdir(parents=True, exist_ok=True)
-                    for entry in directory.iterdir():
-                        entry_name = entry.name
-                        if entry_name in files:
-                            entry_name_new = files[entry_name]
-                        else:
-                            entry_name_new = entry_name
-                        shutil.move(directory / entry_name, new_directory_name / entry_name_new) 
-                    renamed = True
-                    if target_name != old_name:
-                        shutil.rmtree(old_name)
-                except OSError as e:
-                    print(e, file=sys.stderr)
+        if name is not None:
+            plans.append(AlbumPlan(directory, name, files))
+
+        return plans
 
     def _get_name_from_dir_content(self, album_dir: Path,
                                    directory_filesystem: krautcat.audio.fs.FilesystemGeneric):
+        name_limit = directory_filesystem.name_limit(album_dir)
+        format_kwargs, music_file_entries = self._scan_album(album_dir, directory_filesystem,
+                                                             name_limit)
+        if format_kwargs is None:
+            return None, None
+
+        dirname = self.command_config.dirname_template.render(
+            format_kwargs, directory_filesystem.escape_filename
+        )
+        return directory_filesystem.sanitize_filename(dirname, name_limit), music_file_entries
+
+    def _scan_album(self, album_dir: Path,
+                    directory_filesystem: krautcat.audio.fs.FilesystemGeneric, name_limit: int):
         stats = TagStatistics() 
 
         music_file_entries = dict()
 
         audio_files = 0
         for entry in album_dir.iterdir():
-            if entry.is_dir():
-                self._rename_directory(entry)
-
             if not entry.is_file() or entry.stat().st_size == 0:
                 continue
             
@@ -189,32 +205,24 @@ class RenameAlbumDirWorker:
                 continue
 
             try:
-                file = file_kls(entry)
+                metadata = load_metadata(entry, file_kls, self.common_config.index)
             except MutagenOpenFileError:
                 continue
 
-            if file.metadata is None:
+            if metadata is None:
                 continue
             
             audio_files += 1
-            stats.update(file.metadata)
-
-            filename_format = self.command_config.filename_format
-            filename_format = re.sub(r"\[(.*?\{disc_number\}.*?)\]",
-                                     r"\g<1>" if file.metadata.disc_number is not None else r"",
-                                     filename_format)
-            filename_format_kwargs = {
-                "track_number": file.metadata.track_number,
-            }
-            if file.metadata.track_name is not None:
-                filename_format_kwargs["track_name"] = directory_filesystem.escape_filename(file.metadata.track_name)
-            else:
-                filename_format_kwargs["track_name"] = ""
-            if file.metadata.disc_number is not None:
-                filename_format_kwargs["disc_number"] = file.metadata.disc_number
-            music_file_entries[entry.name] = filename_format.format(
-                    **filename_format_kwargs
-                ) + f".{file.EXTENSION}"
+            stats.update(metadata)
+
+            filename_template = self.command_config.filename_template
+            filename_values = filename_template.values(metadata)
+            if filename_values.get("track_name", None) is None:
+                filename_values["track_name"] = ""
+            music_file_entries[entry.name] = directory_filesystem.sanitize_filename(
+                    filename_template.render(filename_values, directory_filesystem.escape_filename),
+                    name_limit, suffix=f".{file_kls.EXTENSION}"
+                )
 
         if audio_files == 0:
             return None, None
@@ -223,38 +231,57 @@ class RenameAlbumDirWorker:
         album = stats.album
         date = stats.date
 
-        dirname_format = self.command_config.dirname_format
+        format_kwargs = {
+            "artist": artist if artist is not None else "None",
+            "full_artist": full_artist,
+            "album": album if album is not None else "None",
+            "year": date.year if date is not None and date.year else None,
+        }
 
-        format_kwargs = {}
-        if "artist" in self.command_config.dirname_format_fields:
-            if artist is None:
-                artist = "None"
-            format_kwargs["artist"] = directory_filesystem.escape_filename(artist)
-            
-            if full_artist is not None:
-                if "{full_artist}" in dirname_format:
-                    dirname_format = re.sub(r"\[(.*?\{full_artist\}.*?)\]",
-                                            r"\g<1>",
-                                            dirname_format)
-                    format_kwargs["full_artist"] = directory_filesystem.escape_filename(full_artist)
-            else:
-                if "full_artist" in dirname_format:
-                    dirname_format = re.sub(r"\[(.*?\{full_artist\}.*?)\]",
-                                            r"",
-                                            dirname_format)
-
-        if "album" in self.command_config.dirname_format_fields:
-            if album is None:
-                album = "None"
-            format_kwargs["album"] = directory_filesystem.escape_filename(album)
-    
-        if "year" in self.command_config.dirname_format_fields:
-            if date is None:
-                date = None
-            format_kwargs["year"] = date
+        return format_kwargs, music_file_entries
 
-        print(music_file_entries, file=sys.stderr)
-        return dirname_format.format(**format_kwargs), music_file_entries
+
+class ViewWorker(RenameAlbumDirWorker):
+    def __init__(self, album_path, config):
+        super().__init__(album_path, config)
+
+        view_root = self.command_config.view_root
+        view_root.mkdir(parents=True, exist_ok=True)
+        self.view_filesystem = krautcat.audio.fs.get_fs_class(view_root)
+        self.name_limit = self.view_filesystem.name_limit(view_root)
+
+    def __call__(self, *args, **kwargs):
+        return self.links(self.album_path)
+
+    def links(self, directory):
+        if not directory.is_dir() or directory == self.command_config.view_root:
+            return []
+
+        links = list()
+        for entry in sorted(directory.iterdir()):
+            if entry.is_dir():
+                links.extend(self.links(entry))
+
+        format_kwargs, files = self._scan_album(directory, self.view_filesystem, self.name_limit)
+        if format_kwargs is None:
+            return links
+
+        # Unlike album directory names, view paths may nest, e.g.
+        # "{year}/{artist} — {album}". Separators in tag values are escaped
+        # before rendering, so only the format itself adds levels.
+        dirname = self.command_config.dirname_template.render(
+            format_kwargs, self.view_filesystem.escape_filename
+        )
+        components = [self.view_filesystem.sanitize_filename(c, self.name_limit)
+                      for c in dirname.split("/") if c]
+        view_dir = "/".join(c for c in components if c)
+
+        for name, view_name in sorted(files.items()):
+            source = directory.resolve() / name
+            links.append(ViewLink(f"{view_dir}/{view_name}" if view_dir else view_name,
+                                  source, source.stat().st_ino))
+
+        return links
 
 
 class RenameFilesWorker:
@@ -265,100 +292,75 @@ class RenameFilesWorker:
         self.album_path = album_path 
 
     def __call__(self):
-        self._rename_files(self.album_path)
-
-    def _rename_files(self, album_path):
-        directory_filesystem = krautcat.audio.fs.get_fs_class(album_path)
-        filename_format = self.command_config.dirname_format
+        return self.plan(self.album_path)
 
+    def plan(self, album_path):
         if not album_path.is_dir():
-            return 
+            return []
+
+        directory_filesystem = krautcat.audio.fs.get_fs_class(album_path)
+        name_limit = directory_filesystem.name_limit(album_path)
 
-        for entry in album_path.iterdir():
+        plans = list()
+        files = dict()
+        for entry in sorted(album_path.iterdir()):
             if entry.is_dir():
-                self._rename_files(entry)
+                plans.extend(self.plan(entry))
 
             if not entry.is_file() or entry.stat().st_size == 0:
-                print("Not a file")
                 continue
 
             file_kls = file_class(entry)
 
             if file_kls is None:
-                print(f"Not found audiofile class for {entry}")
                 continue 
 
-            file = file_kls(entry)
-
-            format_kwargs = {}
-            
-            filename_format = re.sub(r"\[(.*?\{disc_number\}.*?)\]",
-                                     r"\1" if file.metadata.disc_number is not None else r"",
-                                     filename_format)
-            print(f"{filename_format}", file=sys.stderr)
-            
-            if "artist" in self.command_config.dirname_format_fields:
-                format_kwargs["artist"] = file.metadata.artist
-            if "album" in self.command_config.dirname_format_fields:
-                format_kwargs["album"] = file.metadata.album
-            if "year" in self.command_config.dirname_format_fields:
-                format_kwargs["year"] = file.metadata.date
-
-            if ("disc_number" in filename_format
-                    and "disc_number" in self.command_config.dirname_format_fields):
-                format_kwargs["disc_number"] = file.metadata.disc_number
-                print(f"Filename format: {filename_format}", file=sys.stderr)
-
-            if "track_number" in self.command_config.dirname_format_fields:
-                if file.metadata.track_number is not None:
-                    format_kwargs["track_number"] = file.metadata.track_number
-                else:
-                    format_kwargs["track_number"] = ""
-            if "track_name" in self.command_config.dirname_format_fields:
-                format_kwargs["track_name"] = file.metadata.track_name
-
-            new_name = filename_format.format(**format_kwargs) + "." + file.EXTENSION
-            name = directory_filesystem.escape_filename(new_name)
-
-            if name == entry.name:
+            metadata = load_metadata(entry, file_kls, self.common_config.index)
+            if metadata is None:
                 continue
-            else:
-                print(f"Renamed {entry} to {name}")
 
-            print(f"{entry} to {entry.parent / name}", file=sys.stderr)
-            entry.rename(entry.parent / name)
+            filename_template = self.command_config.filename_template
+            format_kwargs = filename_template.values(metadata)
+            for field in ("track_number", "track_name"):
+                if format_kwargs.get(field, None) is None:
+                    format_kwargs[field] = ""
+
+            name = directory_filesystem.sanitize_filename(
+                filename_template.render(format_kwargs, directory_filesystem.escape_filename),
+                name_limit, suffix=f".{file_kls.EXTENSION}"
+            )
+
+            if name != entry.name:
+                files[entry.name] = name
+
+        plans.append(AlbumPlan(album_path, None, files))
+        return plans
 
 
 
 class ConfigurationRenameAlbumDir:
+    DIRNAME_FIELDS = ("artist", "full_artist", "year", "album")
+
     def __init__(self, cli_args, config_file=None):
-        self.directories = cli_args.directory
+        self.directories = [directory.resolve() for directory in cli_args.directory]
         self.library_root = cli_args.library_root
 
         self.stdin = cli_args.stdin
 
-        self.dirname_format_fields = set()
-        if cli_args.format is not None and self._validate_dirname_format(cli_args.format):
-            self.dirname_format = cli_args.format
-        else:
-            self.dirname_format = "{artist} — {year} — {album}"
-            self.dirname_format_fields.update(["artist", "year", "album"])
+        self.template_error = None
+        try:
+            self.dirname_template = Template(cli_args.format or "{artist} — {year} — {album}",
+                                             self.DIRNAME_FIELDS)
+        except TemplateError as e:
+            self.template_error = e
 
-        self.filename_format = "[{disc_number}. ]{track_number:0>02}. {track_name}"
-
-    def _validate_dirname_format(self, format_str):
-        allowed_format_name = set(["artist", "full_artist", "year", "album"]) 
-    
-        fmtter = string.Formatter()
-        for _, field_name, _, _ in fmtter.parse(format_str):
-            if field_name in allowed_format_name:
-                self.dirname_format_fields.add(field_name)
-            else:
-                return False
-
-        return True
+        self.filename_template = Template("[{disc_number}. ]{track_number:0>02}. {track_name}",
+                                          FIELDS)
 
     def validate(self, cli_args):
+        if self.template_error is not None:
+            print(self.template_error, file=sys.stderr)
+            return False
         if cli_args.stdin is StdinType.NONE and len(self.directories) == 0:
             return False
         else:
@@ -367,39 +369,72 @@ class ConfigurationRenameAlbumDir:
     
 class ConfigurationRenameFiles:
     def __init__(self, cli_args, config_file=None):
-        self.directories = cli_args.directory
+        self.directories = [directory.resolve() for directory in cli_args.directory]
         self.library_root = cli_args.library_root
 
         self.stdin = cli_args.stdin
 
-        self.dirname_format_fields = set()
-        if cli_args.format is not None and self._validate_dirname_format(cli_args.format):
-            self.dirname_format = cli_args.format
-        else:
-            self.dirname_format = "[{disc_number}. ]{track_number:0>02}. {track_name}"
-            self.dirname_format_fields.update(["disc_number", "track_number", "track_name"])
-
-    def _validate_dirname_format(self, format_str):
-        allowed_format_name = set(["artist", "year", "album", "track_number", "track_name"]) 
-        
-        for _, field_name, _, _ in string.Formatter.parse(format_str):
-            if field_name in allowed_format_name:
-                self.dirname_format_fields.add(field_name)
-            else:
-                return False
-
-        return True
+        self.template_error = None
+        try:
+            self.filename_template = Template(
+                cli_args.format or "[{disc_number}. ]{track_number:0>02}. {track_name}", FIELDS
+            )
+        except TemplateError as e:
+            self.template_error = e
 
     def validate(self, cli_args):
+        if self.template_error is not None:
+            print(self.template_error, file=sys.stderr)
+            return False
         if cli_args.stdin is StdinType.NONE and len(self.directories) == 0:
             return False
         else:
             return True
         
 
+class ConfigurationView:
+    def __init__(self, cli_args, config_file=None):
+        self.directories = [directory.resolve() for directory in cli_args.directory]
+        self.library_root = cli_args.library_root
+
+        self.view_root = cli_args.view_root.resolve()
+        self.symlink = cli_args.symlink
+
+        self.template_error = None
+        try:
+            self.dirname_template = Template(cli_args.format or "{artist}/{year} — {album}",
+                                             ConfigurationRenameAlbumDir.DIRNAME_FIELDS)
+            self.filename_template = Template(
+                cli_args.filename_format or "[{disc_number}. ]{track_number:0>02}. {track_name}",
+                FIELDS
+            )
+        except TemplateError as e:
+            self.template_error = e
+
+    def validate(self, cli_args):
+        if self.template_error is not None:
+            print(self.template_error, file=sys.stderr)
+            return False
+        return len(self.directories) > 0
+
+
 class Configuration:
     def __init__(self, cli_args, config_file=None):
         self.no_escaping = cli_args.no_escaping
+        self.journal = cli_args.journal
+
+        self.dry_run = cli_args.dry_run
+        self.plan_format = cli_args.plan_format
+
+        self.watch = cli_args.watch
+        # Views are rebuilt from the whole library, so they always keep tags
+        # in the index.
+        if cli_args.watch or cli_args.index is not None or cli_args.command == "view":
+            from krautcat.audio.library.index import LibraryIndex, default_index_path
+
+            self.index = LibraryIndex(cli_args.index or default_index_path())
+        else:
+            self.index = None
 
         command_config_class = self.get_command_config_class(cli_args.command)
         if command_config_class is not None:
@@ -433,6 +468,35 @@ class Argparser:
                                choices=["tui", "no-ui"],
                                help="UI type",
                                default="tui")
+        argparser.add_argument("--journal", action="store",
+                               type=Path, default=None,
+                               help="Path to the rename journal (defaults to a new file in "
+                               "$XDG_STATE_HOME/krautcat/dirnamer)")
+
+        argparser.add_argument("-n", "--dry-run", action="store_true",
+                               help="Print the rename plan instead of renaming")
+        argparser.add_argument("--plan-format", action="store",
+                               type=PlanFormat,
+                               choices=list(PlanFormat),
+                               default=PlanFormat.TEXT,
+                               help="Dry run output format, json plans can be executed "
+                               "later with --resume")
+
+        argparser.add_argument("--watch", action="store_true",
+                               help="Keep running and rename albums under the given library "
+                               "roots as they change")
+        argparser.add_argument("--index", action="store",
+                               type=Path, default=None,
+                               help="Library index caching tags between runs (always used "
+                               "with --watch)")
+
+        journal_group = argparser.add_mutually_exclusive_group()
+        journal_group.add_argument("--resume", action="store",
+                                   type=Path, default=None, metavar="JOURNAL",
+                                   help="Continue an interrupted run from its journal")
+        journal_group.add_argument("--undo", action="store",
+                                   type=Path, default=None, metavar="JOURNAL",
+                                   help="Roll back the renames recorded in a journal")
 
         subparsers = argparser.add_subparsers(title="Commands", dest="command")
 
@@ -467,6 +531,26 @@ class Argparser:
         rename_files_parser.add_argument("-f", "--format", action="store",
                                          default=None, help="Format for naming albums'"
                                          " directories")
+
+        view_parser = subparsers.add_parser("view",
+                                            help="Build a tree of links to the library "
+                                            "under another layout")
+        view_parser.add_argument("--library-root", action="store_true",
+                                 help="Supply root as library root")
+        view_parser.add_argument("-s", "--symlink", action="store_true",
+                                 help="Make symlinks instead of hardlinks")
+        view_parser.add_argument("-f", "--format", action="store",
+                                 default=None, help="Format for albums' directories, '/' "
+                                 "makes nested directories")
+        view_parser.add_argument("--filename-format", action="store",
+                                 default=None, help="Format for file names")
+        view_parser.add_argument("view_root", action="store",
+                                 type=Path, metavar="view-root",
+                                 help="Root directory of the view")
+        view_parser.add_argument("directory", action="store",
+                                 type=Path,
+                                 nargs="+",
+                                 help="Directory with album or library root directory")
     
     def parse(self, args):
         return self.argparser.parse_args(args[1:])
@@ -492,22 +576,26 @@ class TuiRenameAlbumDirWorker:
         self._config = config
         self._ui = ui
     
-    def __call__(self) -> pathlib.Path:
+    def __call__(self) -> List[AlbumPlan]:
         widget_key = self._ui.view << TextMessageWithSpinner(f"Scanning {self.directory}...",
                                                            "Scanning done")       
         worker = RenameAlbumDirWorker(self.directory, self._config)
-        album_path = worker()
-        
-        if album_path == self.directory:
-            done_msg = f"Directory '{album_path}' didn't change"
+        plans = [p for p in worker() if not p.is_noop()]
+
+        if len(plans) == 0:
+            done_msg = f"Directory '{self.directory}' didn't change"
         else:
-            done_msg = f"Renamed {self.directory} to {album_path}"
+            done_msg = f"Planned {len(plans)} rename(s) in {self.directory}"
         self._ui.view[widget_key]._msg_done = done_msg
 
         self._ui.view[widget_key].done() 
         del self._ui.view[widget_key]
 
-        return album_path
+        return plans
+
+    @staticmethod
+    def execute(results: List[List[AlbumPlan]], config: Configuration, ui: TUI) -> int:
+        return execute_rename_plan([album for plans in results for album in plans], config, ui)
 
 
 class TuiRenameFilesWorker:
@@ -517,37 +605,166 @@ class TuiRenameFilesWorker:
         self._config = config
         self._ui = ui
     
-    def __call__(self) -> pathlib.Path:
+    def __call__(self) -> List[AlbumPlan]:
         widget_key = self._ui.view << TextMessageWithSpinner(f"Scanning {self.directory}...",
                                                            "Scanning done")       
         worker = RenameFilesWorker(self.directory, self._config)
-        album_path = worker()
+        plans = [p for p in worker() if not p.is_noop()]
        
-        done_msg = f"Renamed files in {album_path}" 
+        done_msg = f"Planned renames of {sum(len(p.files) for p in plans)} file(s) in {self.directory}"
         self._ui.view[widget_key]._msg_done = done_msg
 
         self._ui.view[widget_key].done() 
         del self._ui.view[widget_key]
 
-        return album_path
+        return plans
+
+    @staticmethod
+    def execute(results: List[List[AlbumPlan]], config: Configuration, ui: TUI) -> int:
+        return execute_rename_plan([album for plans in results for album in plans], config, ui)
+
+
+class TuiViewWorker:
+    def __init__(self, directory: pathlib.Path,
+                 config: Configuration, ui: TUI) -> None:
+        self.directory = directory
+        self._config = config
+        self._ui = ui
+
+    def __call__(self) -> List[ViewLink]:
+        widget_key = self._ui.view << TextMessageWithSpinner(f"Scanning {self.directory}...",
+                                                           "Scanning done")
+        links = ViewWorker(self.directory, self._config)()
+
+        self._ui.view[widget_key]._msg_done = f"Found {len(links)} file(s) in {self.directory}"
+        self._ui.view[widget_key].done()
+        del self._ui.view[widget_key]
+
+        return links
+
+    @staticmethod
+    def execute(results: List[List[ViewLink]], config: Configuration, ui: TUI) -> int:
+        command_config = config.command_config
+        view = LibraryView(command_config.view_root, symlink=command_config.symlink)
+
+        widget_key = ui.view << TextMessageWithSpinner(f"Updating {view.root}...",
+                                                      f"Updated {view.root}")
+        try:
+            result = view.update(link for links in results for link in links)
+        except (OSError, ViewError) as e:
+            print(e, file=sys.stderr)
+            return 1
+        finally:
+            ui.view[widget_key].done()
+            del ui.view[widget_key]
+
+        for conflict in result.conflicts:
+            print(f"Skipped '{conflict.source}' -> '{conflict.path}': {conflict.reason}",
+                  file=sys.stderr)
+        for error in result.errors:
+            print(error, file=sys.stderr)
+        print(f"View '{view.root}': {result.created} link(s) created, {result.removed} removed, "
+              f"{result.unchanged} unchanged", file=sys.stderr)
+
+        return 1 if result.errors or result.conflicts else 0
+
+
+def execute_rename_plan(albums: List[AlbumPlan], config: Configuration, ui: TUI) -> int:
+    plan = RenamePlan(albums)
+    for conflict in plan.conflicts:
+        print(f"Skipped '{conflict.source}' -> '{conflict.target}': {conflict.reason}",
+              file=sys.stderr)
+
+    if len(plan) == 0:
+        return 1 if plan.conflicts else 0
+
+    journal_path = config.journal if config.journal is not None else default_journal_path()
+    with RenameJournal(journal_path) as journal:
+        widget_key = ui.view << TextMessageWithSpinner(f"Renaming {len(plan)} album(s)...",
+                                                      f"Renamed {len(plan)} album(s)")
+        errors = plan.execute(journal)
+        ui.view[widget_key].done()
+        del ui.view[widget_key]
+
+    for error in errors:
+        print(error, file=sys.stderr)
+    print(f"Journal written to '{journal_path}'", file=sys.stderr)
+
+    return 1 if errors or plan.conflicts else 0
+
+
+def replay_journal(namespace: argparse.Namespace) -> int:
+    try:
+        if namespace.undo is not None:
+            errors = undo(namespace.undo)
+        else:
+            errors = resume(namespace.resume)
+    except (OSError, JournalError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    return 1 if errors else 0
 
 
 def classic_unix_ui_main(config: Configuration, ns: argparse.Namespace) -> int:
     pass
 
 
-async def tui_main(config: Configuration, ns: argparse.Namespace) -> int: 
-    worker = get_worker_by_name(ns.command, ns.ui)
-    loop = asyncio.get_event_loop()
-
+def get_directories(config: Configuration) -> List[pathlib.Path]:
     if config.command_config.library_root:
-        directories = [
+        return [
             e
             for e in config.command_config.directories[0].iterdir()
             if e.is_dir()
         ]
     else:
-        directories = config.command_config.directories
+        return config.command_config.directories
+
+
+def write_plan(plan: RenamePlan, plan_format: PlanFormat, output) -> None:
+    if plan_format is PlanFormat.JSON:
+        records = itertools.chain(
+            plan_records(plan.operations()),
+            ({"op": "conflict", "source": str(conflict.source),
+              "target": str(conflict.target), "reason": conflict.reason}
+             for conflict in plan.conflicts)
+        )
+        lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    else:
+        lines = itertools.chain(
+            (f"'{operation.source}' -> '{operation.target}'\n"
+             for operation in plan.operations()),
+            (f"Skipped '{conflict.source}' -> '{conflict.target}': {conflict.reason}\n"
+             for conflict in plan.conflicts)
+        )
+
+    output.writelines(lines)
+    output.flush()
+
+
+def dry_run_main(config: Configuration, ns: argparse.Namespace) -> int:
+    worker = get_worker_by_name(ns.command, "")
+
+    # Plans are written in one piece once every directory is scanned, so the
+    # output is never mixed with progress messages.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as pool:
+        results = pool.map(lambda directory: worker(directory, config)(),
+                           get_directories(config))
+        plan = RenamePlan([album for plans in results for album in plans])
+
+    write_plan(plan, config.plan_format, sys.stdout)
+
+    return 1 if plan.conflicts else 0
+
+
+async def tui_main(config: Configuration, ns: argparse.Namespace) -> int: 
+    worker = get_worker_by_name(ns.command, ns.ui)
+    loop = asyncio.get_event_loop()
+
+    directories = get_directories(config)
     tasks = list()
 
     async with TUI() as ui:
@@ -556,10 +773,64 @@ async def tui_main(config: Configuration, ns: argparse.Namespace) -> int:
             for directory in directories:
                 tasks.append(loop.run_in_executor(pool,
                                                   worker(directory, config, ui)))
-            completed, pending = await asyncio.wait([*tasks])
-    await asyncio.gather(*pending)
+            results = await asyncio.gather(*tasks)
+
+        # Workers with a second phase only plan while scanning in parallel,
+        # the filesystem is changed once every plan is known.
+        result = 0
+        if hasattr(worker, "execute"):
+            result = worker.execute(results, config, ui)
     ui_task.cancel()
 
+    return result
+
+
+async def watch_main(config: Configuration, ns: argparse.Namespace) -> int:
+    from krautcat.audio.library.watch import AlbumWatcher
+
+    worker = get_worker_by_name(ns.command, "")
+    loop = asyncio.get_event_loop()
+
+    journal_path = config.journal if config.journal is not None else default_journal_path()
+    journal = RenameJournal(journal_path)
+    execute_lock = asyncio.Lock()
+
+    def _execute(albums):
+        plan = RenamePlan(albums)
+        for conflict in plan.conflicts:
+            print(f"Skipped '{conflict.source}' -> '{conflict.target}': {conflict.reason}",
+                  file=sys.stderr)
+        if len(plan) == 0:
+            return
+
+        operations = plan.operations()
+        for error in plan.execute(journal):
+            print(error, file=sys.stderr)
+
+        # Renames keep mtimes, so cached tags stay valid under the new paths.
+        for operation in operations:
+            if operation.is_applied():
+                config.index.move(operation.source, operation.target)
+                print(f"Renamed '{operation.source}' to '{operation.target}'")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        async def process(album):
+            albums = await loop.run_in_executor(pool, worker(album, config))
+            async with execute_lock:
+                await loop.run_in_executor(pool, _execute, albums)
+
+        watcher = AlbumWatcher(config.command_config.directories, process)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, watcher.stop)
+
+        print(f"Watching {', '.join(str(r) for r in watcher.roots)}, "
+              f"journal '{journal_path}'", file=sys.stderr)
+        try:
+            await watcher.run()
+        finally:
+            journal.close()
+            config.index.close()
+
     return 0
 
 
@@ -569,6 +840,9 @@ def main():
 
     namespace = argparser.parse(args)
 
+    if namespace.resume is not None or namespace.undo is not None:
+        return replay_journal(namespace)
+
     config = Configuration(namespace)
     if not config.validate(namespace):
         print(argparser.help())
@@ -579,6 +853,21 @@ def main():
         print(argparser.help())
         exit()
 
+    if namespace.command == "view" and (config.watch or config.dry_run):
+        print("--watch and --dry-run are supported for renaming commands only",
+              file=sys.stderr)
+        exit(1)
+
+    if config.dry_run:
+        return dry_run_main(config, namespace)
+
+    if config.watch:
+
+        loop = asyncio.get_event_loop()
+        result = loop.run_until_complete(watch_main(config, namespace))
+        loop.close()
+        return result
+
     if namespace.ui == "tui":
         loop = asyncio.get_event_loop()
         result = loop.run_until_complete(asyncio.ensure_future(tui_main(config,
@@ -0,0 +1,246 @@
+import datetime
+import json
+import os
+import pathlib
+import time
+
+from typing import Iterator, List, NamedTuple, Optional, Set, Union
+
+from .plan import RenameOperation, RenamePlanError, execute_operations
+
+
+def default_journal_path() -> pathlib.Path:
+    state_home = os.environ.get("XDG_STATE_HOME", None)
+    if state_home:
+        directory = pathlib.Path(state_home) / "krautcat" / "dirnamer"
+    else:
+        directory = pathlib.Path.home() / ".local" / "state" / "krautcat" / "dirnamer"
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return directory / f"{timestamp}.jsonl"
+
+
+def plan_records(operations: List[RenameOperation], id_offset: int = 0,
+                 group_offset: int = 0) -> Iterator[dict]:
+    # A journal starts with its plan, so a plan written on its own can be
+    # executed later with resume().
+    yield {"op": "begin", "version": RenameJournal.VERSION}
+    for index, operation in enumerate(operations):
+        yield {"op": "plan", "id": id_offset + index, "group": group_offset + operation.group,
+               "source": str(operation.source), "target": str(operation.target),
+               "probe": operation.probe}
+
+
+class JournalError(Exception):
+    def __init__(self, path: pathlib.Path, message: str) -> None:
+        self.path = path
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"Journal '{self.path}': {self.message}"
+
+
+class JournalState(NamedTuple):
+    operations: List[RenameOperation]
+    done: Set[int]
+    failed_groups: Set[int]
+    undone: Set[int]
+    finished: bool
+
+    def inferred(self) -> Set[int]:
+        # Completion records are synced in batches, so the tail written after
+        # the last sync may be missing. The journal is synced before and after
+        # every operation that can't be probed and before directory moves,
+        # which would hide earlier renames inside the moved directory. So
+        # only the operation right after the last record may have run without
+        # a record, or a run of probeable operations, and nothing after them
+        # ran.
+        inferred = set()
+        for index in range(max(self.done, default=-1) + 1, len(self.operations)):
+            operation = self.operations[index]
+            if operation.group in self.failed_groups:
+                continue
+            if inferred and not operation.probe:
+                break
+            if not operation.is_applied():
+                break
+            inferred.add(index)
+            if not operation.probe:
+                break
+        return inferred
+
+    def applied(self) -> Set[int]:
+        return (self.done | self.inferred()) - self.undone
+
+    def pending(self) -> Set[int]:
+        applied = self.applied()
+        return {i for i, operation in enumerate(self.operations)
+                if i not in applied and i not in self.undone
+                and operation.group not in self.failed_groups}
+
+
+class RenameJournal:
+    VERSION = 1
+
+    SYNC_INTERVAL = 256
+    SYNC_SECONDS = 1.0
+
+    def __init__(self, path: Union[str, pathlib.Path]) -> None:
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file = self.path.open("a", encoding="utf-8")
+        # A long-running watch appends one plan after another, ids and groups
+        # continue from the previous plan so the journal stays one sequence.
+        self._id_offset = 0
+        self._group_offset = 0
+        self._planned: Optional[List[RenameOperation]] = None
+
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def __enter__(self) -> "RenameJournal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def _maybe_sync(self) -> None:
+        if (self._unsynced >= self.SYNC_INTERVAL
+                or time.monotonic() - self._synced_at >= self.SYNC_SECONDS):
+            self.sync()
+
+    def begin(self, operations: List[RenameOperation]) -> None:
+        for record in plan_records(operations, self._id_offset, self._group_offset):
+            self._write(record)
+        # The plan must be durable before the first rename happens.
+        self.sync()
+
+        self._planned = operations
+
+    def applying(self, operation: RenameOperation) -> None:
+        # A crash must not leave a gap in the records before an operation
+        # that can't be probed on replay, see JournalState.inferred().
+        if self._unsynced > 0 and (not operation.probe or operation.source.is_dir()):
+            self.sync()
+
+    def done(self, index: int, operation: Optional[RenameOperation] = None) -> None:
+        self._write({"op": "done", "id": self._id_offset + index})
+        if operation is not None and not operation.probe:
+            self.sync()
+        else:
+            self._maybe_sync()
+
+    def failed(self, group: int) -> None:
+        self._write({"op": "failed", "group": self._group_offset + group})
+        self.sync()
+
+    def undone(self, index: int) -> None:
+        self._write({"op": "undone", "id": index})
+        self._maybe_sync()
+
+    def end(self) -> None:
+        self._write({"op": "end"})
+        self.sync()
+
+        if self._planned:
+            self._id_offset += len(self._planned)
+            self._group_offset += max(operation.group for operation in self._planned) + 1
+        self._planned = None
+
+    def close(self) -> None:
+        if not self._file.closed:
+            if self._unsynced > 0:
+                self.sync()
+            self._file.close()
+
+    @staticmethod
+    def read(path: Union[str, pathlib.Path]) -> JournalState:
+        path = pathlib.Path(path)
+
+        operations = list()
+        done = set()
+        failed_groups = set()
+        undone = set()
+        finished = False
+
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half-written.
+                    break
+
+                op = record.get("op", None)
+                if op == "begin":
+                    if record.get("version", None) != RenameJournal.VERSION:
+                        raise JournalError(path,
+                                           f"unsupported version {record.get('version')}")
+                    finished = False
+                elif op == "plan":
+                    if record["id"] != len(operations):
+                        raise JournalError(path, f"unexpected operation id {record['id']}")
+                    operations.append(RenameOperation(pathlib.Path(record["source"]),
+                                                      pathlib.Path(record["target"]),
+                                                      record["group"],
+                                                      record.get("probe", False)))
+                elif op == "done":
+                    done.add(record["id"])
+                elif op == "failed":
+                    failed_groups.add(record["group"])
+                elif op == "undone":
+                    undone.add(record["id"])
+                elif op == "end":
+                    finished = True
+
+        return JournalState(operations, done, failed_groups, undone, finished)
+
+
+def resume(path: Union[str, pathlib.Path]) -> List[RenamePlanError]:
+    state = RenameJournal.read(path)
+    if state.finished:
+        return []
+
+    pending = state.pending()
+    with RenameJournal(path) as journal:
+        # Record what was found on disk, undo only trusts the records.
+        for index in sorted(state.inferred()):
+            journal.done(index)
+        journal.sync()
+
+        return execute_operations(state.operations, journal, pending)
+
+
+def undo(path: Union[str, pathlib.Path]) -> List[RenamePlanError]:
+    state = RenameJournal.read(path)
+
+    # Reverting around renames that have no record would fail halfway, as
+    # their paths are in the way of the recorded ones.
+    lost = state.inferred() - state.undone
+    if lost:
+        return [RenamePlanError(f"{len(lost)} rename(s) ran after the last journal sync, "
+                                "resume the journal to record them before undoing it")]
+
+    errors = list()
+    with RenameJournal(path) as journal:
+        for index in sorted(state.done - state.undone, reverse=True):
+            operation = state.operations[index]
+            try:
+                operation.revert()
+            except OSError as e:
+                errors.append(RenamePlanError(f"Failed to move '{operation.target}' "
+                                              f"back to '{operation.source}': {e}"))
+                continue
+            journal.undone(index)
+    return errors
@@ -0,0 +1,209 @@
+import collections
+import os
+import pathlib
+import shutil
+
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .journal import RenameJournal
+
+
+class RenamePlanError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class Conflict(NamedTuple):
+    source: pathlib.Path
+    target: pathlib.Path
+    reason: str
+
+
+class RenameOperation(NamedTuple):
+    source: pathlib.Path
+    target: pathlib.Path
+    group: int
+    # Whether is_applied() can tell that the operation ran. It can't when
+    # another operation reuses its paths (staged swaps) or when the target
+    # already existed when the plan was made.
+    probe: bool = False
+
+    def apply(self) -> None:
+        if self.source.is_dir():
+            move_directory(self.source, self.target)
+        else:
+            os.rename(self.source, self.target)
+
+    def revert(self) -> None:
+        RenameOperation(self.target, self.source, self.group).apply()
+
+    def is_applied(self) -> bool:
+        return not os.path.lexists(self.source) and os.path.lexists(self.target)
+
+
+class AlbumPlan:
+    def __init__(self, directory: pathlib.Path, name: Optional[str],
+                 files: Optional[Dict[str, str]] = None) -> None:
+        self.directory = directory
+        self.target = directory.parent / name if name is not None else directory
+        self.files = {old: new for old, new in (files or {}).items() if old != new}
+
+    @property
+    def depth(self) -> int:
+        return len(self.directory.parts)
+
+    @property
+    def renames_directory(self) -> bool:
+        return self.target != self.directory
+
+    def is_noop(self) -> bool:
+        return not self.renames_directory and len(self.files) == 0
+
+
+class RenamePlan:
+    def __init__(self, albums: List[AlbumPlan]) -> None:
+        self.conflicts: List[Conflict] = list()
+
+        self.albums = self._resolve_conflicts([a for a in albums if not a.is_noop()])
+        # Children are renamed before their parents so every planned source
+        # path is still valid when its turn comes.
+        self.albums.sort(key=lambda a: a.depth, reverse=True)
+
+    def __iter__(self) -> Iterator[AlbumPlan]:
+        return iter(self.albums)
+
+    def __len__(self) -> int:
+        return len(self.albums)
+
+    def _resolve_conflicts(self, albums: List[AlbumPlan]) -> List[AlbumPlan]:
+        by_target: Dict[pathlib.Path, List[AlbumPlan]] = dict()
+        for album in albums:
+            if album.renames_directory:
+                by_target.setdefault(album.target, list()).append(album)
+
+        for target, claimants in by_target.items():
+            if len(claimants) > 1:
+                for album in claimants:
+                    self.conflicts.append(Conflict(album.directory, target,
+                                                   "several directories share the target name"))
+                    album.target = album.directory
+            elif target.exists() and not self._same_entry(claimants[0].directory, target):
+                self.conflicts.append(Conflict(claimants[0].directory, target,
+                                               "target already exists"))
+                claimants[0].target = claimants[0].directory
+
+        for album in albums:
+            self._resolve_file_conflicts(album)
+
+        return [a for a in albums if not a.is_noop()]
+
+    def _resolve_file_conflicts(self, album: AlbumPlan) -> None:
+        by_target: Dict[str, List[str]] = dict()
+        for old, new in album.files.items():
+            by_target.setdefault(new, list()).append(old)
+
+        for new, olds in by_target.items():
+            target = album.directory / new
+            if len(olds) > 1:
+                reason = "several files share the target name"
+            elif (new not in album.files and target.exists()
+                    and not self._same_entry(album.directory / olds[0], target)):
+                reason = "target already exists"
+            else:
+                continue
+
+            for old in olds:
+                self.conflicts.append(Conflict(album.directory / old, target, reason))
+                del album.files[old]
+
+    @staticmethod
+    def _same_entry(a: pathlib.Path, b: pathlib.Path) -> bool:
+        # Case-only renames on case-insensitive filesystems resolve to the
+        # entry being renamed.
+        try:
+            return a.samefile(b)
+        except OSError:
+            return False
+
+    def operations(self) -> List[RenameOperation]:
+        operations = list()
+        for group, album in enumerate(self.albums):
+            for source, target in self._file_renames(album):
+                operations.append(RenameOperation(album.directory / source,
+                                                  album.directory / target, group))
+            if album.renames_directory:
+                operations.append(RenameOperation(album.directory, album.target, group))
+
+        uses = collections.Counter()
+        for operation in operations:
+            uses[operation.source] += 1
+            uses[operation.target] += 1
+
+        return [operation._replace(probe=uses[operation.source] == 1
+                                   and uses[operation.target] == 1
+                                   and not os.path.lexists(operation.target))
+                for operation in operations]
+
+    def execute(self, journal: Optional["RenameJournal"] = None) -> List[RenamePlanError]:
+        operations = self.operations()
+        if journal is not None:
+            journal.begin(operations)
+        return execute_operations(operations, journal)
+
+    @staticmethod
+    def _file_renames(album: AlbumPlan) -> List[Tuple[str, str]]:
+        if set(album.files.values()).isdisjoint(album.files):
+            return list(album.files.items())
+
+        # Targets overlap sources (e.g. swapped track numbers), so move
+        # everything aside before giving files their final names.
+        staged = [(old, f".{index}.krautcat-rename")
+                  for index, old in enumerate(album.files)]
+        return staged + [(temporary, album.files[old]) for old, temporary in staged]
+
+
+def execute_operations(operations: List[RenameOperation],
+                       journal: Optional["RenameJournal"] = None,
+                       pending: Optional[Set[int]] = None) -> List[RenamePlanError]:
+    errors = list()
+    failed_groups = set()
+
+    for index, operation in enumerate(operations):
+        if pending is not None and index not in pending:
+            continue
+        if operation.group in failed_groups:
+            continue
+
+        if journal is not None:
+            journal.applying(operation)
+
+        try:
+            operation.apply()
+        except OSError as e:
+            errors.append(RenamePlanError(f"Failed to rename '{operation.source}' "
+                                          f"to '{operation.target}': {e}"))
+            failed_groups.add(operation.group)
+            if journal is not None:
+                journal.failed(operation.group)
+            continue
+
+        if journal is not None:
+            journal.done(index, operation)
+
+    if journal is not None:
+        journal.end()
+
+    return errors
+
+
+def move_directory(source: pathlib.Path, target: pathlib.Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if os.stat(source).st_dev == os.stat(target.parent).st_dev:
+        os.rename(source, target)
+    else:
+        shutil.move(str(source), str(target))
@@ -0,0 +1,177 @@
+import string
+
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+
+class TemplateError(Exception):
+    def __init__(self, template: str, message: str) -> None:
+        self.template = template
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"Invalid template '{self.template}': {self.message}"
+
+
+def _year(metadata) -> Optional[int]:
+    date = metadata.date
+    if date is None or not date.year:
+        return None
+    return date.year
+
+
+FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "artist": lambda m: m.artist,
+    "album": lambda m: m.album,
+    "year": _year,
+    "track_number": lambda m: m.track_number,
+    "track_name": lambda m: m.track_name,
+    "disc_number": lambda m: m.disc_number,
+}
+
+
+class Template:
+    """Format string with optional sections.
+
+    Fields use str.format syntax. Text in square brackets is an optional
+    section, rendered only when none of its fields are None, e.g.
+    "[{disc_number}. ]{track_number:0>02}. {track_name}". Literal brackets
+    are written as "[[" and "]]".
+    """
+
+    def __init__(self, template: str, allowed_fields: Optional[Iterable[str]] = None) -> None:
+        self.template = template
+
+        allowed = frozenset(allowed_fields) if allowed_fields is not None else None
+
+        self._constants: List[str] = list()
+
+        fields = set()
+        terms = list()
+        for part, is_section in self._split_sections(template):
+            part_terms, part_fields = self._compile_part(part, allowed)
+            fields.update(part_fields)
+            if len(part_terms) == 0:
+                continue
+
+            expression = " + ".join(part_terms)
+            if is_section and len(part_fields) > 0:
+                condition = " and ".join(f"v.get({f!r}) is not None" for f in part_fields)
+                expression = f"(({expression}) if {condition} else '')"
+            terms.append(expression)
+
+        self.fields: FrozenSet[str] = frozenset(fields)
+
+        # The template is compiled into a single expression, so rendering
+        # doesn't parse format strings again. Only validated field names are
+        # spliced into the source, literals and format specs are passed as
+        # constants.
+        self._render = self._compile("v", " + ".join(terms) or "''")
+
+        accessors = ", ".join(f"{name!r}: _a[{name!r}](m)" for name in sorted(self.fields)
+                              if name in FIELDS)
+        self._values = self._compile("m", f"{{{accessors}}}")
+
+    def _split_sections(self, template: str) -> List[Tuple[str, bool]]:
+        parts = list()
+
+        current = list()
+        in_section = False
+        i = 0
+        while i < len(template):
+            c = template[i]
+            if c in "[]" and template[i + 1:i + 2] == c:
+                current.append(c)
+                i += 2
+                continue
+
+            if c == "[":
+                if in_section:
+                    raise TemplateError(template, "optional sections can't be nested")
+                parts.append(("".join(current), False))
+                current = list()
+                in_section = True
+            elif c == "]":
+                if not in_section:
+                    raise TemplateError(template, "unbalanced ']'")
+                parts.append(("".join(current), True))
+                current = list()
+                in_section = False
+            else:
+                current.append(c)
+            i += 1
+
+        if in_section:
+            raise TemplateError(template, "unterminated optional section")
+
+        parts.append(("".join(current), False))
+
+        return parts
+
+    def _compile_part(self, part: str,
+                      allowed: Optional[FrozenSet[str]]) -> Tuple[List[str], Tuple[str, ...]]:
+        try:
+            parsed = list(string.Formatter().parse(part))
+        except ValueError as e:
+            raise TemplateError(self.template, str(e)) from None
+
+        terms = list()
+        fields = list()
+        for literal, field_name, spec, conversion in parsed:
+            if literal:
+                terms.append(self._constant(literal))
+            if field_name is None:
+                continue
+
+            if field_name == "" or not field_name.isidentifier():
+                raise TemplateError(self.template, f"field '{field_name}' must be named")
+            if allowed is not None and field_name not in allowed:
+                raise TemplateError(self.template, f"unknown field '{field_name}'")
+            if spec and "{" in spec:
+                raise TemplateError(self.template, "nested fields in format specs "
+                                    "aren't supported")
+
+            fields.append(field_name)
+            value = f"v[{field_name!r}]"
+            if conversion is not None:
+                if conversion not in ("r", "s", "a"):
+                    raise TemplateError(self.template, f"unknown conversion '!{conversion}'")
+                value = f"_conv[{conversion!r}]({value})"
+            terms.append(f"_f({value}, {self._constant(spec or '')})")
+
+        return terms, tuple(fields)
+
+    def _constant(self, value: str) -> str:
+        self._constants.append(value)
+        return f"_c[{len(self._constants) - 1}]"
+
+    def _compile(self, argument: str, expression: str) -> Callable:
+        namespace = {"_c": tuple(self._constants), "_f": format, "_a": FIELDS,
+                     "_conv": {"r": repr, "s": str, "a": ascii}}
+        exec(f"def _compiled({argument}):\n    return {expression}\n", namespace)
+        return namespace["_compiled"]
+
+    def render(self, values: Mapping[str, Any],
+               escape: Optional[Callable[[str], str]] = None) -> str:
+        if escape is not None:
+            values = {k: escape(v) if isinstance(v, str) else v for k, v in values.items()}
+
+        try:
+            return self._render(values)
+        except KeyError as e:
+            raise TemplateError(self.template, f"no value for field {e}") from None
+
+    def values(self, metadata, **extra: Any) -> Dict[str, Any]:
+        values = self._values(metadata)
+        if extra:
+            values.update(extra)
+        return values
+
+    def render_metadata(self, metadata, escape: Optional[Callable[[str], str]] = None,
+                        **extra: Any) -> str:
+        return self.render(self.values(metadata, **extra), escape)
+
+    def __str__(self) -> str:
+        return self.template
+
+    def __repr__(self) -> str:
+        return f"Template({self.template!r})"
@@ -0,0 +1,225 @@
+import concurrent.futures
+import errno
+import json
+import os
+import pathlib
+
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+
+class ViewError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class ViewLink(NamedTuple):
+    path: str
+    source: pathlib.Path
+    inode: int
+
+
+class ViewConflict(NamedTuple):
+    path: pathlib.Path
+    source: pathlib.Path
+    reason: str
+
+
+class ViewResult(NamedTuple):
+    created: int
+    removed: int
+    unchanged: int
+    conflicts: List[ViewConflict]
+    errors: List[ViewError]
+
+
+class LibraryView:
+    """Tree of hardlinks or symlinks to library files under another layout.
+
+    Every link the view made is recorded in a manifest at the root of the
+    view, so an update only touches links that are new, gone or point to a
+    different file than before. Files in the view that aren't in the
+    manifest are never replaced or removed.
+    """
+
+    MANIFEST_NAME = ".krautcat-view.json"
+    VERSION = 1
+
+    CHUNK_SIZE = 1024
+
+    def __init__(self, root: Union[str, pathlib.Path], *, symlink: bool = False,
+                 jobs: Optional[int] = None) -> None:
+        self.root = pathlib.Path(root)
+        # Paths are joined as strings, pathlib is too slow for whole libraries.
+        self._root = str(self.root)
+        self.symlink = symlink
+        self.jobs = jobs if jobs is not None else min(32, (os.cpu_count() or 1) * 4)
+
+    @property
+    def mode(self) -> str:
+        return "symlink" if self.symlink else "hardlink"
+
+    @property
+    def manifest_path(self) -> pathlib.Path:
+        return self.root / self.MANIFEST_NAME
+
+    def _load_manifest(self) -> Dict[str, Tuple[str, int]]:
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return dict()
+        except ValueError as e:
+            raise ViewError(f"Broken view manifest '{self.manifest_path}': {e}") from None
+
+        if manifest.get("version", None) != self.VERSION:
+            raise ViewError(f"Unsupported view manifest version {manifest.get('version')}")
+
+        links = {path: (source, inode) for path, (source, inode) in manifest["links"].items()}
+        if manifest.get("mode", None) != self.mode:
+            # Every link has to be made again. Ownership is checked the way
+            # the links were made.
+            LibraryView(self.root, symlink=not self.symlink)._remove_all(links)
+            return dict()
+        return links
+
+    def _save_manifest(self, links: Dict[str, Tuple[str, int]]) -> None:
+        temporary = self.manifest_path.with_name(f"{self.MANIFEST_NAME}.tmp")
+        with temporary.open("w", encoding="utf-8") as f:
+            # json.dumps() uses the C encoder, json.dump() doesn't.
+            f.write(json.dumps({"version": self.VERSION, "mode": self.mode, "links": links},
+                               ensure_ascii=False, separators=(",", ":")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.manifest_path)
+
+    def _owns(self, path: str, source: str, inode: int) -> bool:
+        try:
+            if self.symlink:
+                return os.readlink(path) == source
+            return os.lstat(path).st_ino == inode
+        except OSError:
+            return False
+
+    def _link(self, link: ViewLink) -> Optional[ViewError]:
+        path = os.path.join(self._root, link.path)
+        try:
+            if self.symlink:
+                os.symlink(link.source, path)
+            else:
+                os.link(link.source, path)
+        except FileExistsError:
+            if self._owns(path, str(link.source), link.inode):
+                return None
+            return ViewError(f"'{path}' already exists and isn't part of the view")
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                return ViewError(f"Can't hardlink '{link.source}' across filesystems, "
+                                 "use symlinks for this view")
+            return ViewError(f"Failed to link '{path}' to '{link.source}': {e}")
+        return None
+
+    def _unlink(self, path: str, source: str, inode: int) -> Optional[ViewError]:
+        full_path = os.path.join(self._root, path)
+        if not self._owns(full_path, source, inode):
+            # Replaced or removed by someone else, leave it alone.
+            return None
+        try:
+            os.unlink(full_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            return ViewError(f"Failed to remove '{full_path}': {e}")
+        return None
+
+    def _remove_all(self, links: Dict[str, Tuple[str, int]]) -> None:
+        for path, (source, inode) in links.items():
+            self._unlink(path, source, inode)
+        self._prune(links)
+
+    def _prune(self, paths: Iterable[str]) -> None:
+        directories = set()
+        for path in paths:
+            directory = os.path.dirname(path)
+            while directory and directory not in directories:
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+
+        for directory in sorted(directories, key=len, reverse=True):
+            try:
+                os.rmdir(os.path.join(self._root, directory))
+            except OSError:
+                pass
+
+    def _run_chunks(self, pool: concurrent.futures.Executor, func,
+                    items: List) -> List[ViewError]:
+        # Links are made by syscalls that release the GIL, so a thread pool
+        # keeps several of them in flight.
+        def _chunk(chunk):
+            return [e for e in (func(*item) for item in chunk) if e is not None]
+
+        chunks = [items[i:i + self.CHUNK_SIZE] for i in range(0, len(items), self.CHUNK_SIZE)]
+        errors = list()
+        for chunk_errors in pool.map(_chunk, chunks):
+            errors.extend(chunk_errors)
+        return errors
+
+    def update(self, links: Iterable[ViewLink]) -> ViewResult:
+        self.root.mkdir(parents=True, exist_ok=True)
+        old = self._load_manifest()
+
+        conflicts = list()
+        wanted: Dict[str, ViewLink] = dict()
+        for link in links:
+            previous = wanted.get(link.path, None)
+            if previous is not None:
+                conflicts.append(ViewConflict(self.root / link.path, link.source,
+                                              f"'{previous.source}' has the same name"))
+                continue
+            wanted[link.path] = link
+
+        def _entry(link: ViewLink) -> Tuple[str, int]:
+            return (str(link.source), link.inode)
+
+        stale = [(path, source, inode) for path, (source, inode) in old.items()
+                 if path not in wanted or _entry(wanted[path]) != (source, inode)]
+        new = [link for path, link in wanted.items()
+               if old.get(path, None) != _entry(link)]
+
+        manifest = {path: entry for path, entry in old.items() if path in wanted}
+        errors = list()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            unlink_errors = self._run_chunks(pool, self._unlink, stale)
+            errors.extend(unlink_errors)
+            removed = 0
+            for path, source, inode in stale:
+                # A link that couldn't be removed is still the view's, keep it
+                # in the manifest so the next update retries.
+                if unlink_errors and self._owns(os.path.join(self._root, path), source, inode):
+                    manifest[path] = (source, inode)
+                    continue
+                manifest.pop(path, None)
+                removed += 1
+
+            directories = {os.path.dirname(link.path) for link in new}
+            for directory in sorted(directories):
+                os.makedirs(os.path.join(self._root, directory), exist_ok=True)
+
+            link_errors = self._run_chunks(pool, self._link, [(link,) for link in new])
+            errors.extend(link_errors)
+
+        created = 0
+        for link in new:
+            if link_errors and not self._owns(os.path.join(self._root, link.path),
+                                              *_entry(link)):
+                continue
+            manifest[link.path] = _entry(link)
+            created += 1
+
+        if stale or new:
+            self._prune(path for path, _, _ in stale if path not in manifest)
+            self._save_manifest(manifest)
+
+        return ViewResult(created, removed, len(wanted) - len(new), conflicts, errors)
@@ -0,0 +1,280 @@
+import collections
+import os
+import pathlib
+import sqlite3
+import threading
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from krautcat.audio.metadata import Metadata
+from krautcat.audio.metadata.types import Date
+
+if TYPE_CHECKING:
+    import numpy
+
+
+def default_index_path() -> pathlib.Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME", None)
+    if cache_home:
+        return pathlib.Path(cache_home) / "krautcat" / "library.sqlite"
+    return pathlib.Path.home() / ".cache" / "krautcat" / "library.sqlite"
+
+
+class FingerprintMatch(NamedTuple):
+    path: pathlib.Path
+    score: float
+    offset: int
+
+
+class LibraryIndex:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            file_id INTEGER PRIMARY KEY REFERENCES files(id) ON DELETE CASCADE,
+            duration REAL NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS fingerprint_segments (
+            hash INTEGER NOT NULL,
+            file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS fingerprint_segments_hash ON fingerprint_segments(hash);
+        CREATE INDEX IF NOT EXISTS fingerprint_segments_file ON fingerprint_segments(file_id);
+        CREATE TABLE IF NOT EXISTS tags (
+            file_id INTEGER PRIMARY KEY REFERENCES files(id) ON DELETE CASCADE,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            artist TEXT,
+            album TEXT,
+            date TEXT,
+            track_number INTEGER,
+            track_name TEXT,
+            tracks_total INTEGER,
+            disc_number INTEGER,
+            discs_total INTEGER
+        );
+    """
+
+    QUERY_CHUNK = 500
+
+    def __init__(self, path: Union[str, pathlib.Path]) -> None:
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = list()
+        self._connections_lock = threading.Lock()
+
+        self._connection.executescript(self.SCHEMA)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # Watch mode reads and stores tags from worker threads, and SQLite
+        # connections can't be shared between threads.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30.0, check_same_thread=False)
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA journal_mode = WAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def __enter__(self) -> "LibraryIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _file_id(self, path: pathlib.Path) -> Optional[int]:
+        row = self._connection.execute("SELECT id FROM files WHERE path = ?",
+                                       (str(path),)).fetchone()
+        return row[0] if row is not None else None
+
+    def is_fingerprinted(self, path: pathlib.Path) -> bool:
+        stat = path.stat()
+        row = self._connection.execute(
+            "SELECT 1 FROM files JOIN fingerprints ON fingerprints.file_id = files.id "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (str(path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        return row is not None
+
+    def store_fingerprint(self, path: pathlib.Path, duration: float,
+                          fingerprint: "numpy.ndarray") -> None:
+        # numpy is only needed for fingerprints, the metadata cache works without it.
+        from krautcat.audio import fingerprint as _fingerprint
+
+        stat = path.stat()
+        hashes, positions = _fingerprint.segment_hashes(fingerprint,
+                                                        step=_fingerprint.SEGMENT_FRAMES)
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns",
+                (str(path), stat.st_size, stat.st_mtime_ns)
+            )
+            file_id = self._file_id(path)
+
+            self._connection.execute("DELETE FROM fingerprint_segments WHERE file_id = ?", (file_id,))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO fingerprints (file_id, duration, data) VALUES (?, ?, ?)",
+                (file_id, duration, fingerprint.astype("<u4").tobytes())
+            )
+            self._connection.executemany(
+                "INSERT INTO fingerprint_segments (hash, file_id, position) VALUES (?, ?, ?)",
+                ((int(h), file_id, int(p)) for h, p in zip(hashes, positions))
+            )
+
+    def fingerprint(self, path: pathlib.Path) -> Optional["numpy.ndarray"]:
+        import numpy
+
+        row = self._connection.execute(
+            "SELECT data FROM fingerprints JOIN files ON fingerprints.file_id = files.id "
+            "WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is None:
+            return None
+        return numpy.frombuffer(row[0], dtype="<u4")
+
+    def fingerprinted_paths(self) -> List[pathlib.Path]:
+        return [pathlib.Path(row[0]) for row in self._connection.execute(
+            "SELECT path FROM files JOIN fingerprints ON fingerprints.file_id = files.id "
+            "ORDER BY path"
+        )]
+
+    def metadata(self, path: pathlib.Path,
+                 stat: Optional[os.stat_result] = None) -> Optional[Metadata]:
+        stat = stat if stat is not None else path.stat()
+        row = self._connection.execute(
+            "SELECT artist, album, date, track_number, track_name, tracks_total, "
+            "disc_number, discs_total FROM tags JOIN files ON tags.file_id = files.id "
+            "WHERE path = ? AND tags.size = ? AND tags.mtime_ns = ?",
+            (str(path), stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row is None:
+            return None
+
+        artist, album, date, track_number, track_name, tracks_total, disc_number, discs_total = row
+        return Metadata(artist=artist, album=album, date=Date(date),
+                        track_number=track_number, track_name=track_name,
+                        tracks_total=tracks_total,
+                        disc_number=disc_number, discs_total=discs_total)
+
+    def store_metadata(self, path: pathlib.Path, metadata: Metadata,
+                       stat: Optional[os.stat_result] = None) -> None:
+        stat = stat if stat is not None else path.stat()
+
+        def _date(date):
+            if date is None or not date.year:
+                return None
+            return f"{date.year:04}-{date.month:02}-{date.day:02}"
+
+        def _int(value):
+            try:
+                return int(value) if value is not None else None
+            except ValueError:
+                return None
+
+        with self._connection:
+            # Tags keep their own size and mtime, updating the file row would
+            # make a stale fingerprint look current.
+            self._connection.execute(
+                "INSERT OR IGNORE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tags (file_id, size, mtime_ns, artist, album, date, "
+                "track_number, track_name, tracks_total, disc_number, discs_total) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._file_id(path), stat.st_size, stat.st_mtime_ns,
+                 metadata.artist, metadata.album,
+                 _date(metadata.date),
+                 _int(metadata.track_number), metadata.track_name,
+                 _int(metadata.total_tracks),
+                 _int(metadata.disc_number), _int(metadata.total_discs))
+            )
+
+    def move(self, old: pathlib.Path, new: pathlib.Path) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM files WHERE path = ?", (str(new),))
+            self._connection.execute("UPDATE files SET path = ? WHERE path = ?",
+                                     (str(new), str(old)))
+            self._connection.execute(
+                "UPDATE files SET path = ? || substr(path, ?) WHERE path > ? AND path < ?",
+                (str(new), len(str(old)) + 1, str(old) + os.sep, str(old) + chr(ord(os.sep) + 1))
+            )
+
+    def prune(self, paths: Iterable[pathlib.Path]) -> None:
+        with self._connection:
+            self._connection.executemany("DELETE FROM files WHERE path = ?",
+                                         ((str(p),) for p in paths))
+
+    def _segment_hits(self, hashes: "numpy.ndarray",
+                      positions: "numpy.ndarray") -> Dict[Tuple[int, int], int]:
+        query_positions = collections.defaultdict(list)
+        for h, p in zip(hashes.tolist(), positions.tolist()):
+            query_positions[h].append(p)
+
+        keys = list(query_positions)
+        votes = collections.Counter()
+        for i in range(0, len(keys), self.QUERY_CHUNK):
+            chunk = keys[i:i + self.QUERY_CHUNK]
+            rows = self._connection.execute(
+                "SELECT hash, file_id, position FROM fingerprint_segments "
+                f"WHERE hash IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for h, file_id, position in rows:
+                for query_position in query_positions[h]:
+                    votes[(file_id, position - query_position)] += 1
+
+        return votes
+
+    def lookup(self, fingerprint: "numpy.ndarray", *, threshold: float = 0.35,
+               min_votes: int = 3, max_candidates: int = 16) -> List[FingerprintMatch]:
+        import numpy
+
+        from krautcat.audio import fingerprint as _fingerprint
+
+        hashes, positions = _fingerprint.segment_hashes(fingerprint)
+        votes = self._segment_hits(hashes, positions)
+
+        best = dict()
+        for (file_id, offset), count in votes.most_common():
+            if count < min_votes or len(best) >= max_candidates:
+                break
+            best.setdefault(file_id, offset)
+
+        matches = list()
+        for file_id, offset in best.items():
+            path, data = self._connection.execute(
+                "SELECT path, data FROM files JOIN fingerprints ON fingerprints.file_id = files.id "
+                "WHERE files.id = ?", (file_id,)
+            ).fetchone()
+            candidate = numpy.frombuffer(data, dtype="<u4")
+
+            # Compare only when the aligned overlap covers most of the shorter track.
+            error = _fingerprint.bit_error_rate(candidate, fingerprint, offset)
+            overlap = min(len(candidate) - max(offset, 0), len(fingerprint) + min(offset, 0))
+            if error is None or overlap < min(len(candidate), len(fingerprint)) // 2:
+                continue
+
+            if error <= threshold:
+                matches.append(FingerprintMatch(pathlib.Path(path), 1.0 - error, offset))
+
+        return sorted(matches, key=lambda m: m.score, reverse=True)
@@ -3,7 +3,10 @@ import asyncio
 import concurrent
 import concurrent.futures
 import json
+import multiprocessing
+import os
 import pathlib
+import signal
 import sys
 
 from collections.abc import Iterable, Iterator
@@ -13,7 +16,7 @@ from enum import Enum
 from krautcat.audio.file.audio import *
 from krautcat.audio.file.mime import file_class
 from krautcat.audio.metadata.tags import TagFactory
-from krautcat.audio.musicbrainz import MusicBrainzAPI
+from krautcat.audio.metadata.types import Date, ReplayGain
 
 
 class StdinType(Enum):
@@ -161,45 +164,264 @@ class DateToYearWorker:
         print(album_path, file=sys.stderr)
 
 
+class AlbumGroups:
+    def __init__(self):
+        self._groups = {}
+
+    def update(self, file):
+        metadata = file.metadata
+        year = metadata.date.year if metadata.date is not None and metadata.date.year else None
+
+        key = (metadata.artist, metadata.album, year)
+        if key in self._groups:
+            self._groups[key].append(file)
+        else:
+            self._groups[key] = [file]
+
+    def __iter__(self):
+        return iter(self._groups.items())
+
+    def __len__(self):
+        return len(self._groups)
+
+
+def collect_tagged_files(directory, files=None):
+    """Parse every taggable file under the directory once, in path order."""
+    files = files if files is not None else list()
+
+    for entry in sorted(directory.iterdir()):
+        if entry.is_dir():
+            collect_tagged_files(entry, files)
+
+        if not entry.is_file() or entry.stat().st_size == 0:
+            continue
+
+        file_klass = file_class(entry)
+        if file_klass is None or not hasattr(file_klass, "save_tags"):
+            continue
+
+        file = file_klass(entry)
+        if file.metadata is not None:
+            files.append(file)
+
+    return files
+
+
+def musicbrainz_api(command_config):
+    from krautcat.audio.musicbrainz import MusicBrainzAPI
+    from krautcat.audio.musicbrainz.local import LocalIndex
+
+    local_index = None
+    if command_config.musicbrainz_index is not None:
+        local_index = LocalIndex(command_config.musicbrainz_index)
+    return MusicBrainzAPI(local_index=local_index, offline=command_config.offline)
+
+
 class CanonicalizeArtistNameWorker:
     def __init__(self, config):
         self.config = config
 
+        self._transform = CanonicalizeArtistTransform(config)
+
     def __call__(self, album_path):
-        music_files = list()
+        files = collect_tagged_files(album_path)
 
-        for entry in album_path.iterdir():
+        for artist, album, year, canonical_artist, group in self._transform.resolve(files):
+            if self.config.command_config.dry_run:
+                self._report(album_path, artist, canonical_artist, album, year, group)
+                continue
+
+            for file in group:
+                file.metadata.artist = canonical_artist
+                file.save_tags()
+
+            print(f"Renamed artist '{artist}' to '{canonical_artist}' in {len(group)} file(s) "
+                  f"of album '{album}'")
+
+    @staticmethod
+    def _report(album_path, artist, canonical_artist, album, year, files):
+        report = {
+            "directory": str(album_path),
+            "album": album,
+            "year": year,
+            "artist": artist,
+            "canonical_artist": canonical_artist,
+            "files": [str(file.path) for file in files],
+        }
+        sys.stdout.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+class CapitalizeTransform:
+    def __init__(self, config):
+        pass
+
+    @staticmethod
+    def _capitalize(value):
+        if value is None:
+            return None
+        return " ".join([w.capitalize() for w in value.split(" ")])
+
+    def __call__(self, files):
+        for file in files:
+            file.metadata.artist = self._capitalize(file.metadata.artist)
+            file.metadata.track_name = self._capitalize(file.metadata.track_name)
+
+
+class DateToYearTransform:
+    def __init__(self, config):
+        pass
+
+    def __call__(self, files):
+        for file in files:
+            date = file.metadata.date
+            if date is not None and date.year:
+                file.metadata.date = date.year
+
+
+class CanonicalizeArtistTransform:
+    def __init__(self, config):
+        self._mb_api = musicbrainz_api(config.command_config)
+
+    def resolve(self, files):
+        """Yield (artist, album, year, canonical artist, files) of every album
+        whose artist differs from MusicBrainz."""
+        groups = AlbumGroups()
+        for file in files:
+            groups.update(file)
+
+        for (artist, album, year), group in groups:
+            if artist is None or album is None:
+                continue
+
+            canonical_artist = self._mb_api.get_artist_of_album(artist, album, year, cache=True)
+            if canonical_artist is None or canonical_artist == artist:
+                continue
+
+            yield artist, album, year, canonical_artist, group
+
+    def __call__(self, files):
+        for _, _, _, canonical_artist, group in list(self.resolve(files)):
+            for file in group:
+                file.metadata.artist = canonical_artist
+
+
+def get_transform_by_name(transform_name):
+    transform_name_prepared = "".join([w.capitalize() for w in transform_name.split("-")])
+
+    return getattr(sys.modules[__name__], f"{transform_name_prepared}Transform", None)
+
+
+def transform_chain(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    if len(names) == 0:
+        raise argparse.ArgumentTypeError("no transforms given")
+
+    for name in names:
+        if get_transform_by_name(name) is None:
+            raise argparse.ArgumentTypeError(f"unknown transform '{name}'")
+    return names
+
+
+class TransformWorker:
+    """Apply a chain of transforms to every file of an album in one pass.
+
+    Each file is parsed once, all transforms run on the tags in memory and
+    only files whose tags ended up different are written back.
+    """
+
+    FIELDS = ("artist", "album", "track_name", "date", "track_number", "total_tracks",
+              "disc_number", "total_discs")
+
+    def __init__(self, config):
+        self.config = config
+
+        self._transforms = [get_transform_by_name(name)(config)
+                            for name in config.command_config.transforms]
+
+    def __call__(self, album_path):
+        files = collect_tagged_files(album_path)
+        if len(files) == 0:
+            return
+
+        before = [self._tags(file.metadata) for file in files]
+        for transform in self._transforms:
+            transform(files)
+
+        changed = 0
+        for file, old_tags in zip(files, before):
+            new_tags = self._tags(file.metadata)
+            if new_tags == old_tags:
+                continue
+
+            changed += 1
+            if self.config.command_config.dry_run:
+                self._report(file, old_tags, new_tags)
+            else:
+                file.save_tags()
+
+        if not self.config.command_config.dry_run:
+            print(f"Updated tags of {changed} of {len(files)} file(s) in '{album_path}'")
+
+    def _tags(self, metadata):
+        # Date has no equality, compare the way it is written to the file.
+        return tuple(str(v) if isinstance(v, Date) else v
+                     for v in (getattr(metadata, f) for f in self.FIELDS))
+
+    def _report(self, file, old_tags, new_tags):
+        changes = {field: [old, new]
+                   for field, old, new in zip(self.FIELDS, old_tags, new_tags) if old != new}
+        sys.stdout.write(json.dumps({"file": str(file.path), "changes": changes},
+                                    ensure_ascii=False) + "\n")
+
+
+class ReplaygainWorker:
+    def __init__(self, config):
+        self.config = config
+
+    def __call__(self, album_path):
+        # Loudness analysis pulls in numpy, only load it for this command.
+        from krautcat.audio.loudness import AlbumLoudness, measure_file
+
+        files = list()
+
+        for entry in sorted(album_path.iterdir()):
             if entry.is_dir():
                 self(entry)
 
             if not entry.is_file() or entry.stat().st_size == 0:
                 continue
-            
+
             file_klass = file_class(entry)
-            if file_klass is None or not hasattr(file_klass, "save_tags"):
+            if (file_klass is None or not hasattr(file_klass, "save_replaygain")
+                    or not hasattr(file_klass, "gst_decoder")):
                 continue
 
-            file = file_klass(entry)
-            music_files.append(file)
-            
-            file.metadata.track_name = file._tags
-            file.metadata.artist = file._tags
-            file.metadata.album = file._tags
-            file.metadata.date = file._tags
-
-            mb_api = MusicBrainzAPI()
-
-            artist = mb_api.get_artist_of_album(file.metadata.artist,
-                                                file.metadata.album,
-                                                file.metadata.date,
-                                                cache=True)
-
-            if artist != file.metadata.artist:
-                print("Renamed artist '{}' to '{}' in file '{}'".format(
-                    file.metadata.artist, artist, file.path
-                ))
-                file.metadata.artist = artist
-                file.save_tags()
+            files.append(file_klass(entry, open=False))
+
+        if len(files) == 0:
+            return
+
+        pool = self.config.command_config.pool
+        futures = [pool.submit(measure_file, file.path, file.gst_parser, file.gst_decoder)
+                   for file in files]
+
+        tracks = list()
+        for file, future in zip(files, futures):
+            try:
+                tracks.append(future.result())
+            except Exception as e:
+                print(f"Failed to measure loudness of '{file.path}': {e}", file=sys.stderr)
+                return
+
+        album = AlbumLoudness(tracks)
+        album_loudness = album.loudness
+        album_peak = album.peak
+
+        for file, track in zip(files, tracks):
+            replaygain = ReplayGain.from_loudness(track.loudness, track.peak,
+                                                  album_loudness, album_peak)
+            file.save_replaygain(replaygain)
+            print(f"{file.path}: {replaygain}")
 
 
 class ConfigurationCapitalizeTags:
@@ -207,26 +429,79 @@ class ConfigurationCapitalizeTags:
         self.directories = vars(cli_args)["album-root"]
         self.library_root = cli_args.library_root
 
+    def validate(self):
+        return True
+
 
 class ConfigurationDateToYear:
     def __init__(self, cli_args, config_file=None):
         self.directories = cli_args.directory
         self.library_root = cli_args.library_root
 
+    def validate(self):
+        return True
+
 
 class ConfigurationCanonicalizeArtistName:
     def __init__(self, cli_args, config_file=None):
         self.directories = cli_args.directory
         self.library_root = cli_args.library_root
 
+        self.musicbrainz_index = cli_args.musicbrainz_index
+        self.offline = cli_args.offline
+        self.dry_run = cli_args.dry_run
+
     def validate(self):
+        if self.offline and self.musicbrainz_index is None:
+            print("--offline needs a local index, pass --musicbrainz-index", file=sys.stderr)
+            return False
         return True
-        
+
+
+class ConfigurationTransform:
+    def __init__(self, cli_args, config_file=None):
+        self.directories = cli_args.directory
+        self.library_root = cli_args.library_root
+
+        self.transforms = cli_args.apply
+        self.musicbrainz_index = cli_args.musicbrainz_index
+        self.offline = cli_args.offline
+        self.dry_run = cli_args.dry_run
+
+    def validate(self):
+        if (self.offline and self.musicbrainz_index is None
+                and "canonicalize-artist" in self.transforms):
+            print("canonicalize-artist --offline needs a local index, pass --musicbrainz-index",
+                  file=sys.stderr)
+            return False
+        return True
+
+
+class ConfigurationReplaygain:
+    def __init__(self, cli_args, config_file=None):
+        self.directories = cli_args.directory
+        self.library_root = cli_args.library_root
+
+        self.jobs = cli_args.jobs
+        # Set by replaygain_main() for as long as the command runs.
+        self.pool = None
+
+    def validate(self):
+        return True
+
 
 class Configuration:
     def __init__(self, cli_args, config_file=None):
         self.stdout = cli_args.stdout
 
+        self.watch = cli_args.watch
+        if cli_args.watch or cli_args.index is not None:
+            from krautcat.audio.library.index import LibraryIndex, default_index_path
+
+            self.index = LibraryIndex(cli_args.index or default_index_path())
+        else:
+            self.index = None
+
         command_config_class = self.get_command_config_class(cli_args.command)
         if command_config_class is not None:
             self.command_config = command_config_class(cli_args, config_file)
@@ -256,6 +531,13 @@ class Argparser:
                                choices=list(StdoutType),
                                default=StdoutType.NONE,
                                help="Stdout output format")
+        argparser.add_argument("--watch", action="store_true",
+                               help="Keep running and process albums under the given library "
+                               "roots as they change")
+        argparser.add_argument("--index", action="store",
+                               type=pathlib.Path, default=None,
+                               help="Library index to refresh with written tags (always used "
+                               "with --watch)")
 
         subparsers = argparser.add_subparsers(title="Commands", dest="command")
 
@@ -282,11 +564,50 @@ class Argparser:
                                                      help="Tags to canonicalize")
         canonicalize_artist_name_parser.add_argument("--library-root", action="store_true",
                                                      help="Supply root as library root")
+        canonicalize_artist_name_parser.add_argument("--musicbrainz-index", action="store",
+                                                     type=pathlib.Path, default=None,
+                                                     help="Local MusicBrainz index built by "
+                                                     "krautcat-mbdump")
+        canonicalize_artist_name_parser.add_argument("--offline", action="store_true",
+                                                     help="Answer only from the local index")
+        canonicalize_artist_name_parser.add_argument("-n", "--dry-run", action="store_true",
+                                                     help="Print proposed renames as JSON lines "
+                                                     "instead of saving tags")
         canonicalize_artist_name_parser.add_argument("directory", action="store",
                                                       type=pathlib.Path,
                                                       nargs="+",
                                                       help="Path to directory")
 
+        transform_parser = subparsers.add_parser("transform")
+        transform_parser.add_argument("-a", "--apply", action="store",
+                                      type=transform_chain, required=True,
+                                      help="Comma separated transforms to apply in order: "
+                                      "capitalize, date-to-year, canonicalize-artist")
+        transform_parser.add_argument("--library-root", action="store_true",
+                                      help="Supply root as library root")
+        transform_parser.add_argument("--musicbrainz-index", action="store",
+                                      type=pathlib.Path, default=None,
+                                      help="Local MusicBrainz index built by krautcat-mbdump")
+        transform_parser.add_argument("--offline", action="store_true",
+                                      help="Answer only from the local index")
+        transform_parser.add_argument("-n", "--dry-run", action="store_true",
+                                      help="Print changed tags as JSON lines instead of "
+                                      "saving them")
+        transform_parser.add_argument("directory", action="store",
+                                      type=pathlib.Path,
+                                      nargs="+",
+                                      help="Path to album")
+
+        replaygain_parser = subparsers.add_parser("replaygain")
+        replaygain_parser.add_argument("-j", "--jobs", action="store",
+                                       type=int, default=os.cpu_count(),
+                                       help="Number of parallel decoding processes")
+        replaygain_parser.add_argument("--library-root", action="store_true",
+                                       help="Supply root as library root")
+        replaygain_parser.add_argument("directory", action="store",
+                                       type=pathlib.Path,
+                                       nargs="+",
+                                       help="Path to album")
 
     def parse(self, args):
         return self.argparser.parse_args(args[1:])
@@ -303,6 +624,53 @@ def get_worker_by_name(command_name):
     return getattr(sys.modules[__name__], command_class_name, None)
 
 
+def refresh_index(index, album_path):
+    # Only files whose size or mtime changed are read again.
+    for directory, _, filenames in os.walk(album_path):
+        for filename in filenames:
+            entry = pathlib.Path(directory) / filename
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_size == 0 or index.metadata(entry, stat) is not None:
+                continue
+
+            file_klass = file_class(entry)
+            if file_klass is None:
+                continue
+            metadata = file_klass(entry).metadata
+            if metadata is not None:
+                index.store_metadata(entry, metadata, stat)
+
+
+async def watch_main(config: Configuration, cli_args: argparse.Namespace) -> int:
+    from krautcat.audio.library.watch import AlbumWatcher
+
+    worker = get_worker_by_name(cli_args.command)
+
+    if worker is None:
+        raise ValueError(f"Unknown command '{cli_args.command}'")
+
+    loop = asyncio.get_event_loop()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        async def process(album):
+            await loop.run_in_executor(pool, worker(config), album)
+            await loop.run_in_executor(pool, refresh_index, config.index, album)
+
+        watcher = AlbumWatcher(config.command_config.directories, process)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, watcher.stop)
+
+        print(f"Watching {', '.join(str(r) for r in watcher.roots)}", file=sys.stderr)
+        try:
+            await watcher.run()
+        finally:
+            config.index.close()
+
+    return 0
+
+
 async def async_main(config: Configuration,
                      cli_args: argparse.Namespace) -> int:
     if config.command_config.library_root:
@@ -329,28 +697,43 @@ async def async_main(config: Configuration,
                                               directory))
         completed, pending = await asyncio.wait([*tasks])
     await asyncio.gather(*pending)
-    loop.close()
 
     return 0
 
 
+async def replaygain_main(config: Configuration, cli_args: argparse.Namespace) -> int:
+    command_config = config.command_config
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=command_config.jobs,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as command_config.pool:
+        if config.watch:
+            return await watch_main(config, cli_args)
+        return await async_main(config, cli_args)
+
+
 def main() -> int:
     args = sys.argv
     argparser = Argparser()
     cli_args = argparser.parse(args)
 
-    config = Configuration(cli_args)
-    if not config.validate:
-        print(argparser.help())
-        exit()
-
     if cli_args.command is None:
         print("Command must be supplied!")
         print(argparser.help())
         exit(1)
 
+    config = Configuration(cli_args)
+    if not config.validate():
+        print(argparser.help())
+        exit(1)
+
     loop = asyncio.get_event_loop()
-    result = loop.run_until_complete(asyncio.ensure_future(async_main(config, cli_args)))
+    if cli_args.command == "replaygain":
+        result = loop.run_until_complete(replaygain_main(config, cli_args))
+    elif config.watch:
+        result = loop.run_until_complete(watch_main(config, cli_args))
+    else:
+        result = loop.run_until_complete(asyncio.ensure_future(async_main(config, cli_args)))
     loop.close()
     
     return result
@@ -0,0 +1,228 @@
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import pathlib
+import struct
+import sys
+
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Set
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class InotifyEvent(NamedTuple):
+    path: pathlib.Path
+    mask: int
+
+    @property
+    def is_dir(self) -> bool:
+        return bool(self.mask & IN_ISDIR)
+
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _libc
+
+
+class Inotify:
+    READ_SIZE = 64 * 1024
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise InotifyError("Watching directories requires Linux inotify")
+
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyError(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+
+        self._paths: Dict[int, pathlib.Path] = dict()
+
+    def add_watch(self, path: pathlib.Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            if error == errno.ENOSPC:
+                raise InotifyError("Out of inotify watches, raise "
+                                   "fs.inotify.max_user_watches")
+            raise InotifyError(f"Can't watch '{path}': {os.strerror(error)}")
+        # Adding a watch for an inode that is already watched returns the same
+        # descriptor, which keeps paths right after directories are moved.
+        self._paths[wd] = path
+
+    def add_tree(self, root: pathlib.Path) -> None:
+        for directory, _, _ in os.walk(root):
+            self.add_watch(pathlib.Path(directory))
+
+    def read(self) -> Iterator[InotifyEvent]:
+        try:
+            data = os.read(self.fd, self.READ_SIZE)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                yield InotifyEvent(pathlib.Path(), mask)
+                continue
+
+            directory = self._paths.get(wd, None)
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+
+            yield InotifyEvent(directory / os.fsdecode(name) if name else directory, mask)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class AlbumWatcher:
+    """Run a callback for album directories that changed under library roots.
+
+    Events are debounced per album, so copying a whole album results in one
+    callback once the copy has been quiet for a while. Changes made while the
+    callback is working on an album, like its own tag writes and renames,
+    don't schedule the album again.
+    """
+
+    DEBOUNCE_SECONDS = 2.0
+    QUIET_SECONDS = 1.0
+
+    def __init__(self, roots: List[pathlib.Path], callback: Callable[[pathlib.Path], Awaitable],
+                 *, debounce: Optional[float] = None) -> None:
+        self.roots = [pathlib.Path(root).resolve() for root in roots]
+        self.debounce = debounce if debounce is not None else self.DEBOUNCE_SECONDS
+
+        self._callback = callback
+        self._inotify = Inotify()
+
+        self._timers: Dict[pathlib.Path, asyncio.TimerHandle] = dict()
+        self._busy: Set[pathlib.Path] = set()
+        self._quiet_until: Dict[pathlib.Path, float] = dict()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Future] = None
+
+    def _album_of(self, path: pathlib.Path) -> Optional[pathlib.Path]:
+        for root in self.roots:
+            if root in path.parents:
+                return root / path.relative_to(root).parts[0]
+        return None
+
+    def _on_readable(self) -> None:
+        for event in self._inotify.read():
+            if event.mask & IN_Q_OVERFLOW:
+                # Events were lost, so every album might have changed.
+                for root in self.roots:
+                    for album in root.iterdir():
+                        if album.is_dir():
+                            self._schedule(album)
+                continue
+
+            if event.is_dir and event.mask & (IN_CREATE | IN_MOVED_TO):
+                self._inotify.add_tree(event.path)
+
+            album = self._album_of(event.path)
+            if album is not None:
+                self._schedule(album)
+
+    def _schedule(self, album: pathlib.Path) -> None:
+        if album in self._busy or self._loop.time() < self._quiet_until.get(album, 0.0):
+            return
+
+        timer = self._timers.pop(album, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[album] = self._loop.call_later(self.debounce, self._fire, album)
+
+    def _fire(self, album: pathlib.Path) -> None:
+        del self._timers[album]
+        if not album.is_dir():
+            return
+
+        task = self._loop.create_task(self._run(album))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, album: pathlib.Path) -> None:
+        self._busy.add(album)
+        try:
+            await self._callback(album)
+        except Exception as e:
+            print(f"Failed to process '{album}': {e}", file=sys.stderr)
+        finally:
+            self._busy.discard(album)
+            self._quiet_until[album] = self._loop.time() + self.QUIET_SECONDS
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_event_loop()
+        self._stopped = self._loop.create_future()
+
+        for root in self.roots:
+            self._inotify.add_tree(root)
+
+        self._loop.add_reader(self._inotify.fd, self._on_readable)
+        try:
+            await self._stopped
+        finally:
+            self._loop.remove_reader(self._inotify.fd)
+            for timer in self._timers.values():
+                timer.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._inotify.close()
+
+    def stop(self) -> None:
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
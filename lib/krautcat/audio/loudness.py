@@ -0,0 +1,247 @@
+import functools
+import math
+import pathlib
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy
+
+from krautcat.gstreamer import (ElementAppSink, ElementAudioConvert, ElementFileSource,
+                                PipelineTemplate, SampleFormat)
+
+
+def _biquad_impulse_response(b: Sequence[float], a: Sequence[float],
+                             signal: numpy.ndarray) -> numpy.ndarray:
+    output = numpy.empty_like(signal)
+    x1 = x2 = y1 = y2 = 0.0
+    for i, x in enumerate(signal.tolist()):
+        y = b[0] * x + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        x2, x1 = x1, x
+        y2, y1 = y1, y
+        output[i] = y
+    return output
+
+
+@functools.lru_cache(maxsize=8)
+def _k_weighting_taps(rate: int) -> numpy.ndarray:
+    # ITU-R BS.1770 pre-filter and RLB high-pass, recomputed for the given
+    # sample rate. Both are IIR, so the cascade is applied as a truncated
+    # impulse response: it decays far below float precision within 125 ms.
+    k = math.tan(math.pi * 1681.974450955533 / rate)
+    q = 0.7071752369554196
+    vh = 10.0 ** (3.999843853973347 / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf_b = ((vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0)
+    shelf_a = (1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0)
+
+    k = math.tan(math.pi * 38.13547087602444 / rate)
+    q = 0.5003270373238773
+    a0 = 1.0 + k / q + k * k
+    highpass_b = (1.0, -2.0, 1.0)
+    highpass_a = (1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0)
+
+    impulse = numpy.zeros(rate // 8)
+    impulse[0] = 1.0
+    return _biquad_impulse_response(highpass_b, highpass_a,
+                                    _biquad_impulse_response(shelf_b, shelf_a, impulse))
+
+
+@functools.lru_cache(maxsize=8)
+def _oversampling_taps(factor: int, taps_per_phase: int = 12) -> numpy.ndarray:
+    n = numpy.arange(factor * taps_per_phase) - (factor * taps_per_phase - 1) / 2.0
+    return numpy.sinc(n / factor) * numpy.kaiser(len(n), 8.0)
+
+
+class _PolyphasePeak:
+    def __init__(self, factor: int, channels: int, taps_per_phase: int = 12) -> None:
+        self._phases = _oversampling_taps(factor, taps_per_phase).reshape(-1, factor).T
+        self._history = numpy.zeros((taps_per_phase - 1, channels))
+
+    def __call__(self, samples: numpy.ndarray) -> float:
+        signal = numpy.concatenate((self._history, samples))
+        frames = len(samples)
+        delay = len(self._history)
+
+        peak = 0.0
+        output = numpy.empty_like(samples)
+        for phase in self._phases:
+            numpy.multiply(signal[delay:delay + frames], phase[0], out=output)
+            for k, tap in enumerate(phase[1:], start=1):
+                output += tap * signal[delay - k:delay - k + frames]
+            peak = max(peak, float(numpy.max(numpy.abs(output), initial=0.0)))
+
+        self._history = signal[frames:]
+        return peak
+
+
+class _OverlapAddFilter:
+    def __init__(self, taps: numpy.ndarray, channels: int) -> None:
+        self._taps = taps
+        self._tail = numpy.zeros((len(taps) - 1, channels))
+        self._spectra: Dict[int, numpy.ndarray] = dict()
+
+    def __call__(self, samples: numpy.ndarray) -> numpy.ndarray:
+        length = len(samples) + len(self._taps) - 1
+        fft_size = 1 << (length - 1).bit_length()
+
+        spectrum = self._spectra.get(fft_size, None)
+        if spectrum is None:
+            spectrum = self._spectra[fft_size] = numpy.fft.rfft(self._taps, fft_size)[:, None]
+
+        output = numpy.fft.irfft(numpy.fft.rfft(samples, fft_size, axis=0) * spectrum,
+                                 fft_size, axis=0)[:length]
+        output[:len(self._tail)] += self._tail
+        self._tail = output[len(samples):]
+
+        return output[:len(samples)]
+
+
+def _channel_weights(channels: int) -> numpy.ndarray:
+    if channels == 6:
+        return numpy.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    if channels == 5:
+        return numpy.array([1.0, 1.0, 1.0, 1.41, 1.41])
+    return numpy.ones(channels)
+
+
+def _block_loudness(energies: numpy.ndarray) -> numpy.ndarray:
+    with numpy.errstate(divide="ignore"):
+        return -0.691 + 10.0 * numpy.log10(energies)
+
+
+def integrated_loudness(block_energies: numpy.ndarray) -> Optional[float]:
+    gated = block_energies[_block_loudness(block_energies) > LoudnessMeter.GATE_ABSOLUTE]
+    if len(gated) == 0:
+        return None
+
+    relative_gate = _block_loudness(numpy.mean(gated)) + LoudnessMeter.GATE_RELATIVE
+    gated = gated[_block_loudness(gated) > relative_gate]
+    if len(gated) == 0:
+        return None
+
+    return float(_block_loudness(numpy.mean(gated)))
+
+
+class TrackLoudness:
+    def __init__(self, path: pathlib.Path, block_energies: numpy.ndarray, peak: float,
+                 duration: float) -> None:
+        self.path = path
+        self.block_energies = block_energies
+        self.peak = peak
+        self.duration = duration
+
+    @property
+    def loudness(self) -> Optional[float]:
+        return integrated_loudness(self.block_energies)
+
+
+class AlbumLoudness:
+    def __init__(self, tracks: List[TrackLoudness]) -> None:
+        self.tracks = tracks
+
+    @property
+    def loudness(self) -> Optional[float]:
+        if len(self.tracks) == 0:
+            return None
+        return integrated_loudness(numpy.concatenate([t.block_energies for t in self.tracks]))
+
+    @property
+    def peak(self) -> float:
+        return max((t.peak for t in self.tracks), default=0.0)
+
+
+class LoudnessMeter:
+    GATE_ABSOLUTE = -70.0
+    GATE_RELATIVE = -10.0
+
+    SEGMENT_SECONDS = 0.1
+    SEGMENTS_PER_BLOCK = 4
+
+    def __init__(self, rate: int, channels: int) -> None:
+        self.rate = rate
+        self.channels = channels
+
+        self.frames = 0
+        self.peak = 0.0
+
+        self._segment_frames = int(round(rate * self.SEGMENT_SECONDS))
+        self._weights = _channel_weights(channels)
+        self._k_weighting = _OverlapAddFilter(_k_weighting_taps(rate), channels)
+
+        self._oversampling = 4 if rate < 96000 else 2 if rate < 192000 else 1
+        self._true_peak = None
+        if self._oversampling > 1:
+            self._true_peak = _PolyphasePeak(self._oversampling, channels)
+
+        self._pending = numpy.empty(0)
+        self._segments: List[numpy.ndarray] = list()
+
+    def update(self, samples: numpy.ndarray) -> None:
+        if samples.dtype.kind in "iu":
+            scale = float(1 << (samples.dtype.itemsize * 8 - 1))
+            samples = samples.astype(numpy.float64) / scale
+        else:
+            samples = samples.astype(numpy.float64)
+
+        self.frames += len(samples)
+        self._update_peak(samples)
+
+        power = numpy.square(self._k_weighting(samples)) @ self._weights
+        power = numpy.concatenate((self._pending, power))
+
+        complete = len(power) // self._segment_frames * self._segment_frames
+        self._segments.append(power[:complete].reshape(-1, self._segment_frames).mean(axis=1))
+        self._pending = power[complete:]
+
+    def _update_peak(self, samples: numpy.ndarray) -> None:
+        peak = float(numpy.max(numpy.abs(samples), initial=0.0))
+
+        if self._true_peak is not None:
+            peak = max(peak, self._true_peak(samples))
+
+        self.peak = max(self.peak, peak)
+
+    @property
+    def block_energies(self) -> numpy.ndarray:
+        segments = numpy.concatenate(self._segments) if self._segments else numpy.empty(0)
+        if len(segments) < self.SEGMENTS_PER_BLOCK:
+            return numpy.empty(0)
+
+        window = numpy.ones(self.SEGMENTS_PER_BLOCK) / self.SEGMENTS_PER_BLOCK
+        return numpy.convolve(segments, window, mode="valid")
+
+    def result(self, path: pathlib.Path) -> TrackLoudness:
+        return TrackLoudness(path, self.block_energies, self.peak, self.frames / self.rate)
+
+
+def measure_file(path: pathlib.Path, parser, decoder) -> TrackLoudness:
+    from krautcat.gstreamer import Gst
+
+    template = PipelineTemplate.compile(
+        ("source", ElementFileSource),
+        ("parser", parser),
+        ("decoder", decoder),
+        ("convert", ElementAudioConvert),
+        ("sink", ElementAppSink, {"sample_format": SampleFormat.F32LE, "channels": None}),
+    )
+    pipeline = template.instantiate(source={"location": path})
+    sink = pipeline["sink"]
+
+    pipeline.state = Gst.State.PLAYING
+
+    meter = None
+    try:
+        for block in sink.blocks(1 << 18):
+            if meter is None:
+                meter = LoudnessMeter(sink.rate, sink.channels)
+            meter.update(block)
+
+        pipeline.check_errors()
+    finally:
+        pipeline.state = Gst.State.NULL
+
+    if meter is None:
+        return TrackLoudness(path, numpy.empty(0), 0.0, 0.0)
+
+    return meter.result(path)
@@ -1,6 +1,4 @@
-from typing import Optional, Union
-
-from mutagen.id3 import ID3TimeStamp
+from typing import Dict, Optional, Union
 
 
 class Date:
@@ -22,7 +20,7 @@ class Date:
             self.year = date_string
             return
 
-        if isinstance(date_string, ID3TimeStamp):
+        if not isinstance(date_string, str):
             date_string = str(date_string)
 
         date_parts = list()
@@ -47,3 +45,41 @@ class Date:
                 date_parts.append(part)
 
         return "-".join([str(p) for p in date_parts])
+
+
+class ReplayGain:
+    REFERENCE_LOUDNESS = -18.0
+
+    def __init__(self, *, track_gain: Optional[float] = None, track_peak: Optional[float] = None,
+                 album_gain: Optional[float] = None, album_peak: Optional[float] = None) -> None:
+        self.track_gain = track_gain
+        self.track_peak = track_peak
+        self.album_gain = album_gain
+        self.album_peak = album_peak
+
+    @classmethod
+    def from_loudness(cls, track_loudness: Optional[float], track_peak: Optional[float],
+                      album_loudness: Optional[float] = None,
+                      album_peak: Optional[float] = None) -> "ReplayGain":
+        def _gain(loudness: Optional[float]) -> Optional[float]:
+            if loudness is None:
+                return None
+            return cls.REFERENCE_LOUDNESS - loudness
+
+        return cls(track_gain=_gain(track_loudness), track_peak=track_peak,
+                   album_gain=_gain(album_loudness), album_peak=album_peak)
+
+    def tags(self) -> Dict[str, str]:
+        tags = dict()
+        if self.track_gain is not None:
+            tags["REPLAYGAIN_TRACK_GAIN"] = f"{self.track_gain:+.2f} dB"
+        if self.track_peak is not None:
+            tags["REPLAYGAIN_TRACK_PEAK"] = f"{self.track_peak:.6f}"
+        if self.album_gain is not None:
+            tags["REPLAYGAIN_ALBUM_GAIN"] = f"{self.album_gain:+.2f} dB"
+        if self.album_peak is not None:
+            tags["REPLAYGAIN_ALBUM_PEAK"] = f"{self.album_peak:.6f}"
+        return tags
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name.lower()} {value}" for name, value in self.tags().items())
@@ -1,65 +1,177 @@
-import musicbrainzngs
+import importlib
+import threading
+
+from typing import TYPE_CHECKING, Optional
+
+from .matching import credited_artist, release_year, score_release, similarity
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+    from .client import BackgroundLoop, MusicBrainzClient, Transport
+    from .local import LocalIndex
+
+
+# The HTTP client, the response cache and the local index pull in urllib and
+# sqlite3, so they are only imported once something uses them.
+_LAZY = {
+    "ResponseCache": ".cache",
+    "DEFAULT_BASE_URL": ".client",
+    "BackgroundLoop": ".client",
+    "MusicBrainzClient": ".client",
+    "Transport": ".client",
+    "lucene_escape": ".client",
+    "LocalIndex": ".local",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name, None)
+    if module is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    return getattr(importlib.import_module(module, __name__), name)
+
+
+_shared_lock = threading.Lock()
+_shared_loop: Optional["BackgroundLoop"] = None
+_shared_clients = dict()
+
+
+def _background_loop() -> "BackgroundLoop":
+    global _shared_loop
+
+    from .client import BackgroundLoop
+
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = BackgroundLoop()
+        return _shared_loop
+
+
+def _shared_client(base_url: str) -> "MusicBrainzClient":
+    from .cache import ResponseCache
+    from .client import MusicBrainzClient
+
+    with _shared_lock:
+        client = _shared_clients.get(base_url, None)
+        if client is None:
+            client = _shared_clients[base_url] = MusicBrainzClient(base_url, cache=ResponseCache())
+        return client
+
 
- 
 class MusicBrainzAPI:
-    def __init__(self):
-        musicbrainzngs.set_useragent("Krautcat Music App", "0.0.1",
-                                     "georgiy.odishariya@gmail.com")
+    RELEASE_QUERY_LIMIT = 25
+    MIN_TITLE_SIMILARITY = 0.9
+    MIN_ARTIST_SIMILARITY = 0.5
+    MIN_ARTIST_SIMILARITY_FALLBACK = 0.75
 
-        self._artist_of_album_cache = dict()
+    def __init__(self, cache: Optional["ResponseCache"] = None, *,
+                 base_url: Optional[str] = None,
+                 transport: Optional["Transport"] = None,
+                 local_index: Optional["LocalIndex"] = None,
+                 offline: bool = False):
+        self._local_index = local_index
 
-    def get_artist_of_album(self, artist, album, date=None, *, cache=False):
-        if cache:
-            artist_in_mb = self._artist_of_album_cache.get(artist, None)
+        self._client = None
+        self._loop = None
+        self._cache = cache
+
+        if offline:
+            if local_index is None:
+                raise ValueError("Offline MusicBrainz lookups require a local index")
+            return
+
+        from .cache import ResponseCache
+        from .client import DEFAULT_BASE_URL, MusicBrainzClient
+
+        base_url = base_url if base_url is not None else DEFAULT_BASE_URL
+
+        # Clients are shared per base URL, so the rate limit and in-flight
+        # requests are coordinated between all instances in the process.
+        if cache is None and transport is None:
+            self._client = _shared_client(base_url)
         else:
-            artist_in_mb = None
-
-        if artist_in_mb is not None:
-            return artist_in_mb
-        
-        artist_offset = 0
-        not_found = True
-        page = 1
-
-        while not_found and page < 6:
-            mb_artists = musicbrainzngs.search_artists(offset=artist_offset,
-                                                       artist=artist)
-
-            for mb_artist in mb_artists["artist-list"]:
-
-                album_offset = 0    
-                
-                while not_found:
-                    mb_albums = musicbrainzngs.search_releases(offset=album_offset,
-                                                               arid=mb_artist["id"])
-            
-                    for mb_album in mb_albums["release-list"]:
-                        if date is not None:
-                            date = date.split("-")[0]
-                            date_cond = (
-                                "date" in mb_album
-                                and mb_album["date"].split("-")[0] == str(date)
-                            )
-                        else:
-                            date_cond = True
-                        
-                        if album == mb_album["title"] and date_cond:
-                            artist_in_mb = mb_artist["name"]
-                            not_found = False
-
-                    if len(mb_albums["release-list"]) == mb_albums["release-count"] - album_offset:
-                        break
-                    else:
-                        album_offset += len(mb_albums["release-list"])
-
-            if len(mb_artists["artist-list"]) == mb_artists["artist-count"] - artist_offset:
-                break
-            else:
-                artist_offset += len(mb_artists["artist-list"])
+            self._client = MusicBrainzClient(base_url, transport=transport,
+                                             cache=cache if cache is not None else ResponseCache())
+
+        self._cache = self._client.cache
+        self._loop = _background_loop()
+
+    @property
+    def requests(self) -> int:
+        return self._client.requests if self._client is not None else 0
+
+    def search_artists(self, artist, *, offset=0, limit=25):
+        from .client import lucene_escape
+
+        return self._loop.run(self._client.search("artist", f"artist:\"{lucene_escape(artist)}\"",
+                                                  offset=offset, limit=limit))
+
+    def search_releases(self, query, *, offset=0, limit=25):
+        return self._loop.run(self._client.search("release", query, offset=offset, limit=limit))
+
+    def _best_release(self, releases, album, artist, year, min_artist_similarity):
+        best = None
+        best_score = None
+        for release in releases:
+            if similarity(release.get("title", ""), album) < self.MIN_TITLE_SIMILARITY:
+                continue
+
+            candidate_year = release_year(release)
+            if year is not None and candidate_year is not None and candidate_year != year:
+                continue
+
+            candidate_artist = credited_artist(release)
+            if (candidate_artist is None
+                    or similarity(candidate_artist, artist) < min_artist_similarity):
+                continue
 
-            page += 1
+            score = (score_release(release, album, artist, year), release.get("score", 0))
+            if best_score is None or score > best_score:
+                best, best_score = release, score
+
+        return best
+
+    def get_artist_of_album(self, artist, album, date=None, *, cache=False):
+        query = {"artist": artist, "album": album, "date": str(date) if date is not None else None}
+
+        if cache and self._cache is not None:
+            artist_in_mb = self._cache.get("artist_of_album", query)
+            if artist_in_mb is not None:
+                return artist_in_mb
+
+        year = str(date).split("-")[0] if date is not None else ""
+        year = year if year not in ("", "0") else None
+
+        if self._local_index is not None:
+            release = self._best_release(self._local_index.search_releases(album), album, artist,
+                                         year, self.MIN_ARTIST_SIMILARITY_FALLBACK)
+            if release is not None:
+                return credited_artist(release)
+            if self._client is None:
+                return None
+
+        from .client import lucene_escape
+
+        # One combined query almost always finds the release. Searching by
+        # title alone only helps when the artist tag is spelled differently
+        # from MusicBrainz, so the local artist match is stricter there.
+        strategies = [
+            (f"release:\"{lucene_escape(album)}\" AND artist:\"{lucene_escape(artist)}\"",
+             self.MIN_ARTIST_SIMILARITY),
+            (f"release:\"{lucene_escape(album)}\"",
+             self.MIN_ARTIST_SIMILARITY_FALLBACK),
+        ]
+
+        artist_in_mb = None
+        for release_query, min_artist_similarity in strategies:
+            releases = self.search_releases(release_query, limit=self.RELEASE_QUERY_LIMIT)
+            release = self._best_release(releases["releases"], album, artist, year,
+                                         min_artist_similarity)
+            if release is not None:
+                artist_in_mb = credited_artist(release)
+                break
 
-        if artist_in_mb is not None:
-            self._artist_of_album_cache[artist] = artist_in_mb
+        if artist_in_mb is not None and self._cache is not None:
+            self._cache.put("artist_of_album", query, artist_in_mb)
 
-        return artist_in_mb
\ No newline at end of file
+        return artist_in_mb
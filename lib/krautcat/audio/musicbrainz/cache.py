@@ -0,0 +1,118 @@
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+from typing import Any, Mapping, Optional, Union
+
+
+def default_cache_path() -> pathlib.Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME", None)
+    if cache_home:
+        return pathlib.Path(cache_home) / "krautcat" / "musicbrainz.sqlite"
+    return pathlib.Path.home() / ".cache" / "krautcat" / "musicbrainz.sqlite"
+
+
+class ResponseCache:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at);
+    """
+
+    DEFAULT_TTL = 30 * 24 * 60 * 60
+    DEFAULT_MAX_ENTRIES = 200000
+    EVICT_INTERVAL = 64
+
+    def __init__(self, path: Union[str, pathlib.Path, None] = None, *,
+                 ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = pathlib.Path(path) if path is not None else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._puts = 0
+        # Counters are shared by the threads of a worker pool.
+        self._counter_lock = threading.Lock()
+
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads, and WAL mode
+        # with a busy timeout lets other processes read and write concurrently.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30.0)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def key(namespace: str, params: Mapping[str, Any]) -> str:
+        return f"{namespace}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def get(self, namespace: str, params: Mapping[str, Any]) -> Optional[Any]:
+        key = self.key(namespace, params)
+        now = time.time()
+
+        with self._connection() as connection:
+            row = connection.execute("SELECT value, created_at FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                with self._counter_lock:
+                    self.misses += 1
+                return None
+
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        with self._counter_lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, namespace: str, params: Mapping[str, Any], value: Any) -> None:
+        key = self.key(namespace, params)
+        now = time.time()
+
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now)
+            )
+
+            with self._counter_lock:
+                self._puts += 1
+                evict = self._puts % self.EVICT_INTERVAL == 0
+            if evict:
+                self._evict(connection, now)
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+
+        count = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
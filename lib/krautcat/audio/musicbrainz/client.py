@@ -0,0 +1,199 @@
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from .cache import ResponseCache
+
+
+DEFAULT_BASE_URL = "https://musicbrainz.org/ws/2"
+USER_AGENT = "Krautcat Music App/0.0.1 ( georgiy.odishariya@gmail.com )"
+
+
+class MusicBrainzError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        self.message = message
+        self.status = status
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 1.0, capacity: float = 1.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def penalize(self, delay: float) -> None:
+        self._tokens = min(self._tokens, 0.0) - delay * self.rate
+
+
+class Transport(ABC):
+    @abstractmethod
+    async def get(self, url: str, headers: Mapping[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        ...
+
+
+class UrllibTransport(Transport):
+    def __init__(self, timeout: float = 30.0) -> None:
+        self.timeout = timeout
+
+    def _get(self, url: str, headers: Mapping[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        request = urllib.request.Request(url, headers=dict(headers))
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers or {}), e.read()
+
+    async def get(self, url: str, headers: Mapping[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        return await asyncio.get_event_loop().run_in_executor(None, self._get, url, headers)
+
+
+class MusicBrainzClient:
+    RETRY_STATUSES = (429, 502, 503, 504)
+    # Dropped connections and timeouts are as transient as a 503.
+    RETRY_EXCEPTIONS = (urllib.error.URLError, ConnectionError, TimeoutError, socket.timeout,
+                        asyncio.TimeoutError)
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, *,
+                 transport: Optional[Transport] = None,
+                 cache: Optional[ResponseCache] = None,
+                 rate: float = 1.0,
+                 max_retries: int = 5,
+                 backoff: float = 1.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport if transport is not None else UrllibTransport()
+        self.cache = cache
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.requests = 0
+
+        self._rate = rate
+        self._bucket: Optional[TokenBucket] = None
+        self._in_flight: Dict[str, asyncio.Future] = dict()
+
+    async def get(self, path: str, params: Mapping[str, Any]) -> Dict[str, Any]:
+        params = {k: v for k, v in params.items() if v is not None}
+
+        if self.cache is not None:
+            response = self.cache.get(f"GET {path}", params)
+            if response is not None:
+                return response
+
+        key = ResponseCache.key(path, params)
+        in_flight = self._in_flight.get(key, None)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future = self._in_flight[key] = asyncio.get_event_loop().create_future()
+        try:
+            response = await self._fetch(path, params)
+            if self.cache is not None:
+                self.cache.put(f"GET {path}", params, response)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve the exception so waiter-less futures don't log it.
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _fetch(self, path: str, params: Mapping[str, Any]) -> Dict[str, Any]:
+        if self._bucket is None:
+            self._bucket = TokenBucket(self._rate)
+
+        query = urllib.parse.urlencode({**params, "fmt": "json"})
+        url = f"{self.base_url}/{path.strip('/')}?{query}"
+        headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+
+            self.requests += 1
+            try:
+                status, response_headers, body = await self.transport.get(url, headers)
+            except self.RETRY_EXCEPTIONS as e:
+                if attempt == self.max_retries:
+                    raise MusicBrainzError(f"MusicBrainz request '{path}' failed: {e}") from e
+                self._bucket.penalize(self._backoff_delay(attempt))
+                continue
+
+            if status == 200:
+                return json.loads(body.decode("utf-8"))
+
+            if status not in self.RETRY_STATUSES or attempt == self.max_retries:
+                raise MusicBrainzError(f"MusicBrainz request '{path}' failed with HTTP {status}",
+                                       status)
+
+            delay = self._backoff_delay(attempt)
+            retry_after = response_headers.get("Retry-After", None)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+
+            self._bucket.penalize(delay)
+
+        raise MusicBrainzError(f"MusicBrainz request '{path}' failed")
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (1.0 + random.random() / 2)
+
+    async def search(self, entity: str, query: str, *,
+                     limit: int = 25, offset: int = 0) -> Dict[str, Any]:
+        return await self.get(entity, {"query": query, "limit": limit, "offset": offset})
+
+    async def lookup(self, entity: str, mbid: str, *, inc: Optional[str] = None) -> Dict[str, Any]:
+        return await self.get(f"{entity}/{mbid}", {"inc": inc})
+
+
+class BackgroundLoop:
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name="musicbrainz-client", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def lucene_escape(value: str) -> str:
+    special = '+-&|!(){}[]^"~*?:\\/'
+    return "".join(f"\\{c}" if c in special else c for c in value)
@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+import tarfile
+import threading
+
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .matching import credited_artist, normalize_name
+
+
+class LocalIndexError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def default_local_index_path() -> pathlib.Path:
+    data_home = os.environ.get("XDG_DATA_HOME", None)
+    if data_home:
+        return pathlib.Path(data_home) / "krautcat" / "musicbrainz-local.sqlite"
+    return pathlib.Path.home() / ".local" / "share" / "krautcat" / "musicbrainz-local.sqlite"
+
+
+class LocalIndex:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS artists (
+            gid TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_norm TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS artists_name_norm ON artists(name_norm);
+        CREATE TABLE IF NOT EXISTS releases (
+            gid TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            title_norm TEXT NOT NULL,
+            artist TEXT,
+            year TEXT
+        );
+        CREATE INDEX IF NOT EXISTS releases_title_norm ON releases(title_norm);
+        CREATE TABLE IF NOT EXISTS release_groups (
+            gid TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            title_norm TEXT NOT NULL,
+            artist TEXT,
+            year TEXT
+        );
+        CREATE INDEX IF NOT EXISTS release_groups_title_norm ON release_groups(title_norm);
+    """
+
+    # TSV dump tables an import can't do without.
+    REQUIRED_TABLES = ("artist", "artist_credit_name", "release")
+
+    BATCH_SIZE = 10000
+
+    def __init__(self, path: Union[str, pathlib.Path, None] = None) -> None:
+        self.path = pathlib.Path(path) if path is not None else default_local_index_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30.0)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.create_function("normalize_name", 1, normalize_name)
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def search_releases(self, album: str) -> List[Dict[str, Any]]:
+        # Release groups carry the original release year, which the tags
+        # usually hold even when only a later reissue is in the dump.
+        rows = self._connection().execute(
+            "SELECT gid, title, artist, year FROM releases WHERE title_norm = ? "
+            "UNION ALL "
+            "SELECT gid, title, artist, year FROM release_groups WHERE title_norm = ?",
+            (normalize_name(album),) * 2
+        )
+        return [{"id": gid, "title": title, "date": year or "",
+                 "artist-credit": [{"name": artist, "artist": {"name": artist}}] if artist else []}
+                for gid, title, artist, year in rows]
+
+    def search_artists(self, artist: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT gid, name FROM artists WHERE name_norm = ?", (normalize_name(artist),)
+        )
+        return [{"id": gid, "name": name} for gid, name in rows]
+
+    def _insert_batches(self, statement: str, rows: Iterable[Tuple]) -> int:
+        connection = self._connection()
+
+        count = 0
+        batch = list()
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.BATCH_SIZE:
+                with connection:
+                    connection.executemany(statement, batch)
+                count += len(batch)
+                batch.clear()
+
+        if batch:
+            with connection:
+                connection.executemany(statement, batch)
+            count += len(batch)
+
+        return count
+
+    def import_json(self, entity: str, lines: Iterable[bytes]) -> int:
+        if entity == "artist":
+            return self._insert_batches(
+                "INSERT OR REPLACE INTO artists (gid, name, name_norm) VALUES (?, ?, ?)",
+                ((obj["id"], obj["name"], normalize_name(obj["name"]))
+                 for obj in map(json.loads, lines))
+            )
+
+        if entity in ("release", "release-group"):
+            table, date_key = (("releases", "date") if entity == "release"
+                               else ("release_groups", "first-release-date"))
+
+            def _rows(objects: Iterator[Dict[str, Any]]) -> Iterator[Tuple]:
+                for obj in objects:
+                    date = obj.get(date_key, None) or ""
+                    yield (obj["id"], obj["title"], normalize_name(obj["title"]),
+                           credited_artist(obj), date.split("-")[0] or None)
+
+            return self._insert_batches(
+                f"INSERT OR REPLACE INTO {table} (gid, title, title_norm, artist, year) "
+                "VALUES (?, ?, ?, ?, ?)", _rows(map(json.loads, lines))
+            )
+
+        return 0
+
+    def import_tsv(self, directory: pathlib.Path) -> int:
+        missing = [name for name in self.REQUIRED_TABLES if not (directory / name).is_file()]
+        if missing:
+            raise LocalIndexError(f"'{directory}' isn't a MusicBrainz TSV dump, "
+                                  f"missing {', '.join(missing)}")
+
+        connection = self._connection()
+        connection.executescript("""
+            CREATE TEMP TABLE IF NOT EXISTS dump_artist (id INTEGER PRIMARY KEY, gid TEXT, name TEXT);
+            CREATE TEMP TABLE IF NOT EXISTS dump_artist_credit_name (
+                artist_credit INTEGER, position INTEGER, artist INTEGER, join_phrase TEXT
+            );
+            CREATE TEMP TABLE IF NOT EXISTS dump_release (
+                id INTEGER PRIMARY KEY, gid TEXT, name TEXT, artist_credit INTEGER
+            );
+            CREATE TEMP TABLE IF NOT EXISTS dump_release_date (release INTEGER, year INTEGER);
+            CREATE TEMP TABLE IF NOT EXISTS dump_release_group (
+                id INTEGER PRIMARY KEY, gid TEXT, name TEXT, artist_credit INTEGER
+            );
+            CREATE TEMP TABLE IF NOT EXISTS dump_release_group_year (
+                release_group INTEGER PRIMARY KEY, year INTEGER
+            );
+        """)
+
+        def _table(name: str, columns: Tuple[int, ...]) -> Iterator[Tuple]:
+            # Only optional tables can be missing here.
+            path = directory / name
+            if not path.exists():
+                return
+            with path.open("r", encoding="utf-8", newline="\n") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("\t")
+                    yield tuple(_unescape_tsv(fields[i]) for i in columns)
+
+        self._insert_batches("INSERT INTO dump_artist VALUES (?, ?, ?)", _table("artist", (0, 1, 2)))
+        self._insert_batches("INSERT INTO dump_artist_credit_name VALUES (?, ?, ?, ?)",
+                             _table("artist_credit_name", (0, 1, 2, 4)))
+        self._insert_batches("INSERT INTO dump_release VALUES (?, ?, ?, ?)",
+                             _table("release", (0, 1, 2, 3)))
+        self._insert_batches("INSERT INTO dump_release_date VALUES (?, ?)",
+                             _table("release_country", (0, 2)))
+        self._insert_batches("INSERT INTO dump_release_date VALUES (?, ?)",
+                             _table("release_unknown_country", (0, 1)))
+        self._insert_batches("INSERT INTO dump_release_group VALUES (?, ?, ?, ?)",
+                             _table("release_group", (0, 1, 2, 3)))
+        self._insert_batches("INSERT INTO dump_release_group_year VALUES (?, ?)",
+                             _table("release_group_meta", (0, 2)))
+
+        credit = """(SELECT group_concat(credit, '') FROM (
+                         SELECT a.name || coalesce(acn.join_phrase, '') AS credit
+                         FROM dump_artist_credit_name acn
+                         JOIN dump_artist a ON a.id = acn.artist
+                         WHERE acn.artist_credit = {}.artist_credit
+                         ORDER BY acn.position))"""
+
+        count = 0
+        with connection:
+            connection.executescript("""
+                CREATE INDEX IF NOT EXISTS temp.dump_acn_credit
+                    ON dump_artist_credit_name(artist_credit, position);
+                CREATE INDEX IF NOT EXISTS temp.dump_release_date_release
+                    ON dump_release_date(release);
+            """)
+
+            count += connection.execute(
+                "INSERT OR REPLACE INTO artists (gid, name, name_norm) "
+                "SELECT gid, name, normalize_name(name) FROM dump_artist"
+            ).rowcount
+            count += connection.execute(f"""
+                INSERT OR REPLACE INTO releases (gid, title, title_norm, artist, year)
+                    SELECT r.gid, r.name, normalize_name(r.name), {credit.format("r")},
+                           (SELECT CAST(min(d.year) AS TEXT) FROM dump_release_date d
+                            WHERE d.release = r.id AND d.year IS NOT NULL)
+                    FROM dump_release r
+            """).rowcount
+            count += connection.execute(f"""
+                INSERT OR REPLACE INTO release_groups (gid, title, title_norm, artist, year)
+                    SELECT rg.gid, rg.name, normalize_name(rg.name), {credit.format("rg")},
+                           CAST(y.year AS TEXT)
+                    FROM dump_release_group rg
+                    LEFT JOIN dump_release_group_year y ON y.release_group = rg.id
+            """).rowcount
+
+            connection.executescript("""
+                DROP TABLE dump_artist;
+                DROP TABLE dump_artist_credit_name;
+                DROP TABLE dump_release;
+                DROP TABLE dump_release_date;
+                DROP TABLE dump_release_group;
+                DROP TABLE dump_release_group_year;
+            """)
+
+        return count
+
+    def import_dump(self, path: pathlib.Path) -> int:
+        if path.is_dir():
+            return self.import_tsv(path / "mbdump" if (path / "mbdump").is_dir() else path)
+
+        if tarfile.is_tarfile(str(path)):
+            count = 0
+            with tarfile.open(str(path), "r:*") as archive:
+                for member in archive:
+                    entity = pathlib.PurePosixPath(member.name).name
+                    if member.isfile() and member.name.startswith("mbdump/"):
+                        count += self.import_json(entity, _lines(archive.extractfile(member)))
+            return count
+
+        with path.open("rb") as f:
+            return self.import_json(path.name.split(".")[0], _lines(f))
+
+
+def _lines(f: Optional[IO[bytes]]) -> Iterator[bytes]:
+    if f is None:
+        return
+    for line in f:
+        if line.strip():
+            yield line
+
+
+_TSV_ESCAPE = re.compile(r"\\(.)")
+_TSV_ESCAPES = {"t": "\t", "n": "\n", "r": "\r"}
+
+
+def _unescape_tsv(field: str) -> Optional[str]:
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    return _TSV_ESCAPE.sub(lambda m: _TSV_ESCAPES.get(m.group(1), m.group(1)), field)
+
+
+class Argparser:
+    def __init__(self):
+        argparser = self._argparser = argparse.ArgumentParser(
+                description="Import MusicBrainz data dumps into a local lookup index")
+
+        argparser.add_argument("dump", action="store",
+                               type=pathlib.Path, nargs="+",
+                               help="JSON dump archives or files, or directories with TSV dumps")
+        argparser.add_argument("--index", action="store",
+                               type=pathlib.Path, default=default_local_index_path(),
+                               help="Path to local index database")
+
+    def parse(self, args):
+        return self._argparser.parse_args(args)
+
+
+def main():
+    argparser = Argparser()
+    cli_args = argparser.parse(sys.argv[1:])
+
+    index = LocalIndex(cli_args.index)
+    status = 0
+    for dump in cli_args.dump:
+        try:
+            count = index.import_dump(dump)
+        except LocalIndexError as e:
+            print(e, file=sys.stderr)
+            status = 1
+            continue
+        print(f"{dump}: imported {count} entries")
+    index.close()
+
+    return status
@@ -0,0 +1,58 @@
+import difflib
+import re
+import unicodedata
+
+from typing import Any, Mapping, Optional
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    name = unicodedata.normalize("NFKD", str(name)).casefold()
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = _PUNCTUATION.sub(" ", name.replace("&", " and "))
+    name = _WHITESPACE.sub(" ", name).strip()
+    if name.startswith("the "):
+        name = name[4:]
+    return name
+
+
+def similarity(a: str, b: str) -> float:
+    a, b = normalize_name(a), normalize_name(b)
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def credited_artist(release: Mapping[str, Any]) -> Optional[str]:
+    credits = release.get("artist-credit", None)
+    if not credits:
+        return None
+    return "".join(credit.get("artist", {}).get("name", credit.get("name", ""))
+                   + credit.get("joinphrase", "")
+                   for credit in credits)
+
+
+def release_year(release: Mapping[str, Any]) -> Optional[str]:
+    date = release.get("date", None)
+    if not date:
+        return None
+    return date.split("-")[0]
+
+
+def score_release(release: Mapping[str, Any], album: str, artist: Optional[str],
+                  year: Optional[str]) -> float:
+    score = similarity(release.get("title", ""), album)
+
+    release_artist = credited_artist(release)
+    if artist is not None and release_artist is not None:
+        score += similarity(release_artist, artist)
+    elif artist is not None:
+        score += 0.5
+
+    if year is not None:
+        score += 0.5 if release_year(release) == year else 0.0
+
+    return score
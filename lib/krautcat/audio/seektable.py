@@ -0,0 +1,230 @@
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+import random
+import sys
+import time
+
+from typing import Iterable, List, Optional
+
+from krautcat.audio.file.audio.flac import AudioFileFLAC, FLACFrame
+from krautcat.gstreamer import (ElementFakeSink, ElementFileSource,
+                                ElementFLACDecoder, ElementFLACParser,
+                                PipelineTemplate)
+
+
+class SeektableReport:
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+        self.seekpoints_before = 0
+        self.max_gap_before: Optional[float] = None
+        self.latency_before: Optional[float] = None
+
+        self.seekpoints_after: Optional[int] = None
+        self.max_gap_after: Optional[float] = None
+        self.latency_after: Optional[float] = None
+
+        self.rebuilt = False
+        self.skipped: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"{self.path}: {self.error}"
+
+        line = f"{self.path}: {self.seekpoints_before} seekpoints"
+        if self.max_gap_before is not None:
+            line += f", max gap {self.max_gap_before:.1f}s"
+        if self.latency_before is not None:
+            line += f", seek {self.latency_before * 1000:.1f}ms"
+
+        if self.seekpoints_after is not None:
+            line += f" -> {self.seekpoints_after} seekpoints"
+            if self.max_gap_after is not None:
+                line += f", max gap {self.max_gap_after:.1f}s"
+            if self.latency_after is not None:
+                line += f", seek {self.latency_after * 1000:.1f}ms"
+        elif self.skipped is not None:
+            line += f", not rebuilt: {self.skipped}"
+
+        return line
+
+
+def _max_gap(seekpoints: List[FLACFrame], sample_rate: int, total_samples: int) -> float:
+    boundaries = [0] + [p.first_sample for p in seekpoints] + [total_samples]
+    return max(b - a for a, b in zip(boundaries, boundaries[1:])) / sample_rate
+
+
+def select_seekpoints(frames: Iterable[FLACFrame], sample_rate: int,
+                      density: float) -> List[FLACFrame]:
+    step = max(int(density * sample_rate), 1)
+
+    # Last frame starting within a step of the previous seekpoint, so that
+    # seekpoints never end up further apart than the density.
+    seekpoints = list()
+    previous = None
+    for frame in frames:
+        if len(seekpoints) == 0:
+            seekpoints.append(frame)
+        elif frame.first_sample - seekpoints[-1].first_sample > step and previous != seekpoints[-1]:
+            seekpoints.append(previous)
+        previous = frame
+
+    if (previous is not None and previous != seekpoints[-1]
+            and previous.first_sample + previous.num_samples - seekpoints[-1].first_sample > step):
+        seekpoints.append(previous)
+
+    return seekpoints
+
+
+def _thin_seekpoints(seekpoints: List[FLACFrame], capacity: int) -> List[FLACFrame]:
+    if capacity >= len(seekpoints):
+        return seekpoints
+    return [seekpoints[i * len(seekpoints) // capacity] for i in range(capacity)]
+
+
+def measure_seek_latency(path: pathlib.Path, positions: List[int]) -> float:
+    from krautcat.gstreamer import Gst
+
+    template = PipelineTemplate.compile(
+        ("source", ElementFileSource),
+        ("parser", ElementFLACParser),
+        ("decoder", ElementFLACDecoder),
+        ("sink", ElementFakeSink),
+    )
+    pipeline = template.instantiate(source={"location": path})
+
+    pipeline.state = Gst.State.PAUSED
+    pipeline.__gobject__.get_state(Gst.CLOCK_TIME_NONE)
+
+    started = time.perf_counter()
+    for position in positions:
+        pipeline.__gobject__.seek_simple(Gst.Format.TIME,
+                                         Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE,
+                                         position)
+        pipeline.__gobject__.get_state(Gst.CLOCK_TIME_NONE)
+    elapsed = time.perf_counter() - started
+
+    pipeline.state = Gst.State.NULL
+
+    return elapsed / len(positions)
+
+
+def process_file(path: pathlib.Path, density: float, rebuild: bool,
+                 allow_rewrite: bool, seeks: int) -> SeektableReport:
+    report = SeektableReport(path)
+
+    try:
+        audio_file = AudioFileFLAC(path, open=False)
+        stream_info = audio_file.stream_info
+        sample_rate = stream_info.sample_rate
+        total_samples = stream_info.total_samples
+
+        seekpoints = audio_file.load_seektable()
+        report.seekpoints_before = len(seekpoints)
+        if total_samples > 0:
+            report.max_gap_before = _max_gap(seekpoints, sample_rate, total_samples)
+
+        positions = list()
+        if seeks > 0 and total_samples > 0:
+            from krautcat.gstreamer import Gst
+
+            rng = random.Random(str(path))
+            duration = total_samples * Gst.SECOND // sample_rate
+            positions = [rng.randrange(duration) for _ in range(seeks)]
+            report.latency_before = measure_seek_latency(path, positions)
+
+        if not rebuild or (report.max_gap_before is not None
+                           and report.max_gap_before <= density):
+            return report
+
+        seekpoints = select_seekpoints(audio_file.scan_frames(), sample_rate, density)
+        if len(seekpoints) == 0:
+            report.skipped = "no frames found"
+            return report
+
+        if not allow_rewrite:
+            capacity = audio_file.seektable_capacity()
+            if capacity == 0:
+                report.skipped = "no padding for a seektable, use --allow-rewrite"
+                return report
+            seekpoints = _thin_seekpoints(seekpoints, capacity)
+
+        if not audio_file.save_seektable(seekpoints, allow_rewrite=allow_rewrite):
+            report.skipped = "seektable doesn't fit into padding"
+            return report
+
+        report.rebuilt = True
+        report.seekpoints_after = len(seekpoints)
+        report.max_gap_after = _max_gap(seekpoints, sample_rate, total_samples)
+        if len(positions) > 0:
+            report.latency_after = measure_seek_latency(path, positions)
+    except Exception as e:
+        report.error = str(e) or type(e).__name__
+
+    return report
+
+
+def _flac_files(directories: List[pathlib.Path]) -> Iterable[pathlib.Path]:
+    for directory in directories:
+        if directory.is_file():
+            yield directory
+            continue
+
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.lower().endswith(f".{AudioFileFLAC.EXTENSION}"):
+                    yield pathlib.Path(root) / name
+
+
+class Argparser:
+    def __init__(self):
+        argparser = self._argparser = argparse.ArgumentParser(
+                description="Audit and rebuild FLAC seektables")
+
+        argparser.add_argument("directory", action="store",
+                               type=pathlib.Path, nargs="+",
+                               help="FLAC files or directories to scan recursively")
+        argparser.add_argument("-d", "--density", action="store",
+                               type=float, default=10.0,
+                               help="Maximum distance between seekpoints, in seconds")
+        argparser.add_argument("--rebuild", action="store_true",
+                               help="Rebuild seektables sparser than requested density")
+        argparser.add_argument("--allow-rewrite", action="store_true",
+                               help="Rewrite the whole file when the seektable doesn't fit "
+                               "into existing padding instead of thinning it out")
+        argparser.add_argument("--seeks", action="store",
+                               type=int, default=8,
+                               help="Number of seeks for latency measurement, 0 to disable")
+        argparser.add_argument("-j", "--jobs", action="store",
+                               type=int, default=os.cpu_count(),
+                               help="Number of parallel processes")
+
+    def parse(self, args):
+        return self._argparser.parse_args(args)
+
+
+def main():
+    argparser = Argparser()
+    cli_args = argparser.parse(sys.argv[1:])
+
+    status = 0
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=cli_args.jobs,
+            mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(process_file, path, cli_args.density, cli_args.rebuild,
+                               cli_args.allow_rewrite, cli_args.seeks)
+                   for path in _flac_files(cli_args.directory)]
+
+        for future in concurrent.futures.as_completed(futures):
+            report = future.result()
+            if report.error is not None:
+                status = 1
+                print(report, file=sys.stderr)
+            else:
+                print(report)
+
+    return status
@@ -1,27 +1,63 @@
+import asyncio
+import functools
 import pathlib
+import threading
+import time
+import weakref
 
 from enum import Enum, IntEnum
-from typing import Optional, Union
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type, Union
 
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GObject, GLib
-Gst.init(None)
+
+_init_lock = threading.Lock()
+
+
+def init() -> None:
+    global Gst, GObject, GLib
+
+    with _init_lock:
+        if "Gst" in globals():
+            return
+
+        import gi
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst, GObject, GLib
+        Gst.init(None)
+
+
+def __getattr__(name: str):
+    if name in ("Gst", "GObject", "GLib"):
+        init()
+        return globals()[name]
+
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+class _GstreamerEnum:
+    def __init__(self, prop: str) -> None:
+        self._prop = prop
+        self._enum = None
+
+    def __get__(self, instance, owner) -> IntEnum:
+        if self._enum is None:
+            init()
+            gst_obj = Gst.ElementFactory.make(owner.__gstreamer_name__)
+            enum_cls_obj = gst_obj.find_property(self._prop).enum_class
+            self._enum = IntEnum(enum_cls_obj.__name__, {v.value_nick.upper(): k
+                                                         for k, v
+                                                         in enum_cls_obj.__enum_values__.items()})
+        return self._enum
 
 
 class _GstreamerEnumExposer(type):
     def __new__(cls, name, bases, namespace, **kwargs):
+        for enum_cls_name, prop in kwargs.items():
+            namespace[enum_cls_name] = _GstreamerEnum(prop)
+
         new_cls = super().__new__(cls, name, bases, namespace)
         if getattr(new_cls, "__gstreamer_name__", "") == "":
             raise AttributeError(f"Class '{name}' has invalid '__gobject_name__' attribute")
 
-        gst_obj = Gst.ElementFactory.make(new_cls.__gstreamer_name__)
-        for enum_cls_name, prop in kwargs.items():
-            enum_cls_obj = gst_obj.find_property(prop).enum_class
-            setattr(new_cls, enum_cls_name, IntEnum(enum_cls_obj.__name__, {v.value_nick.upper(): k
-                                                                            for k, v
-                                                                            in enum_cls_obj.__enum_values__.items()}))
-
         return new_cls
 
 
@@ -29,6 +65,7 @@ class ElementBase:
     __gstreamer_name__ = ""
 
     def __init__(self, *, name: Optional[str] = None) -> None:
+        init()
         self.__gobject__ = Gst.ElementFactory.make(self.__gstreamer_name__, name)
 
 
@@ -41,24 +78,236 @@ class MixinElementLinkable:
 class ElementPipeline(ElementBase):
     __gstreamer_name__ = "pipeline"
 
+    def __init__(self, *, name: Optional[str] = None) -> None:
+        super().__init__(name=name)
+        self._elements: Dict[str, ElementBase] = dict()
+        self._watcher: Optional["_BusWatcher"] = None
+
+    def __getitem__(self, name: str) -> ElementBase:
+        return self._elements[name]
+
     def __lshift__(self, other: ElementBase) -> "ElementPipeline":
         self.__gobject__.add(other.__gobject__)
+        self._elements[other.__gobject__.get_name()] = other
         return self
 
     def __ilshift__(self, other: ElementBase) -> "ElementPipeline":
         return self << other
 
     @property
-    def bus(self) -> Gst.Bus:
+    def bus(self) -> "Gst.Bus":
         return self.__gobject__.get_bus()
 
     @property
-    def state(self) -> Gst.State:
-        return self.__gobject__.get_state()
+    def state(self) -> "Gst.State":
+        _, current, _ = self.__gobject__.get_state(0)
+        return current
 
     @state.setter
-    def state(self, stt: Gst.State) -> None:
-        self.__gobject__.set_state(stt)
+    def state(self, stt: "Gst.State") -> None:
+        if self.__gobject__.set_state(stt) == Gst.StateChangeReturn.FAILURE:
+            raise self._state_change_error(stt)
+
+    async def set_state(self, stt: "Gst.State") -> None:
+        watcher = self._bus_watcher()
+        done = watcher.wait_for(lambda message: self._reached_state(message, stt))
+
+        result = self.__gobject__.set_state(stt)
+        if result == Gst.StateChangeReturn.FAILURE:
+            done.cancel()
+            raise self._state_change_error(stt)
+
+        if result != Gst.StateChangeReturn.ASYNC:
+            done.cancel()
+            return
+
+        if self.state != stt:
+            await done
+        else:
+            done.cancel()
+
+    async def wait_eos(self) -> None:
+        await self._bus_watcher().wait_eos()
+
+    def join(self) -> None:
+        # The watcher drains the bus, blocking on it as well would steal its
+        # messages.
+        if self._watcher is not None:
+            raise PipelineError("join() can't be used on a pipeline driven by asyncio, "
+                                "await wait_eos() instead")
+
+        message = self.bus.timed_pop_filtered(
+            Gst.CLOCK_TIME_NONE,
+            Gst.MessageType.ERROR | Gst.MessageType.EOS
+        )
+        if message is not None and message.type == Gst.MessageType.ERROR:
+            raise PipelineMessageError.from_message(message)
+
+    def check_errors(self) -> None:
+        error = self._pop_error()
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        self.__gobject__.set_state(Gst.State.NULL)
+
+    def _reached_state(self, message: "Gst.Message", stt: "Gst.State") -> bool:
+        if message.type == Gst.MessageType.ASYNC_DONE:
+            return True
+        if message.type == Gst.MessageType.STATE_CHANGED and message.src == self.__gobject__:
+            _, new, _ = message.parse_state_changed()
+            return new == stt
+        return False
+
+    def _pop_error(self) -> Optional["PipelineMessageError"]:
+        if self._watcher is not None:
+            return self._watcher.error
+
+        message = self.bus.pop_filtered(Gst.MessageType.ERROR)
+        if message is not None:
+            return PipelineMessageError.from_message(message)
+        return None
+
+    def _state_change_error(self, stt: "Gst.State") -> "PipelineError":
+        error = self._pop_error()
+        if error is not None:
+            return error
+        return PipelineStateChangeError(self.__gobject__.get_name(), stt)
+
+    def _bus_watcher(self) -> "_BusWatcher":
+        if self._watcher is None:
+            self._watcher = _BusWatcher(self.bus, asyncio.get_event_loop())
+        return self._watcher
+
+    def attach_profiler(self) -> "PipelineProfiler":
+        profiler = PipelineProfiler(self)
+        profiler.attach()
+        return profiler
+
+    def dump_dot(self, path: Union[str, pathlib.Path]) -> None:
+        pathlib.Path(path).write_text(
+            Gst.debug_bin_to_dot_data(self.__gobject__, Gst.DebugGraphDetails.ALL)
+        )
+
+    def seek(self, start: int, stop: Optional[int] = None) -> bool:
+        # A flushing seek starts a new stream, an earlier EOS no longer counts.
+        if self._watcher is not None:
+            self._watcher.reset_eos()
+
+        return self.__gobject__.seek(
+            1.0, Gst.Format.TIME,
+            Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE,
+            Gst.SeekType.SET, start,
+            Gst.SeekType.SET if stop is not None else Gst.SeekType.NONE,
+            stop if stop is not None else Gst.CLOCK_TIME_NONE
+        )
+
+    def seek_segment(self, start: int, stop: Optional[int] = None) -> bool:
+        self.state = Gst.State.PAUSED
+        result, _, _ = self.__gobject__.get_state(Gst.CLOCK_TIME_NONE)
+        if result == Gst.StateChangeReturn.FAILURE:
+            raise self._state_change_error(Gst.State.PAUSED)
+
+        return self.seek(start, stop)
+
+
+class PipelineError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class PipelineStateChangeError(PipelineError):
+    def __init__(self, element: str, state: "Gst.State") -> None:
+        super().__init__(f"Element '{element}' failed to change state to "
+                         f"{Gst.Element.state_get_name(state)}")
+        self.element = element
+        self.state = state
+
+
+class PipelineMessageError(PipelineError):
+    def __init__(self, element: str, message: str, debug: Optional[str] = None) -> None:
+        super().__init__(f"{element}: {message}")
+        self.element = element
+        self.debug = debug
+
+    @classmethod
+    def from_message(cls, message: "Gst.Message") -> "PipelineMessageError":
+        error, debug = message.parse_error()
+        return cls(message.src.get_name() if message.src is not None else "pipeline",
+                   error.message, debug)
+
+
+class _BusWatcher:
+    def __init__(self, bus: "Gst.Bus", loop: asyncio.AbstractEventLoop) -> None:
+        self._bus = bus
+        self._loop = loop
+        self._fd = bus.get_pollfd().fd
+
+        self._waiters: List[Tuple[Any, asyncio.Future]] = list()
+        # Errors and EOS are latched: they can arrive in the same batch as
+        # the state change that precedes waiting for them, before anyone
+        # waits.
+        self._error: Optional[PipelineMessageError] = None
+        self._eos: Optional["Gst.Message"] = None
+
+        loop.add_reader(self._fd, self._dispatch)
+
+    @property
+    def error(self) -> Optional[PipelineMessageError]:
+        return self._error
+
+    def wait_for(self, predicate) -> asyncio.Future:
+        future = self._loop.create_future()
+        if self._error is not None:
+            future.set_exception(self._error)
+        else:
+            self._waiters.append((predicate, future))
+        return future
+
+    def wait_eos(self) -> asyncio.Future:
+        if self._eos is not None and self._error is None:
+            future = self._loop.create_future()
+            future.set_result(self._eos)
+            return future
+        return self.wait_for(lambda message: message.type == Gst.MessageType.EOS)
+
+    def reset_eos(self) -> None:
+        self._eos = None
+
+    def _dispatch(self) -> None:
+        while True:
+            message = self._bus.pop()
+            if message is None:
+                break
+
+            if message.type == Gst.MessageType.ERROR:
+                self._error = PipelineMessageError.from_message(message)
+            elif message.type == Gst.MessageType.EOS:
+                self._eos = message
+
+            pending = list()
+            for predicate, future in self._waiters:
+                if future.done():
+                    continue
+                if self._error is not None:
+                    future.set_exception(self._error)
+                elif predicate(message):
+                    future.set_result(message)
+                else:
+                    pending.append((predicate, future))
+            self._waiters = pending
+
+    def close(self) -> None:
+        self._loop.remove_reader(self._fd)
+        for _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
 
 
 class ElementFileSource(ElementBase, MixinElementLinkable):
@@ -101,6 +350,230 @@ class ElementFileSink(ElementBase, MixinElementLinkable):
         self.__gobject__.set_property("location", str(path))
 
 
+class ElementFakeSink(ElementBase, MixinElementLinkable):
+    __gstreamer_name__ = "fakesink"
+
+
+class SampleFormat(str, Enum):
+    U8 = "U8"
+    S16LE = "S16LE"
+    S32LE = "S32LE"
+    F32LE = "F32LE"
+    F64LE = "F64LE"
+
+    @property
+    def dtype(self) -> str:
+        return _SAMPLE_FORMAT_DTYPES[self]
+
+
+_SAMPLE_FORMAT_DTYPES = {
+    SampleFormat.U8: "u1",
+    SampleFormat.S16LE: "<i2",
+    SampleFormat.S32LE: "<i4",
+    SampleFormat.F32LE: "<f4",
+    SampleFormat.F64LE: "<f8",
+}
+
+
+class _MixinPCMCaps:
+    def _pcm_caps(self, sample_format: SampleFormat, channels: Optional[int],
+                  rate: Optional[int]) -> str:
+        caps = f"audio/x-raw,format={SampleFormat(sample_format).value},layout=interleaved"
+        if channels is not None:
+            caps += f",channels={channels}"
+        if rate is not None:
+            caps += f",rate={rate}"
+        return caps
+
+    @property
+    def caps(self) -> Optional["Gst.Caps"]:
+        return self.__gobject__.get_property("caps")
+
+    @caps.setter
+    def caps(self, caps: Union[str, "Gst.Caps"]) -> None:
+        if isinstance(caps, str):
+            caps = Gst.Caps.from_string(caps)
+        self.__gobject__.set_property("caps", caps)
+
+
+class _BufferMapping:
+    # NumPy views keep the exported memoryview alive, so buffers can be unmapped
+    # only after the last view is gone. Finalizers queue mappings here and they
+    # are released on the next call into the owning element.
+    def __init__(self) -> None:
+        self._released: List[Tuple["Gst.Buffer", "Gst.MapInfo"]] = list()
+        self._lock = threading.Lock()
+
+    def map(self, buffer: "Gst.Buffer", flags: "Gst.MapFlags", dtype: str, channels: int):
+        import numpy
+
+        ok, info = buffer.map(flags)
+        if not ok:
+            raise AppElementError("Failed to map buffer memory")
+
+        array = numpy.frombuffer(info.data, dtype=dtype)
+        finalizer = weakref.finalize(array, self._queue_release, buffer, info)
+        return array.reshape(-1, channels), finalizer
+
+    def _queue_release(self, buffer: "Gst.Buffer", info: "Gst.MapInfo") -> None:
+        with self._lock:
+            self._released.append((buffer, info))
+
+    def release(self) -> None:
+        with self._lock:
+            released, self._released = self._released, list()
+
+        for buffer, info in released:
+            buffer.unmap(info)
+
+
+class AppElementError(Exception):
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class ElementAppSink(ElementBase, MixinElementLinkable, _MixinPCMCaps):
+    __gstreamer_name__ = "appsink"
+
+    def __init__(self, caps: Optional[str] = None, *,
+                 sample_format: Optional[SampleFormat] = None,
+                 channels: Optional[int] = 2,
+                 rate: Optional[int] = None,
+                 name: Optional[str] = None) -> None:
+        super().__init__(name=name)
+        self.__gobject__.set_property("sync", False)
+
+        self.sample_format = sample_format
+        self.channels = channels
+        self.rate = rate
+
+        self._mapping = _BufferMapping()
+
+        if sample_format is not None:
+            self.caps = self._pcm_caps(sample_format, channels, rate)
+        elif caps is not None:
+            self.caps = caps
+
+    def pull_sample(self) -> Optional["Gst.Sample"]:
+        return self.__gobject__.emit("pull-sample")
+
+    def arrays(self):
+        if self.sample_format is None:
+            raise AppElementError("Sample format is required to map buffers as arrays")
+
+        dtype = SampleFormat(self.sample_format).dtype
+        while True:
+            self._mapping.release()
+
+            sample = self.pull_sample()
+            if sample is None:
+                break
+
+            if self.rate is None or self.channels is None:
+                structure = sample.get_caps().get_structure(0)
+                self.rate = structure.get_value("rate")
+                self.channels = structure.get_value("channels")
+
+            array, _ = self._mapping.map(sample.get_buffer(), Gst.MapFlags.READ,
+                                         dtype, self.channels)
+            del sample
+
+            yield array
+            del array
+
+        self._mapping.release()
+
+    def blocks(self, frames: int):
+        # Blocks are views into mapped buffers or into a reused staging array,
+        # consumers have to copy them to keep data past the next iteration.
+        import numpy
+
+        staging = None
+        filled = 0
+        for array in self.arrays():
+            if staging is None:
+                staging = numpy.empty((frames, self.channels), dtype=array.dtype)
+
+            offset = 0
+            if filled > 0:
+                offset = min(frames - filled, len(array))
+                staging[filled:filled + offset] = array[:offset]
+                filled += offset
+                if filled < frames:
+                    continue
+
+                yield staging
+                filled = 0
+
+            while len(array) - offset >= frames:
+                yield array[offset:offset + frames]
+                offset += frames
+
+            filled = len(array) - offset
+            staging[:filled] = array[offset:]
+            del array
+
+        if filled > 0:
+            yield staging[:filled]
+
+        self._mapping.release()
+
+
+class ElementAppSrc(ElementBase, MixinElementLinkable, _MixinPCMCaps):
+    __gstreamer_name__ = "appsrc"
+
+    def __init__(self, sample_format: SampleFormat = SampleFormat.S16LE, *,
+                 channels: int = 2,
+                 rate: int = 44100,
+                 name: Optional[str] = None) -> None:
+        super().__init__(name=name)
+
+        self.sample_format = SampleFormat(sample_format)
+        self.channels = channels
+        self.rate = rate
+
+        self._frames = 0
+        self._mapping = _BufferMapping()
+
+        self.caps = self._pcm_caps(self.sample_format, channels, rate)
+        self.__gobject__.set_property("format", Gst.Format.TIME)
+
+    @property
+    def frame_size(self) -> int:
+        import numpy
+        return numpy.dtype(self.sample_format.dtype).itemsize * self.channels
+
+    def push_with(self, frames: int, fill) -> "Gst.FlowReturn":
+        self._mapping.release()
+
+        buffer = Gst.Buffer.new_allocate(None, frames * self.frame_size, None)
+        view, finalizer = self._mapping.map(buffer, Gst.MapFlags.WRITE,
+                                            self.sample_format.dtype, self.channels)
+        fill(view)
+        del view
+        if finalizer.alive:
+            raise AppElementError("Buffer view must not outlive the fill callback")
+        self._mapping.release()
+
+        buffer.pts = self._frames * Gst.SECOND // self.rate
+        buffer.duration = (self._frames + frames) * Gst.SECOND // self.rate - buffer.pts
+        self._frames += frames
+
+        return self.__gobject__.emit("push-buffer", buffer)
+
+    def push(self, array) -> "Gst.FlowReturn":
+        def fill(view) -> None:
+            view[...] = array.reshape(view.shape)
+
+        return self.push_with(len(array), fill)
+
+    def end_of_stream(self) -> "Gst.FlowReturn":
+        return self.__gobject__.emit("end-of-stream")
+
+
 class ElementFLACParser(ElementBase, MixinElementLinkable):
     __gstreamer_name__ = "flacparse"
 
@@ -113,6 +586,14 @@ class ElementFLACEncoder(ElementBase, MixinElementLinkable):
     __gstreamer_name__ = "flacenc"
 
 
+class ElementMP3Parser(ElementBase, MixinElementLinkable):
+    __gstreamer_name__ = "mpegaudioparse"
+
+
+class ElementMP3Decoder(ElementBase, MixinElementLinkable):
+    __gstreamer_name__ = "mpg123audiodec"
+
+
 class ElementAudioParse(ElementBase, MixinElementLinkable):
     __gstreamer_name__ = "rawaudioparse"
 
@@ -200,3 +681,160 @@ class ElementMP3Encoder(ElementBase, MixinElementLinkable, metaclass=_GstreamerE
 
     def _set_target(self, tgt: "ElementMP3Encoder.Target") -> None:
         self.__gobject__.set_property("target", tgt)
+
+
+class PipelineTemplateError(PipelineError):
+    pass
+
+
+class PipelineTemplate:
+    def __init__(self, steps: Tuple[Tuple[str, Type[ElementBase], Tuple[Tuple[str, Any], ...]], ...]) -> None:
+        self._steps = steps
+
+    @classmethod
+    def compile(cls, *steps: Union[Tuple[str, Type[ElementBase]],
+                                   Tuple[str, Type[ElementBase], Mapping[str, Any]]]) -> "PipelineTemplate":
+        normalized = list()
+        for step in steps:
+            name, klass = step[0], step[1]
+            kwargs = step[2] if len(step) > 2 else dict()
+            normalized.append((name, klass, tuple(sorted(kwargs.items()))))
+
+        return _compile_template(tuple(normalized))
+
+    def validate(self) -> None:
+        init()
+
+        names = set()
+        factories = list()
+        for name, klass, _ in self._steps:
+            if name in names:
+                raise PipelineTemplateError(f"Duplicate element name '{name}' in pipeline template")
+            names.add(name)
+
+            factory = Gst.ElementFactory.find(klass.__gstreamer_name__)
+            if factory is None:
+                raise PipelineTemplateError(f"GStreamer element '{klass.__gstreamer_name__}' "
+                                            f"for '{name}' is not available")
+            factories.append((name, factory))
+
+        for (src_name, src_factory), (sink_name, sink_factory) in zip(factories, factories[1:]):
+            src_caps = [t.get_caps() for t in src_factory.get_static_pad_templates()
+                        if t.direction == Gst.PadDirection.SRC
+                        and t.presence == Gst.PadPresence.ALWAYS]
+            sink_caps = [t.get_caps() for t in sink_factory.get_static_pad_templates()
+                         if t.direction == Gst.PadDirection.SINK
+                         and t.presence == Gst.PadPresence.ALWAYS]
+
+            if not any(src.can_intersect(sink) for src in src_caps for sink in sink_caps):
+                raise PipelineTemplateError(f"Can't link '{src_name}' to '{sink_name}': "
+                                            f"no compatible static pads")
+
+    def instantiate(self, **overrides: Mapping[str, Any]) -> ElementPipeline:
+        pipeline = ElementPipeline()
+
+        previous = None
+        for name, klass, kwargs in self._steps:
+            element_kwargs = dict(kwargs)
+            element_kwargs.update(overrides.get(name, dict()))
+            element = klass(name=name, **element_kwargs)
+
+            pipeline <<= element
+
+            if previous is not None and not previous.__gobject__.link(element.__gobject__):
+                raise PipelineTemplateError(f"Failed to link '{previous.__gobject__.get_name()}' "
+                                            f"to '{name}'")
+            previous = element
+
+        return pipeline
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_template(steps) -> PipelineTemplate:
+    template = PipelineTemplate(steps)
+    template.validate()
+    return template
+
+
+class ElementProfile:
+    _QUEUE_FACTORIES = ("queue", "queue2", "multiqueue")
+
+    def __init__(self, element: ElementBase) -> None:
+        self.name = element.__gobject__.get_name()
+        self.factory = element.__gstreamer_name__
+
+        self.buffers_in = 0
+        self.buffers_out = 0
+        self.bytes_out = 0
+        self.processing_time = 0.0
+        self.processed = 0
+        self.queue_level_max: Optional[int] = None
+
+        self._element = element
+        self._entered: Dict[int, float] = dict()
+
+    def on_buffer_in(self, pad: "Gst.Pad", info: "Gst.PadProbeInfo") -> "Gst.PadProbeReturn":
+        self.buffers_in += 1
+        self._entered[threading.get_ident()] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def on_buffer_out(self, pad: "Gst.Pad", info: "Gst.PadProbeInfo") -> "Gst.PadProbeReturn":
+        entered = self._entered.pop(threading.get_ident(), None)
+        if entered is not None:
+            self.processing_time += time.perf_counter() - entered
+            self.processed += 1
+
+        self.buffers_out += 1
+        buffer = info.get_buffer()
+        if buffer is not None:
+            self.bytes_out += buffer.get_size()
+
+        if self.factory in self._QUEUE_FACTORIES:
+            level = self._element.__gobject__.get_property("current-level-buffers")
+            if self.queue_level_max is None or level > self.queue_level_max:
+                self.queue_level_max = level
+
+        return Gst.PadProbeReturn.OK
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "factory": self.factory,
+            "buffers_in": self.buffers_in,
+            "buffers_out": self.buffers_out,
+            "bytes_out": self.bytes_out,
+            "processing_time": self.processing_time,
+            "mean_latency": self.processing_time / self.processed if self.processed else None,
+            "queue_level_max": self.queue_level_max,
+        }
+
+
+class PipelineProfiler:
+    def __init__(self, pipeline: ElementPipeline) -> None:
+        self._pipeline = pipeline
+        self._profiles: List[ElementProfile] = list()
+
+        self._started: Optional[float] = None
+
+    def attach(self) -> None:
+        for element in self._pipeline._elements.values():
+            profile = ElementProfile(element)
+            self._profiles.append(profile)
+
+            for pad in element.__gobject__.iterate_pads():
+                if pad.get_direction() == Gst.PadDirection.SINK:
+                    pad.add_probe(Gst.PadProbeType.BUFFER, profile.on_buffer_in)
+                else:
+                    pad.add_probe(Gst.PadProbeType.BUFFER, profile.on_buffer_out)
+
+        self._started = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        wall_time = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "wall_time": wall_time,
+            "elements": [profile.to_dict() for profile in self._profiles],
+        }
+
+    def dump_dot(self, path: Union[str, pathlib.Path]) -> None:
+        self._pipeline.dump_dot(path)
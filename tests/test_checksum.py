@@ -0,0 +1,110 @@
+import zlib
+
+import numpy
+import pytest
+
+from krautcat.audio.checksum import AccurateRipChecksum, CRC32Checksum, TrackChecksum
+
+
+SKIP = 5 * 588
+
+
+def _accuraterip(samples, first, last):
+    """The reference algorithm, one stereo sample (32 bit word) at a time."""
+    check_from = SKIP if first else 0
+    check_to = len(samples) - SKIP if last else len(samples)
+
+    v1 = v2 = 0
+    for multiplier, sample in enumerate(samples.tolist(), start=1):
+        if check_from <= multiplier <= check_to:
+            product = multiplier * sample
+            v1 = (v1 + product) & 0xFFFFFFFF
+            v2 = (v2 + (product & 0xFFFFFFFF) + (product >> 32)) & 0xFFFFFFFF
+    return v1, v2
+
+
+def _samples(count, seed=0):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(0, 2 ** 32, count, dtype=numpy.uint64).astype(numpy.uint32)
+
+
+def _chunks(samples, size):
+    return [samples[i:i + size] for i in range(0, len(samples), size)]
+
+
+@pytest.mark.parametrize("first, last", [(False, False), (True, False), (False, True),
+                                         (True, True)])
+@pytest.mark.parametrize("chunk", [1000, 588, 4096, 30000])
+def test_accuraterip_matches_reference(first, last, chunk):
+    samples = _samples(3 * SKIP + 123)
+
+    checksum = AccurateRipChecksum(first=first, last=last)
+    for block in _chunks(samples, chunk):
+        checksum.update(block)
+
+    assert (checksum.v1, checksum.v2) == _accuraterip(samples, first, last)
+
+
+@pytest.mark.parametrize("first, last", [(True, False), (False, True)])
+def test_accuraterip_skip_windows(first, last):
+    # Only the samples at the window edges are set, so the checksum shows
+    # exactly which multipliers were counted.
+    samples = numpy.zeros(3 * SKIP, dtype=numpy.uint32)
+    edges = [0, SKIP - 2, SKIP - 1, SKIP, len(samples) - SKIP - 1, len(samples) - SKIP,
+             len(samples) - 1]
+    samples[edges] = 1
+
+    checksum = AccurateRipChecksum(first=first, last=last)
+    checksum.update(samples)
+
+    counted = [i for i in edges if (not first or i + 1 >= SKIP)
+               and (not last or i + 1 <= len(samples) - SKIP)]
+    assert checksum.v1 == sum(i + 1 for i in counted)
+    assert (checksum.v1, checksum.v2) == _accuraterip(samples, first, last)
+
+
+def test_accuraterip_v2_carries_high_words():
+    samples = numpy.full(SKIP, 0xFFFFFFFF, dtype=numpy.uint32)
+
+    checksum = AccurateRipChecksum()
+    checksum.update(samples)
+
+    assert checksum.v1 != checksum.v2
+    assert (checksum.v1, checksum.v2) == _accuraterip(samples, False, False)
+
+
+def test_accuraterip_short_last_track():
+    samples = _samples(SKIP // 2)
+
+    checksum = AccurateRipChecksum(first=True, last=True)
+    for block in _chunks(samples, 100):
+        checksum.update(block)
+
+    assert (checksum.v1, checksum.v2) == (0, 0) == _accuraterip(samples, True, True)
+
+
+def test_crc32():
+    samples = _samples(10000)
+    checksum = CRC32Checksum()
+    for block in _chunks(samples, 777):
+        checksum.update(block)
+
+    assert checksum.value == zlib.crc32(samples.astype("<u4").tobytes())
+    # CRC-32 check value.
+    crc = CRC32Checksum()
+    crc.update(numpy.frombuffer(b"1234", dtype=numpy.uint32))
+    crc.update(numpy.frombuffer(b"5678", dtype=numpy.uint32))
+    assert crc.value == zlib.crc32(b"12345678") == 0x9AE0DAAF
+
+
+def test_track_checksum():
+    samples = _samples(2 * SKIP)
+    a, b = TrackChecksum(first=True), TrackChecksum(first=True)
+    a.update(samples)
+    for block in _chunks(samples, 1000):
+        b.update(block)
+
+    assert a == b
+    assert a.samples == len(samples)
+    assert (a.accuraterip_v1, a.accuraterip_v2) == _accuraterip(samples, True, False)
+    assert str(a).startswith(f"CRC32 {a.crc32:08X}, AccurateRip v1 {a.accuraterip_v1:08X}")
@@ -0,0 +1,84 @@
+import struct
+
+import mutagen.flac
+import pytest
+
+from krautcat.audio.file.audio.flac import AudioFileFLAC
+from krautcat.audio.file.cuesheet import Parser
+
+
+def _image(path, track_offsets, **tags):
+    # STREAMINFO of a 44.1 kHz, 16 bit stereo stream, followed by a single
+    # junk frame. Enough for mutagen, nothing here decodes audio.
+    info = struct.pack(">HH", 4096, 4096) + b"\0" * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, "big") + b"\0" * 16
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, len(info)]) + info + b"\xff\xf8" + b"\0" * 64)
+
+    image = mutagen.flac.FLAC(path)
+
+    cuesheet = mutagen.flac.CueSheet(None)
+    cuesheet.media_catalog_number = b""
+    cuesheet.lead_in_samples = 88200
+    cuesheet.compact_disc = True
+    for number, offset in enumerate(track_offsets, start=1):
+        track = mutagen.flac.CueSheetTrack(number, offset)
+        track.indexes.append(mutagen.flac.CueSheetTrackIndex(1, 0))
+        cuesheet.tracks.append(track)
+    cuesheet.tracks.append(mutagen.flac.CueSheetTrack(170, track_offsets[-1] + 44100 * 60))
+    image.metadata_blocks.append(cuesheet)
+    image.cuesheet = cuesheet
+
+    image.add_tags()
+    for name, value in tags.items():
+        image[name] = value
+    image.save()
+
+    return AudioFileFLAC(path)
+
+
+def test_embedded_cuesheet_titles_from_track_tags(tmp_path):
+    image = _image(tmp_path / "image.flac", [0, 44100 * 180, 44100 * 400],
+                   ARTIST="Artist", ALBUM="Album",
+                   CUE_TRACK01_TITLE="First", CUE_TRACK02_TITLE="Second",
+                   CUE_TRACK02_PERFORMER="Guest")
+
+    root = Parser(image).parse()
+
+    assert [t.track_number for t in root.tracks] == [1, 2, 3]
+    assert [t.track_name for t in root.tracks] == ["First", "Second", "Track 03"]
+    assert [t.track_artist for t in root.tracks] == ["Artist", "Guest", "Artist"]
+    assert root.album_name == "Album"
+    assert root.tracks[1].begin.samples(44100) == 44100 * 180
+
+
+def test_embedded_cuesheet_without_tags(tmp_path):
+    image = _image(tmp_path / "image.flac", [0, 44100 * 60])
+
+    root = Parser(image).parse()
+
+    assert [t.track_name for t in root.tracks] == ["Track 01", "Track 02"]
+    assert all(str(t).startswith(f"{t.track_number:02}. Track ") for t in root.tracks)
+
+
+def test_cuesheet_comment_takes_precedence(tmp_path):
+    sheet = "\n".join([
+        'PERFORMER "Artist"',
+        'TITLE "Album"',
+        'FILE "image.flac" WAVE',
+        '  TRACK 01 AUDIO',
+        '    TITLE "Named"',
+        '    INDEX 01 00:00:00',
+    ])
+    image = _image(tmp_path / "image.flac", [0], CUESHEET=sheet)
+
+    root = Parser(image).parse()
+
+    assert [t.track_name for t in root.tracks] == ["Named"]
+    assert root.tracks[0].begin.file.path == image.path
+
+
+@pytest.mark.parametrize("name", ["cue_track01_title", "CUE_TRACK1_TITLE"])
+def test_track_tag_names(tmp_path, name):
+    image = _image(tmp_path / "image.flac", [0], **{name: "Song"})
+
+    assert image.load_cuesheet_track_tags() == {1: {"title": "Song"}}
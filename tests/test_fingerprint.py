@@ -0,0 +1,64 @@
+import tracemalloc
+
+import numpy
+import pytest
+
+from krautcat.audio import fingerprint
+
+
+def _tone(frequencies, seconds, noise=0.0, seed=0):
+    t = numpy.arange(int(fingerprint.SAMPLE_RATE * seconds)) / fingerprint.SAMPLE_RATE
+    signal = sum(numpy.sin(2 * numpy.pi * f * t) for f in frequencies)
+    signal = signal + noise * numpy.random.default_rng(seed).standard_normal(len(t))
+    return signal.astype(numpy.float32)
+
+
+def test_chroma_of_a_tone():
+    features = fingerprint.chroma(_tone([440.0], 5))
+
+    # Notes are counted in semitones from A440.
+    assert (features.argmax(axis=1) == 0).all()
+    numpy.testing.assert_allclose(numpy.linalg.norm(features, axis=1), 1.0)
+
+
+def test_chroma_short_and_silent():
+    assert fingerprint.chroma(numpy.zeros(fingerprint.FRAME_SIZE - 1)).shape == (0, 12)
+    assert not fingerprint.chroma(numpy.zeros(fingerprint.FRAME_SIZE * 4)).any()
+    assert not fingerprint.fingerprint(numpy.zeros(fingerprint.FRAME_SIZE * 4)).any()
+
+
+@pytest.mark.parametrize("block_frames", [1, 7, 256])
+def test_chroma_blocks_match_whole_track(monkeypatch, block_frames):
+    samples = _tone([440.0, 659.3], 30, noise=0.2)
+    frames = len(range(0, len(samples) - fingerprint.FRAME_SIZE + 1, fingerprint.FRAME_HOP))
+
+    monkeypatch.setattr(fingerprint, "CHROMA_BLOCK_FRAMES", frames + 1)
+    whole = fingerprint.chroma(samples)
+    whole_fingerprint = fingerprint.fingerprint(samples)
+
+    monkeypatch.setattr(fingerprint, "CHROMA_BLOCK_FRAMES", block_frames)
+    assert len(whole) == frames
+    numpy.testing.assert_allclose(fingerprint.chroma(samples), whole, atol=1e-12)
+    numpy.testing.assert_array_equal(fingerprint.fingerprint(samples), whole_fingerprint)
+
+
+def test_chroma_memory_is_bounded():
+    samples = _tone([440.0], 600, noise=0.1)
+    fingerprint.chroma(samples[:fingerprint.FRAME_SIZE])
+
+    tracemalloc.start()
+    try:
+        fingerprint.chroma(samples)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # A whole-track frame matrix of ten minutes would take ~300 MB.
+    assert peak < 64 * 2 ** 20
+
+
+def test_fingerprint_ignores_gain():
+    samples = _tone([440.0, 554.4, 659.3], 20, noise=0.2)
+
+    numpy.testing.assert_array_equal(fingerprint.fingerprint(samples * 0.3),
+                                     fingerprint.fingerprint(samples))
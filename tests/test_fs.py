@@ -0,0 +1,226 @@
+import os
+import pathlib
+import random
+
+import pytest
+
+from krautcat.audio.fs import (FilesystemExFAT, FilesystemGeneric, FilesystemNTFS,
+                               FilesystemWindows, MountEntry, MountTable, get_fs_class)
+
+
+def _utf16_units(name):
+    return len(name.encode("utf-16-le", "surrogatepass")) // 2
+
+
+@pytest.mark.parametrize("name, limit, expected", [
+    ("abcdef", 4, "abcd"),
+    ("aé", 2, "a"),
+    ("aé", 3, "aé"),
+    ("a€b", 3, "a"),
+    ("a\U0001f3b5b", 4, "a"),
+    ("a\U0001f3b5b", 5, "a\U0001f3b5"),
+])
+def test_truncate_utf8_on_code_point(name, limit, expected):
+    truncated = FilesystemGeneric.truncate(name, limit)
+
+    assert truncated == expected
+    assert len(truncated.encode("utf-8")) <= limit
+
+
+@pytest.mark.parametrize("name, limit, expected", [
+    ("abcdef", 4, "abcd"),
+    ("aé€", 2, "aé"),
+    ("a\U0001f3b5b", 2, "a"),
+    ("a\U0001f3b5b", 3, "a\U0001f3b5"),
+])
+def test_truncate_utf16_on_code_point(name, limit, expected):
+    truncated = FilesystemWindows.truncate(name, limit)
+
+    assert truncated == expected
+    assert _utf16_units(truncated) <= limit
+
+
+def test_truncate_undecodable_bytes():
+    name = b"ab\xff\xfecd".decode("utf-8", "surrogateescape")
+
+    assert FilesystemGeneric.truncate(name, 4) == name[:4]
+
+
+@pytest.mark.parametrize("fs", [FilesystemGeneric, FilesystemWindows])
+def test_sanitize_keeps_suffix(fs):
+    name = fs.sanitize_filename("ü" * 300, suffix=".flac")
+
+    assert name.endswith(".flac")
+    assert name[:-len(".flac")] == "ü" * len(name[:-len(".flac")])
+    assert fs.name_length(name) <= fs.NAME_MAX
+    assert fs.name_length(name) > fs.NAME_MAX - 2
+
+
+def test_sanitize_escapes_suffix():
+    assert FilesystemWindows.sanitize_filename("a", suffix=".fl:c") == "a.fl_c"
+
+
+def test_sanitize_short_names_untouched():
+    assert FilesystemGeneric.sanitize_filename("01. Song", suffix=".flac") == "01. Song.flac"
+    assert FilesystemNTFS.sanitize_filename("01. Song", suffix=".flac") == "01. Song.flac"
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Album.", "Album"),
+    ("Album . .", "Album"),
+    ("Album  ", "Album"),
+    ("...", "_"),
+    ("Vol. 1", "Vol. 1"),
+])
+def test_sanitize_strips_trailing_dots_and_spaces(name, expected):
+    assert FilesystemWindows.sanitize_filename(name) == expected
+
+
+def test_sanitize_keeps_trailing_dots_on_linux():
+    assert FilesystemGeneric.sanitize_filename("Album...") == "Album..."
+
+
+def test_sanitize_strips_after_truncation():
+    name = FilesystemWindows.sanitize_filename("a" * 9 + " b", 10)
+
+    assert name == "a" * 9
+
+
+@pytest.mark.parametrize("name, suffix, expected", [
+    ("CON", ".flac", "_CON.flac"),
+    ("con", ".flac", "_con.flac"),
+    ("COM1", ".cue", "_COM1.cue"),
+    ("LPT9", "", "_LPT9"),
+    ("NUL.tar", ".gz", "_NUL.tar.gz"),
+    ("AUX.", "", "_AUX"),
+    ("CONSOLE", ".flac", "CONSOLE.flac"),
+    ("COM0", ".flac", "COM0.flac"),
+])
+def test_sanitize_reserved_names(name, suffix, expected):
+    assert FilesystemWindows.sanitize_filename(name, suffix=suffix) == expected
+
+
+def test_reserved_names_allowed_on_linux():
+    assert FilesystemGeneric.sanitize_filename("CON", suffix=".flac") == "CON.flac"
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("AC/DC", "AC_DC"),
+    ("What?", "What!"),
+    ('a\\b:c*d"e<f>g|h', "a_b_c_d'e(f)g_h"),
+    ("tab\there", "tabhere"),
+])
+def test_escape_windows(name, expected):
+    assert FilesystemWindows.escape_filename(name) == expected
+
+
+def test_escape_generic():
+    assert FilesystemGeneric.escape_filename("AC/DC: Live?\0") == "AC_DC_ Live!"
+    assert FilesystemGeneric.escape_filename("a\\b*c") == "a\\b*c"
+
+
+def _names(count, seed=0):
+    alphabet = ("abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-"
+                "éüßøłжщ€♪漢字\U0001f3b5/:?*<>|\"\\")
+    rng = random.Random(seed)
+    return [("".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 400))),
+             rng.choice(["", ".flac", ".cue"]))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("fs", [FilesystemGeneric, FilesystemWindows])
+def test_sanitize_large_name_set(fs):
+    forbidden = {chr(c) for c in fs.TRANSLATION}
+
+    for name, suffix in _names(5000):
+        sanitized = fs.sanitize_filename(name, suffix=suffix)
+
+        assert 0 < fs.name_length(sanitized) <= fs.NAME_MAX
+        assert sanitized.endswith(suffix)
+        assert not forbidden & set(sanitized)
+        assert "�" not in sanitized
+        if fs.TRAILING_CHARACTERS:
+            assert not sanitized.endswith(tuple(fs.TRAILING_CHARACTERS))
+
+
+def _mountinfo_line(mount_id, device, mountpoint, fstype, optional=""):
+    major, minor = os.major(device), os.minor(device)
+    fields = [str(mount_id), "1", f"{major}:{minor}", "/", mountpoint, "rw,relatime"]
+    if optional:
+        fields.append(optional)
+    return " ".join(fields + ["-", fstype, "/dev/sdx1", "rw"])
+
+
+@pytest.fixture
+def mountinfo(tmp_path, monkeypatch):
+    path = tmp_path / "mountinfo"
+    monkeypatch.setattr(MountTable, "MOUNTINFO", str(path))
+
+    def write(*lines):
+        path.write_bytes("\n".join(lines).encode("utf-8") + b"\n")
+        return MountTable()
+
+    return write
+
+
+def test_read_mountinfo(mountinfo):
+    table = mountinfo(
+        _mountinfo_line(21, os.makedev(0, 21), "/", "ext4", "shared:1"),
+        _mountinfo_line(45, os.makedev(8, 17), r"/media/My\040Music", "exfat",
+                        "shared:24 master:3 propagate_from:2"),
+        _mountinfo_line(46, os.makedev(259, 3), r"/mnt/tab\011and\134backslash", "ntfs3"),
+        _mountinfo_line(47, os.makedev(0, 48), "/mnt/Kraftwerk-Mensch–Maschine", "vfat"),
+    )
+
+    assert table._read_mountinfo() == [
+        MountEntry(os.makedev(0, 21), pathlib.Path("/"), "ext4"),
+        MountEntry(os.makedev(8, 17), pathlib.Path("/media/My Music"), "exfat"),
+        MountEntry(os.makedev(259, 3), pathlib.Path("/mnt/tab\tand\\backslash"), "ntfs3"),
+        MountEntry(os.makedev(0, 48), pathlib.Path("/mnt/Kraftwerk-Mensch–Maschine"), "vfat"),
+    ]
+
+
+def test_lookup_by_device(tmp_path, mountinfo):
+    device = os.stat(tmp_path).st_dev
+    table = mountinfo(
+        _mountinfo_line(21, os.makedev(0, 1), "/", "ext4"),
+        _mountinfo_line(22, device, "/elsewhere", "exfat", "shared:2"),
+    )
+
+    assert table.lookup(tmp_path) == MountEntry(device, pathlib.Path("/elsewhere"), "exfat")
+
+
+def test_lookup_falls_back_to_closest_mountpoint(tmp_path, mountinfo):
+    # None of the devices match, as for a btrfs subvolume.
+    base = tmp_path.resolve()
+    music = base / "My Music"
+    (music / "album").mkdir(parents=True)
+    escaped = str(music).replace(" ", "\\040")
+
+    table = mountinfo(
+        _mountinfo_line(21, os.makedev(0, 1), "/", "ext4"),
+        _mountinfo_line(22, os.makedev(0, 2), str(base), "ext4"),
+        _mountinfo_line(23, os.makedev(0, 3), escaped, "ntfs3", "shared:5"),
+        _mountinfo_line(24, os.makedev(0, 4), str(music) + "-other", "vfat"),
+    )
+
+    assert table.lookup(music / "album") == MountEntry(os.makedev(0, 3), music, "ntfs3")
+    # Cached by the device of the path from now on.
+    assert table.lookup(base).fstype == "ntfs3"
+
+    assert table._find_by_path(music) == MountEntry(os.makedev(0, 3), music, "ntfs3")
+    assert table._find_by_path(base / "other").mountpoint == base
+    assert table._find_by_path(pathlib.Path("/")).mountpoint == pathlib.Path("/")
+
+
+def test_get_fs_class(tmp_path, mountinfo, monkeypatch):
+    table = mountinfo(_mountinfo_line(21, os.stat(tmp_path).st_dev, "/", "exfat"))
+    monkeypatch.setattr("krautcat.audio.fs._mount_table", table)
+
+    assert get_fs_class(tmp_path) is FilesystemExFAT
+
+
+def test_lookup_without_mounts(tmp_path, mountinfo):
+    table = mountinfo(_mountinfo_line(21, os.makedev(0, 1), "/nonexistent", "ext4"))
+
+    assert table.lookup(tmp_path) is None
@@ -0,0 +1,63 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+
+LIB = pathlib.Path(__file__).resolve().parent.parent / "lib"
+
+# Entry modules of the console scripts in pyproject.toml.
+ENTRY_POINTS = {
+    "krautcat-dirnamer": "krautcat.audio.library.fs.dirnamer",
+    "krautcat-tagger": "krautcat.audio.library.tagger",
+    "krautcat-cuesplitter": "krautcat.audio.cuesplitter",
+    "krautcat-converter": "krautcat.audio.converter",
+    "krautcat-seektable": "krautcat.audio.seektable",
+    "krautcat-dedupe": "krautcat.audio.library.dedupe",
+    "krautcat-mbdump": "krautcat.audio.musicbrainz.local",
+}
+
+# Only loaded by the commands that need them.
+LAZY_MODULES = ("gi", "mutagen", "puremagic", "psutil")
+# The splitter and dedupe work on PCM blocks, everything else starts without numpy.
+NUMPY_ENTRY_POINTS = ("krautcat-cuesplitter", "krautcat-dedupe")
+
+IMPORT_BUDGET_MS = 250
+RUNS = 3
+
+
+def _import(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import sys, {module}; print(' '.join(sorted(sys.modules)))"],
+                            env={"PYTHONPATH": str(LIB)}, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    # import time: self [us] | cumulative | imported package
+    for line in reversed(result.stderr.splitlines()):
+        fields = [f.strip() for f in line.split("|")]
+        if fields[-1] == module:
+            return set(result.stdout.split()), int(fields[1]) / 1000
+    raise AssertionError(f"no import time reported for '{module}'")
+
+
+@pytest.mark.parametrize("script", sorted(ENTRY_POINTS))
+def test_entry_point_imports(script):
+    module = ENTRY_POINTS[script]
+
+    modules, elapsed = _import(module)
+    for _ in range(RUNS - 1):
+        elapsed = min(elapsed, _import(module)[1])
+
+    lazy = LAZY_MODULES if script in NUMPY_ENTRY_POINTS else LAZY_MODULES + ("numpy",)
+    assert [m for m in lazy if m in modules] == []
+    assert elapsed < IMPORT_BUDGET_MS, f"{script} took {elapsed:.0f} ms to import"
+
+
+def test_entry_points_match_pyproject():
+    tomllib = pytest.importorskip("tomllib")
+
+    with (LIB.parent / "pyproject.toml").open("rb") as f:
+        scripts = tomllib.load(f)["project"]["scripts"]
+
+    assert {name: entry.split(":")[0] for name, entry in scripts.items()} == ENTRY_POINTS
@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+
+from krautcat.audio.library.fs import plan as plan_module
+from krautcat.audio.library.fs.journal import RenameJournal, plan_records, resume, undo
+from krautcat.audio.library.fs.plan import AlbumPlan, RenamePlan
+
+
+class Crash(Exception):
+    pass
+
+
+class LossyJournal(RenameJournal):
+    """Journal that loses every record written after the last sync."""
+
+    SYNC_INTERVAL = 10 ** 9
+    SYNC_SECONDS = 10 ** 9
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._buffer = list()
+
+    def _write(self, record):
+        self._buffer.append(json.dumps(record) + "\n")
+        self._unsynced += 1
+
+    def sync(self):
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer = list()
+        self._unsynced = 0
+
+    def close(self):
+        self._file.close()
+
+
+def _tree(root):
+    return sorted((os.path.relpath(os.path.join(directory, name), root),
+                   open(os.path.join(directory, name)).read())
+                  for directory, _, names in os.walk(root) for name in names)
+
+
+def _library(root):
+    albums = {"p/c": ["1", "2"], "p": ["1", "2", "3"], "q": ["1", "2"], "r": ["x"]}
+    for album, names in albums.items():
+        (root / album).mkdir(parents=True, exist_ok=True)
+        for name in names:
+            (root / album / f"{name}.flac").write_text(f"{album}:{name}")
+
+    return [AlbumPlan(root / "p" / "c", "C", {"1.flac": "01.flac", "2.flac": "02.flac"}),
+            AlbumPlan(root / "p", "P", {"1.flac": "2.flac", "2.flac": "3.flac",
+                                        "3.flac": "1.flac"}),
+            AlbumPlan(root / "q", None, {"1.flac": "2.flac", "2.flac": "1.flac"}),
+            AlbumPlan(root / "r", "R", {"x.flac": "y.flac"})]
+
+
+def _crash(monkeypatch, root, journal_path, crash_after):
+    apply = plan_module.RenameOperation.apply
+    applied = [0]
+
+    def _apply(self):
+        apply(self)
+        applied[0] += 1
+        if applied[0] == crash_after:
+            raise Crash()
+
+    monkeypatch.setattr(plan_module.RenameOperation, "apply", _apply)
+    journal = LossyJournal(journal_path)
+    try:
+        RenamePlan(_library(root)).execute(journal)
+    except Crash:
+        pass
+    journal.close()
+    monkeypatch.undo()
+
+
+def test_resume_never_run_swap(tmp_path):
+    album = tmp_path / "album"
+    album.mkdir()
+    (album / "01.flac").write_text("one")
+    (album / "02.flac").write_text("two")
+
+    plan = RenamePlan([AlbumPlan(album, None, {"01.flac": "02.flac", "02.flac": "01.flac"})])
+    journal_path = tmp_path / "plan.jsonl"
+    journal_path.write_text("".join(json.dumps(r) + "\n"
+                                    for r in plan_records(plan.operations())))
+
+    assert resume(journal_path) == []
+    assert _tree(album) == [("01.flac", "two"), ("02.flac", "one")]
+
+    assert undo(journal_path) == []
+    assert _tree(album) == [("01.flac", "one"), ("02.flac", "two")]
+
+
+@pytest.mark.parametrize("crash_after", range(1, 17))
+def test_resume_and_undo_after_crash(tmp_path, monkeypatch, crash_after):
+    expected_root = tmp_path / "expected"
+    RenamePlan(_library(expected_root)).execute()
+    original_root = tmp_path / "original"
+    _library(original_root)
+
+    root = tmp_path / "library"
+    journal_path = tmp_path / "journal.jsonl"
+    _crash(monkeypatch, root, journal_path, crash_after)
+
+    assert resume(journal_path) == []
+    assert _tree(root) == _tree(expected_root)
+
+    assert undo(journal_path) == []
+    assert _tree(root) == _tree(original_root)
+
+
+@pytest.mark.parametrize("crash_after", range(1, 17))
+def test_undo_after_crash_without_resume(tmp_path, monkeypatch, crash_after):
+    original_root = tmp_path / "original"
+    _library(original_root)
+
+    root = tmp_path / "library"
+    journal_path = tmp_path / "journal.jsonl"
+    _crash(monkeypatch, root, journal_path, crash_after)
+
+    before = _tree(root)
+    errors = undo(journal_path)
+    if errors:
+        # Refused, nothing was touched.
+        assert len(errors) == 1 and "resume the journal" in str(errors[0])
+        assert _tree(root) == before
+    else:
+        assert _tree(root) == _tree(original_root)
@@ -0,0 +1,133 @@
+import numpy
+import pytest
+
+from krautcat.audio.loudness import AlbumLoudness, LoudnessMeter, integrated_loudness
+
+
+RATE = 48000
+
+
+def _sine(dbfs, seconds, frequency=997.0, phase=0.0, channels=2, rate=RATE):
+    t = numpy.arange(int(seconds * rate)) / rate
+    signal = 10.0 ** (dbfs / 20.0) * numpy.sin(2.0 * numpy.pi * frequency * t + phase)
+    return numpy.repeat(signal[:, None], channels, axis=1)
+
+
+def _silence(seconds, channels=2):
+    return numpy.zeros((int(seconds * RATE), channels))
+
+
+def _measure(*parts, block=RATE):
+    samples = numpy.concatenate(parts)
+    meter = LoudnessMeter(RATE, samples.shape[1])
+    for i in range(0, len(samples), block):
+        meter.update(samples[i:i + block])
+    return meter
+
+
+@pytest.mark.parametrize("dbfs", [0.0, -23.0])
+def test_stereo_sine_reference_level(dbfs):
+    # BS.1770 calibration: a 997 Hz sine in both channels of a stereo
+    # stream reads as its level in dBFS.
+    meter = _measure(_sine(dbfs, 10.0))
+
+    assert integrated_loudness(meter.block_energies) == pytest.approx(dbfs, abs=0.1)
+
+
+def test_mono_sine_in_one_channel():
+    samples = _sine(0.0, 10.0)
+    samples[:, 1] = 0.0
+
+    meter = _measure(samples)
+
+    assert integrated_loudness(meter.block_energies) == pytest.approx(-3.01, abs=0.1)
+
+
+@pytest.mark.parametrize("rate", [44100, 48000])
+def test_rate_independent(rate):
+    meter = LoudnessMeter(rate, 2)
+    meter.update(_sine(-23.0, 10.0, rate=rate))
+
+    assert integrated_loudness(meter.block_energies) == pytest.approx(-23.0, abs=0.1)
+
+
+def test_block_size_independent():
+    samples = _sine(-18.0, 3.0, frequency=440.0)
+
+    whole = _measure(samples, block=len(samples))
+    chunked = _measure(samples, block=1000)
+
+    assert numpy.allclose(whole.block_energies, chunked.block_energies)
+    assert whole.peak == pytest.approx(chunked.peak)
+
+
+def test_true_peak_above_sample_peak():
+    # A quarter of the sample rate, 45 degrees off: every sample lands at
+    # 0.707 of the amplitude, the peaks fall between the samples.
+    samples = _sine(0.0, 1.0, frequency=RATE / 4, phase=numpy.pi / 4)
+    sample_peak = numpy.max(numpy.abs(samples))
+
+    meter = _measure(samples)
+
+    assert sample_peak == pytest.approx(0.5 ** 0.5)
+    assert meter.peak > sample_peak
+    assert meter.peak == pytest.approx(1.0, abs=0.02)
+
+
+def test_integer_samples_are_scaled():
+    samples = (_sine(-6.0, 2.0) * 32768).astype(numpy.int16)
+
+    meter = _measure(samples)
+
+    assert meter.peak == pytest.approx(10.0 ** (-6.0 / 20.0), abs=0.01)
+    assert integrated_loudness(meter.block_energies) == pytest.approx(-6.0, abs=0.1)
+
+
+def test_absolute_gate_drops_silence():
+    meter = _measure(_silence(10.0), _sine(-23.0, 10.0), _silence(20.0))
+
+    assert meter.frames == 40 * RATE
+    # Ungated, the silence would pull it down by 6 LU. Only the blocks
+    # overlapping the edges of the tone are partly silent.
+    ungated = -0.691 + 10.0 * numpy.log10(numpy.mean(meter.block_energies))
+    assert ungated < -28.0
+    assert integrated_loudness(meter.block_energies) == pytest.approx(-23.0, abs=0.2)
+
+
+def test_relative_gate_drops_quiet_parts():
+    # -45 dBFS is above the absolute gate, but more than 10 LU below the rest.
+    meter = _measure(_sine(-23.0, 10.0), _sine(-45.0, 10.0))
+
+    assert integrated_loudness(meter.block_energies) == pytest.approx(-23.0, abs=0.1)
+
+
+def test_quiet_parts_within_relative_gate_count():
+    meter = _measure(_sine(-20.0, 10.0), _sine(-26.0, 10.0))
+
+    loudness = integrated_loudness(meter.block_energies)
+    assert -26.0 < loudness < -20.0
+
+
+def test_silence_has_no_loudness():
+    meter = _measure(_silence(5.0))
+
+    assert integrated_loudness(meter.block_energies) is None
+    assert meter.peak == 0.0
+
+
+def test_short_input_has_no_blocks():
+    meter = _measure(_sine(-23.0, 0.3))
+
+    assert len(meter.block_energies) == 0
+    assert integrated_loudness(meter.block_energies) is None
+
+
+def test_album_loudness_gates_all_tracks_together():
+    loud = _measure(_sine(-20.0, 10.0)).result("loud")
+    quiet = _measure(_sine(-40.0, 10.0)).result("quiet")
+
+    album = AlbumLoudness([loud, quiet])
+
+    assert quiet.loudness == pytest.approx(-40.0, abs=0.1)
+    assert album.loudness == pytest.approx(-20.0, abs=0.1)
+    assert album.peak == loud.peak
@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import types
+
+import pytest
+
+from krautcat.audio.musicbrainz import cache as cache_module
+from krautcat.audio.musicbrainz.cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+def _keys(cache):
+    with sqlite3.connect(str(cache.path)) as connection:
+        return sorted(key for key, in connection.execute("SELECT key FROM responses"))
+
+
+def test_roundtrip(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+
+    assert cache.get("artist", {"query": "Can"}) is None
+    cache.put("artist", {"query": "Can"}, {"name": "Can", "score": 100})
+
+    assert cache.get("artist", {"query": "Can"}) == {"name": "Can", "score": 100}
+    assert cache.get("release", {"query": "Can"}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # Shared between processes through the file.
+    assert ResponseCache(cache.path).get("artist", {"query": "Can"})["name"] == "Can"
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60)
+    cache.put("artist", {"query": "Neu!"}, "fresh")
+
+    clock.now += 60
+    assert cache.get("artist", {"query": "Neu!"}) == "fresh"
+
+    clock.now += 1
+    assert cache.get("artist", {"query": "Neu!"}) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Reading doesn't extend the lifetime, writing again does.
+    cache.put("artist", {"query": "Neu!"}, "again")
+    clock.now += 30
+    assert cache.get("artist", {"query": "Neu!"}) == "again"
+
+
+def test_expired_entries_are_evicted(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(ResponseCache, "EVICT_INTERVAL", 3)
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60)
+
+    cache.put("artist", {"query": "old"}, 1)
+    clock.now += 100
+    cache.put("artist", {"query": "new"}, 2)
+    assert len(_keys(cache)) == 2
+
+    cache.put("artist", {"query": "newer"}, 3)
+    assert _keys(cache) == [ResponseCache.key("artist", {"query": q}) for q in ("new", "newer")]
+
+
+def test_least_recently_used_are_evicted(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(ResponseCache, "EVICT_INTERVAL", 4)
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_entries=3)
+
+    for query in ("a", "b", "c"):
+        clock.now += 1
+        cache.put("artist", {"query": query}, query)
+
+    clock.now += 1
+    assert cache.get("artist", {"query": "a"}) == "a"
+
+    clock.now += 1
+    cache.put("artist", {"query": "d"}, "d")
+
+    assert _keys(cache) == [ResponseCache.key("artist", {"query": q}) for q in "acd"]
+    assert cache.get("artist", {"query": "b"}) is None
+
+
+def test_counters_from_threads(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    cache.put("artist", {"query": "hit"}, True)
+    barrier = threading.Barrier(8)
+
+    def lookups():
+        barrier.wait()
+        for i in range(50):
+            cache.get("artist", {"query": "hit" if i % 2 else "miss"})
+        cache.close()
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (cache.hits, cache.misses) == (200, 200)
@@ -0,0 +1,164 @@
+import asyncio
+import http.server
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+import pytest
+
+from krautcat.audio.musicbrainz.client import MusicBrainzClient, MusicBrainzError, Transport
+
+
+class ScriptedTransport(Transport):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def get(self, url, headers):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+OK = (200, {}, b'{"releases": []}')
+
+
+def _get(transport, max_retries=3):
+    client = MusicBrainzClient(transport=transport, rate=1000.0, max_retries=max_retries,
+                               backoff=0.0)
+    return asyncio.run(client.get("release", {"query": "x"}))
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+@pytest.mark.parametrize("error", [
+    urllib.error.URLError("connection refused"),
+    ConnectionResetError(),
+    socket.timeout("timed out"),
+    asyncio.TimeoutError(),
+])
+def test_transport_errors_are_retried(error):
+    transport = ScriptedTransport(error, (503, {}, b""), OK)
+
+    assert _get(transport) == {"releases": []}
+    assert transport.calls == 3
+
+
+def test_transport_errors_give_up():
+    transport = ScriptedTransport(*[urllib.error.URLError("unreachable")] * 3)
+
+    with pytest.raises(MusicBrainzError, match="unreachable"):
+        _get(transport, max_retries=2)
+    assert transport.calls == 3
+
+
+def test_client_errors_are_not_retried():
+    transport = ScriptedTransport((404, {}, b""), OK)
+
+    with pytest.raises(MusicBrainzError) as e:
+        _get(transport)
+    assert e.value.status == 404
+    assert transport.calls == 1
+
+
+def test_other_exceptions_are_not_retried():
+    transport = ScriptedTransport(ValueError("bug"), OK)
+
+    with pytest.raises(ValueError):
+        _get(transport)
+    assert transport.calls == 1
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    """Local stand-in for the MusicBrainz web service."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.delay = delay
+        self.requests = list()
+        # (status, headers) for the next requests, 200 afterwards.
+        self.script = list()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/ws/2"
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests.append((time.monotonic(), self.path))
+            status, headers = server.script.pop(0) if server.script else (200, {})
+        time.sleep(server.delay)
+
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        body = json.dumps({"query": query["query"][0]}).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_identical_searches_share_one_request(server):
+    server.delay = 0.2
+    client = MusicBrainzClient(server.base_url, rate=1000.0)
+
+    async def _search():
+        return await asyncio.gather(*(client.search("release", "album") for _ in range(10)))
+
+    responses = asyncio.run(_search())
+
+    assert responses == [{"query": "album"}] * 10
+    assert len(server.requests) == 1
+    assert client.requests == 1
+
+
+def test_requests_are_spaced_by_rate(server):
+    client = MusicBrainzClient(server.base_url, rate=10.0)
+
+    async def _search():
+        return await asyncio.gather(*(client.search("release", f"album {i}") for i in range(4)))
+
+    asyncio.run(_search())
+
+    times = sorted(t for t, _ in server.requests)
+    assert len(times) == 4
+    assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+
+
+def test_retry_after_is_honoured(server):
+    server.script = [(503, {"Retry-After": "1"})]
+    client = MusicBrainzClient(server.base_url, rate=1000.0, backoff=0.01)
+
+    assert asyncio.run(client.search("release", "album")) == {"query": "album"}
+
+    (first, _), (second, _) = server.requests
+    assert second - first >= 0.95
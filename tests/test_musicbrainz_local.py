@@ -0,0 +1,195 @@
+import io
+import json
+import tarfile
+
+import pytest
+
+from krautcat.audio.musicbrainz import MusicBrainzAPI
+from krautcat.audio.musicbrainz.local import LocalIndex, LocalIndexError, main
+
+
+def _credit(*credits):
+    return [{"name": name, "joinphrase": join, "artist": {"name": name}}
+            for name, join in credits]
+
+
+def _json_lines(*objects):
+    return [json.dumps(obj).encode("utf-8") + b"\n" for obj in objects]
+
+
+def _tsv(directory, name, *rows):
+    with (directory / name).open("w", encoding="utf-8", newline="\n") as f:
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalIndex(tmp_path / "local.sqlite")
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def dump(tmp_path):
+    """TSV dump with the columns of the MusicBrainz database tables."""
+    directory = tmp_path / "mbdump"
+    directory.mkdir()
+    # id, gid, name, sort_name, ...
+    _tsv(directory, "artist",
+         ("1", "a-1", "Talking Heads", "Talking Heads"),
+         ("2", "a-2", "Brian Eno", "Eno, Brian"),
+         ("3", "a-3", "Tab\\tStop", "Tab\\tStop"))
+    # artist_credit, position, artist, name, join_phrase
+    _tsv(directory, "artist_credit_name",
+         ("10", "1", "2", "Eno", ""),
+         ("10", "0", "1", "Heads", " & "),
+         ("11", "0", "1", "Talking Heads", "\\N"),
+         ("12", "0", "3", "Tab\\tStop", ""))
+    # id, gid, name, artist_credit, ...
+    _tsv(directory, "release",
+         ("100", "r-100", "Remain in Light", "11", "1"),
+         ("101", "r-101", "My Life in the Bush of Ghosts", "10", "1"),
+         ("102", "r-102", "Line\\nBreak", "12", "1"),
+         ("103", "r-103", "Undated", "11", "1"))
+    # release, country, date_year, date_month, date_day
+    _tsv(directory, "release_country",
+         ("100", "222", "1981", "\\N", "\\N"),
+         ("100", "221", "1980", "10", "8"),
+         ("101", "222", "\\N", "\\N", "\\N"))
+    # release, date_year, date_month, date_day
+    _tsv(directory, "release_unknown_country",
+         ("100", "1985", "\\N", "\\N"),
+         ("101", "1981", "2", "\\N"))
+    # id, gid, name, artist_credit, type, ...
+    _tsv(directory, "release_group",
+         ("1000", "rg-1000", "Fear of Music", "11", "1"))
+    # id, release_count, first_release_date_year, ...
+    _tsv(directory, "release_group_meta", ("1000", "3", "1979", "8", "3"))
+    return directory
+
+
+def _releases(index, title):
+    return sorted((r["id"], r["title"], r["date"], credited_artist_name(r))
+                  for r in index.search_releases(title))
+
+
+def credited_artist_name(release):
+    return "".join(c["name"] for c in release["artist-credit"]) or None
+
+
+def test_import_json(index):
+    assert index.import_json("artist", _json_lines(
+        {"id": "a-1", "name": "The Talking Heads"},
+    )) == 1
+    assert index.import_json("release", _json_lines(
+        {"id": "r-1", "title": "Remain in Light", "date": "1980-10-08",
+         "artist-credit": _credit(("Talking Heads", ""))},
+        {"id": "r-2", "title": "Remain In Light", "date": "",
+         "artist-credit": _credit(("Talking Heads", " & "), ("Brian Eno", ""))},
+    )) == 2
+    assert index.import_json("release-group", _json_lines(
+        {"id": "rg-1", "title": "Remain in Light", "first-release-date": "1980-10-08",
+         "artist-credit": _credit(("Talking Heads", ""))},
+    )) == 1
+    assert index.import_json("label", _json_lines({"id": "l-1", "name": "Sire"})) == 0
+
+    assert index.search_artists("talking heads") == [{"id": "a-1", "name": "The Talking Heads"}]
+    assert _releases(index, "remain in light!") == [
+        ("r-1", "Remain in Light", "1980", "Talking Heads"),
+        ("r-2", "Remain In Light", "", "Talking Heads & Brian Eno"),
+        ("rg-1", "Remain in Light", "1980", "Talking Heads"),
+    ]
+
+
+def test_import_tsv(index, dump):
+    # 3 artists, 4 releases and 1 release group.
+    assert index.import_tsv(dump) == 8
+
+    # Credits are joined in position order with their join phrases, under the
+    # artists' canonical names.
+    assert _releases(index, "My Life in the Bush of Ghosts") == [
+        ("r-101", "My Life in the Bush of Ghosts", "1981", "Talking Heads & Brian Eno"),
+    ]
+    # The earliest year over both date tables.
+    assert _releases(index, "Remain in Light") == [
+        ("r-100", "Remain in Light", "1980", "Talking Heads"),
+    ]
+    assert _releases(index, "Undated") == [("r-103", "Undated", "", "Talking Heads")]
+    assert _releases(index, "Fear of Music") == [
+        ("rg-1000", "Fear of Music", "1979", "Talking Heads"),
+    ]
+    # Escaped tabs and newlines are restored.
+    assert _releases(index, "Line\nBreak") == [("r-102", "Line\nBreak", "", "Tab\tStop")]
+    assert index.search_artists("Tab\tStop") == [{"id": "a-3", "name": "Tab\tStop"}]
+
+
+def test_import_tsv_again_replaces(index, dump):
+    index.import_tsv(dump)
+
+    assert index.import_tsv(dump) == 8
+    assert len(index.search_releases("Remain in Light")) == 1
+
+
+def test_import_tsv_without_optional_tables(index, dump):
+    for name in ("release_country", "release_unknown_country", "release_group",
+                 "release_group_meta"):
+        (dump / name).unlink()
+
+    assert index.import_tsv(dump) == 7
+    assert _releases(index, "Remain in Light") == [
+        ("r-100", "Remain in Light", "", "Talking Heads"),
+    ]
+
+
+@pytest.mark.parametrize("name", LocalIndex.REQUIRED_TABLES)
+def test_import_tsv_missing_table(index, dump, name):
+    (dump / name).unlink()
+
+    with pytest.raises(LocalIndexError, match=name):
+        index.import_tsv(dump)
+    assert index.search_releases("Remain in Light") == []
+
+
+def test_import_dump_directory_and_archive(index, dump, tmp_path):
+    assert index.import_dump(dump.parent) == 8
+
+    archive_path = tmp_path / "release.tar.xz"
+    with tarfile.open(archive_path, "w:xz") as archive:
+        data = b"".join(_json_lines({"id": "r-9", "title": "Speaking in Tongues",
+                                     "date": "1983-06-01",
+                                     "artist-credit": _credit(("Talking Heads", ""))}))
+        member = tarfile.TarInfo("mbdump/release")
+        member.size = len(data)
+        archive.addfile(member, io.BytesIO(data))
+
+    assert index.import_dump(archive_path) == 1
+    assert _releases(index, "Speaking in Tongues") == [
+        ("r-9", "Speaking in Tongues", "1983", "Talking Heads"),
+    ]
+
+
+def test_mbdump_reports_wrong_directory(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["krautcat-mbdump", "--index", str(tmp_path / "i.sqlite"),
+                                     str(tmp_path)])
+
+    assert main() == 1
+    assert "isn't a MusicBrainz TSV dump" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("artist, album, date, expected", [
+    ("talking heads", "Remain in Light", "1980-10-08", "Talking Heads"),
+    ("Talking Heads", "Remain in Light", None, "Talking Heads"),
+    ("Talking Heads", "Remain in Light", "1999", None),
+    ("Talking Heads and Brian Eno", "My Life in the Bush of Ghosts", "1981",
+     "Talking Heads & Brian Eno"),
+    ("Talking Heads", "Fear of Music", "1979", "Talking Heads"),
+    ("Someone Else", "Remain in Light", None, None),
+    ("Talking Heads", "Unknown Album", None, None),
+])
+def test_offline_artist_of_album(index, dump, artist, album, date, expected):
+    index.import_tsv(dump)
+    api = MusicBrainzAPI(local_index=index, offline=True)
+
+    assert api.get_artist_of_album(artist, album, date) == expected
+    assert api.requests == 0
@@ -0,0 +1,117 @@
+import json
+import pathlib
+import urllib.parse
+
+import pytest
+
+from krautcat.audio.musicbrainz import (MusicBrainzAPI, ResponseCache, Transport,
+                                        credited_artist, score_release, similarity)
+
+
+FIXTURES = pathlib.Path(__file__).resolve().parent / "fixtures" / "musicbrainz"
+
+RESPONSES = {
+    'release:"Remain in Light" AND artist:"talking heads"': "releases_remain_in_light.json",
+    'release:"Die Mensch\\-Maschine" AND artist:"Kraftwerks"': "releases_empty.json",
+    'release:"Die Mensch\\-Maschine"': "releases_die_mensch_maschine.json",
+}
+
+
+def _fixture(name):
+    with (FIXTURES / name).open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureTransport(Transport):
+    def __init__(self):
+        self.queries = list()
+
+    async def get(self, url, headers):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)["query"][0]
+        self.queries.append(query)
+        name = RESPONSES.get(query, "releases_empty.json")
+        return 200, {}, (FIXTURES / name).read_bytes()
+
+
+@pytest.fixture
+def transport():
+    return FixtureTransport()
+
+
+@pytest.fixture
+def api(tmp_path, transport):
+    return MusicBrainzAPI(ResponseCache(tmp_path / "musicbrainz.sqlite"), transport=transport)
+
+
+def _best(api, fixture, album, artist, year, min_artist_similarity):
+    release = api._best_release(_fixture(fixture)["releases"], album, artist, year,
+                                min_artist_similarity)
+    return release["id"] if release is not None else None
+
+
+def test_credited_artist_joins_credits():
+    releases = _fixture("releases_remain_in_light.json")["releases"]
+
+    assert credited_artist(releases[2]) == "Talking Heads & Brian Eno"
+    assert credited_artist(_fixture("releases_die_mensch_maschine.json")["releases"][1]) is None
+
+
+def test_score_release():
+    original, reissue = _fixture("releases_remain_in_light.json")["releases"][4:2:-1]
+
+    assert score_release(original, "Remain in Light", "Talking Heads", "1980") == 2.5
+    assert score_release(reissue, "Remain in Light", "Talking Heads", "1980") == 2.0
+    assert score_release(original, "Remain in Light", "Talking Heads", None) == 2.0
+    assert score_release({"title": "Remain in Light"}, "Remain in Light", "X", None) == 1.5
+
+
+@pytest.mark.parametrize("year, min_artist_similarity, expected", [
+    # The year match outranks the collaboration and filters the reissue.
+    ("1980", MusicBrainzAPI.MIN_ARTIST_SIMILARITY, "original"),
+    # Equal local scores fall back to the MusicBrainz search score.
+    (None, MusicBrainzAPI.MIN_ARTIST_SIMILARITY, "reissue"),
+    ("2005", MusicBrainzAPI.MIN_ARTIST_SIMILARITY, "reissue"),
+    ("1999", MusicBrainzAPI.MIN_ARTIST_SIMILARITY, None),
+])
+def test_best_release_combined(api, year, min_artist_similarity, expected):
+    assert _best(api, "releases_remain_in_light.json", "Remain in Light", "Talking Heads",
+                 year, min_artist_similarity) == expected
+
+
+def test_best_release_artist_threshold(api):
+    releases = [r for r in _fixture("releases_remain_in_light.json")["releases"]
+                if r["id"] == "collaboration"]
+
+    assert similarity(credited_artist(releases[0]), "Talking Heads") < 0.75
+    assert api._best_release(releases, "Remain in Light", "Talking Heads", None,
+                             MusicBrainzAPI.MIN_ARTIST_SIMILARITY)["id"] == "collaboration"
+    assert api._best_release(releases, "Remain in Light", "Talking Heads", None,
+                             MusicBrainzAPI.MIN_ARTIST_SIMILARITY_FALLBACK) is None
+
+
+def test_best_release_title_only(api):
+    assert _best(api, "releases_die_mensch_maschine.json", "Die Mensch-Maschine", "Kraftwerks",
+                 None, MusicBrainzAPI.MIN_ARTIST_SIMILARITY_FALLBACK) == "kraftwerk"
+
+
+def test_artist_of_album_single_query(api, transport):
+    artist = api.get_artist_of_album("talking heads", "Remain in Light", "1980-10-08", cache=True)
+
+    assert artist == "Talking Heads"
+    assert transport.queries == ['release:"Remain in Light" AND artist:"talking heads"']
+
+    # Resolved artists are cached, the second lookup is free.
+    assert api.get_artist_of_album("talking heads", "Remain in Light", "1980-10-08",
+                                   cache=True) == "Talking Heads"
+    assert api.requests == 1
+
+
+def test_artist_of_album_falls_back_to_title(api, transport):
+    assert api.get_artist_of_album("Kraftwerks", "Die Mensch-Maschine") == "Kraftwerk"
+    assert transport.queries == ['release:"Die Mensch\\-Maschine" AND artist:"Kraftwerks"',
+                                 'release:"Die Mensch\\-Maschine"']
+
+
+def test_artist_of_album_not_found(api, transport):
+    assert api.get_artist_of_album("Nobody", "Nothing", "0") is None
+    assert len(transport.queries) == 2
@@ -0,0 +1,200 @@
+import struct
+
+import pytest
+
+from krautcat.audio.file.audio.flac import (AudioFileFLAC, FLACFrame, SEEKPOINT_SIZE,
+                                            _crc8, scan_frames)
+from krautcat.audio.seektable import (_max_gap, _thin_seekpoints, process_file,
+                                      select_seekpoints)
+
+
+BLOCKSIZE = 4096
+RATE = 44100
+
+
+def _header(number, *, variable=False, blocksize=BLOCKSIZE):
+    # Sync code, block size (4096 or 16 bit "size - 1" at the end of the header),
+    # 44.1 kHz, stereo, 16 bit, UTF-8 coded frame or sample number, CRC-8.
+    if variable:
+        header = b"\xff\xf9" + bytes([0x79, 0x18]) + chr(number).encode("utf-8")
+        header += (blocksize - 1).to_bytes(2, "big")
+    else:
+        header = b"\xff\xf8" + bytes([0xC9, 0x18]) + chr(number).encode("utf-8")
+    return header + bytes([_crc8(header)])
+
+
+def _flac(path, frames, *, padding=0, body=b"\x00\x55" * 50):
+    # STREAMINFO with a fixed 4096 sample block size, an optional PADDING
+    # block and frames with valid headers. The frame bodies are junk.
+    info = struct.pack(">HH", BLOCKSIZE, BLOCKSIZE) + b"\0" * 6
+    info += ((RATE << 44) | (1 << 41) | (15 << 36) | frames * BLOCKSIZE).to_bytes(8, "big")
+    info += b"\0" * 16
+
+    data = b"fLaC" + bytes([0x00 if padding else 0x80]) + len(info).to_bytes(3, "big") + info
+    if padding:
+        data += bytes([0x81]) + padding.to_bytes(3, "big") + b"\0" * padding
+
+    audio_offset = len(data)
+    offsets = list()
+    for number in range(frames):
+        offsets.append(len(data) - audio_offset)
+        data += _header(number) + body
+    path.write_bytes(data)
+
+    return offsets
+
+
+def test_crc8():
+    # CRC-8 (polynomial 0x07) check value.
+    assert _crc8(b"123456789") == 0xF4
+
+
+def test_scan_frames(tmp_path):
+    # 200 frames, so the frame numbers past 127 take two UTF-8 bytes.
+    offsets = _flac(tmp_path / "a.flac", 200)
+
+    frames = list(scan_frames(tmp_path / "a.flac", BLOCKSIZE))
+
+    assert frames == [FLACFrame(i * BLOCKSIZE, offset, BLOCKSIZE)
+                      for i, offset in enumerate(offsets)]
+
+
+def test_scan_frames_skips_false_sync_codes(tmp_path):
+    # A sync code with a broken CRC and a valid header of a frame out of
+    # order inside the frame bodies.
+    body = b"\xff\xf8\xc9\x18\x00\x00" + _header(42) + b"\x00" * 32
+    offsets = _flac(tmp_path / "a.flac", 5, body=body)
+
+    frames = list(scan_frames(tmp_path / "a.flac", BLOCKSIZE))
+
+    assert [f.byte_offset for f in frames] == offsets
+
+
+def test_scan_frames_variable_blocksize(tmp_path):
+    path = tmp_path / "a.flac"
+    _flac(path, 0)
+    sizes = [1000, 4096, 300]
+    with path.open("ab") as f:
+        sample = 0
+        for size in sizes:
+            f.write(_header(sample, variable=True, blocksize=size) + b"\x00" * 20)
+            sample += size
+
+    frames = list(scan_frames(path, BLOCKSIZE))
+
+    assert [(f.first_sample, f.num_samples) for f in frames] == [(0, 1000), (1000, 4096),
+                                                                 (5096, 300)]
+
+
+def test_scan_frames_rejects_other_streams(tmp_path):
+    (tmp_path / "a.flac").write_bytes(b"RIFF" + b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        list(scan_frames(tmp_path / "a.flac", BLOCKSIZE))
+
+
+def _frames(count):
+    return [FLACFrame(i * BLOCKSIZE, i * 100, BLOCKSIZE) for i in range(count)]
+
+
+def test_select_seekpoints():
+    # Ten seconds are 107.7 frames, so every 107th frame becomes a seekpoint.
+    seekpoints = select_seekpoints(_frames(400), RATE, 10.0)
+
+    assert [p.first_sample // BLOCKSIZE for p in seekpoints] == [0, 107, 214, 321]
+    assert _max_gap(seekpoints, RATE, 400 * BLOCKSIZE) <= 10.0
+
+
+def test_select_seekpoints_covers_the_end():
+    # Frame 107 starts within ten seconds, but ends past them.
+    seekpoints = select_seekpoints(_frames(108), RATE, 10.0)
+
+    assert [p.first_sample // BLOCKSIZE for p in seekpoints] == [0, 107]
+    assert select_seekpoints(_frames(107), RATE, 10.0) == [_frames(1)[0]]
+    assert select_seekpoints([], RATE, 10.0) == []
+
+
+def test_thin_seekpoints():
+    seekpoints = _frames(10)
+
+    assert _thin_seekpoints(seekpoints, 10) == seekpoints
+    assert _thin_seekpoints(seekpoints, 20) == seekpoints
+    assert _thin_seekpoints(seekpoints, 4) == [seekpoints[i] for i in (0, 2, 5, 7)]
+    assert _thin_seekpoints(seekpoints, 1) == [seekpoints[0]]
+
+
+def test_max_gap():
+    seekpoints = [FLACFrame(0, 0, 1), FLACFrame(RATE * 3, 0, 1)]
+
+    assert _max_gap(seekpoints, RATE, RATE * 10) == 7.0
+    assert _max_gap([], RATE, RATE * 10) == 10.0
+
+
+def _rebuild(path, **kwargs):
+    return process_file(path, kwargs.pop("density", 10.0), True,
+                        kwargs.pop("allow_rewrite", False), 0)
+
+
+def test_rebuild_into_padding(tmp_path):
+    path = tmp_path / "a.flac"
+    offsets = _flac(path, 400, padding=1024)
+
+    report = _rebuild(path)
+
+    assert report.error is None and report.rebuilt
+    assert report.seekpoints_before == 0 and report.max_gap_before > 10.0
+    assert report.seekpoints_after == 4 and report.max_gap_after <= 10.0
+
+    seektable = AudioFileFLAC(path, open=False).load_seektable()
+    assert [p.byte_offset for p in seektable] == [offsets[i] for i in (0, 107, 214, 321)]
+    # The frames didn't move, the seektable took some of the padding.
+    assert list(scan_frames(path, BLOCKSIZE))[107].byte_offset == offsets[107]
+
+
+def test_rebuild_thins_to_padding(tmp_path):
+    path = tmp_path / "a.flac"
+    # Mutagen keeps an empty padding block, the seektable gets the rest.
+    _flac(path, 400, padding=SEEKPOINT_SIZE * 3 + 4)
+    size = path.stat().st_size
+
+    report = _rebuild(path, density=1.0)
+
+    assert report.rebuilt and report.seekpoints_after == 3
+    assert len(AudioFileFLAC(path, open=False).load_seektable()) == 3
+    assert path.stat().st_size == size
+
+
+def test_rebuild_without_padding_is_reported(tmp_path):
+    path = tmp_path / "a.flac"
+    _flac(path, 400)
+    before = path.read_bytes()
+
+    report = _rebuild(path)
+
+    assert report.error is None and not report.rebuilt
+    assert "--allow-rewrite" in report.skipped
+    assert "not rebuilt" in str(report)
+    assert path.read_bytes() == before
+
+
+def test_rebuild_with_rewrite(tmp_path):
+    path = tmp_path / "a.flac"
+    _flac(path, 400)
+
+    report = _rebuild(path, allow_rewrite=True)
+
+    assert report.rebuilt and report.seekpoints_after == 4
+    assert len(list(scan_frames(path, BLOCKSIZE))) == 400
+
+
+def test_dense_seektable_is_kept(tmp_path):
+    path = tmp_path / "a.flac"
+    _flac(path, 400, padding=1024)
+    _rebuild(path)
+    after = path.read_bytes()
+
+    report = _rebuild(path)
+
+    assert not report.rebuilt and report.skipped is None
+    assert report.seekpoints_before == 4
+    assert path.read_bytes() == after
@@ -0,0 +1,143 @@
+import json
+import pathlib
+import subprocess
+import sys
+import types
+
+import pytest
+
+from krautcat.audio.library import tagger
+from krautcat.audio.metadata import Metadata
+from krautcat.audio.metadata.types import Date
+
+
+LIB = pathlib.Path(__file__).resolve().parent.parent / "lib"
+
+
+def _tagger(*args):
+    return subprocess.run([sys.executable, "-c",
+                           "import sys; from krautcat.audio.library.tagger import main; "
+                           "sys.exit(main())", *args],
+                          env={"PYTHONPATH": str(LIB)}, capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("args", [
+    ["canonicalize-artist-name", "--offline"],
+    ["transform", "-a", "capitalize,canonicalize-artist", "--offline"],
+])
+def test_offline_without_index(tmp_path, args):
+    result = _tagger(*args, str(tmp_path))
+
+    assert result.returncode != 0
+    assert "--musicbrainz-index" in result.stderr
+    assert "Traceback" not in result.stderr
+
+
+def test_offline_transform_without_musicbrainz(tmp_path):
+    result = _tagger("transform", "-a", "capitalize", "--offline", str(tmp_path))
+
+    assert result.returncode == 0, result.stderr
+
+
+class StubFile:
+    """Taggable file whose tags come from TAGS instead of the file itself."""
+
+    TAGS = dict()
+    parsed = list()
+    saved = list()
+
+    def __init__(self, path):
+        StubFile.parsed.append(path.name)
+        self.path = path
+        self.metadata = Metadata(**self.TAGS[path.name])
+
+    def save_tags(self):
+        StubFile.saved.append((self.path.name, self.metadata.artist, self.metadata.track_name,
+                               self.metadata.date))
+
+
+class StubMusicBrainz:
+    def __init__(self):
+        self.lookups = list()
+
+    def get_artist_of_album(self, artist, album, year, *, cache=False):
+        self.lookups.append((artist, album, year))
+        return artist.upper() if album != "Unknown" else None
+
+
+@pytest.fixture
+def album(tmp_path, monkeypatch):
+    StubFile.TAGS = {
+        "01.flac": dict(artist="talking heads", album="Remain in Light", date=Date("1980-10-08"),
+                        track_number=1, track_name="born under punches"),
+        "02.flac": dict(artist="talking heads", album="Remain in Light", date=Date("1980-10-08"),
+                        track_number=2, track_name="crosseyed and painless"),
+        "03.flac": dict(artist="Other", album="Unknown", date=Date("1999"),
+                        track_number=1, track_name="Already Fine"),
+    }
+    StubFile.parsed = list()
+    StubFile.saved = list()
+
+    (tmp_path / "cd2").mkdir()
+    for name in StubFile.TAGS:
+        (tmp_path / (name if name != "03.flac" else "cd2/03.flac")).write_bytes(b"x")
+    (tmp_path / "cover.jpg").write_bytes(b"x")
+    (tmp_path / "empty.flac").write_bytes(b"")
+
+    monkeypatch.setattr(tagger, "file_class",
+                        lambda entry: StubFile if entry.suffix == ".flac" else None)
+    api = StubMusicBrainz()
+    monkeypatch.setattr(tagger, "musicbrainz_api", lambda command_config: api)
+    return tmp_path
+
+
+def _config(*transforms, dry_run=False):
+    return types.SimpleNamespace(command_config=types.SimpleNamespace(
+        transforms=list(transforms), dry_run=dry_run, musicbrainz_index=None, offline=False))
+
+
+def test_transform_parses_every_file_once(album):
+    tagger.TransformWorker(_config("capitalize", "date-to-year", "canonicalize-artist"))(album)
+
+    assert sorted(StubFile.parsed) == ["01.flac", "02.flac", "03.flac"]
+
+
+@pytest.mark.parametrize("transforms, artist", [
+    (("canonicalize-artist", "capitalize"), "Talking Heads"),
+    (("capitalize", "canonicalize-artist"), "TALKING HEADS"),
+])
+def test_transforms_run_in_order(album, transforms, artist):
+    tagger.TransformWorker(_config(*transforms))(album)
+
+    assert [(name, a) for name, a, _, _ in StubFile.saved] == [("01.flac", artist),
+                                                               ("02.flac", artist)]
+
+
+def test_unchanged_files_are_not_saved(album):
+    tagger.TransformWorker(_config("capitalize"))(album)
+
+    # "Other" and "Already Fine" are capitalized already.
+    assert sorted(StubFile.saved) == [
+        ("01.flac", "Talking Heads", "Born Under Punches", StubFile.saved[0][3]),
+        ("02.flac", "Talking Heads", "Crosseyed And Painless", StubFile.saved[1][3]),
+    ]
+
+
+def test_transform_dry_run_reports_changes(album, capsys):
+    tagger.TransformWorker(_config("date-to-year", "canonicalize-artist", dry_run=True))(album)
+
+    assert StubFile.saved == []
+    reports = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    changes = {"artist": ["talking heads", "TALKING HEADS"],
+               "date": [str(Date("1980-10-08")), "1980"]}
+    # 03.flac has only a year and no MusicBrainz match, so nothing changes.
+    assert reports == [{"file": str(album / "01.flac"), "changes": changes},
+                       {"file": str(album / "02.flac"), "changes": changes}]
+
+
+def test_canonicalize_worker_uses_the_transform(album, capsys):
+    tagger.CanonicalizeArtistNameWorker(_config())(album)
+
+    assert [(name, artist) for name, artist, _, _ in StubFile.saved] == [
+        ("01.flac", "TALKING HEADS"), ("02.flac", "TALKING HEADS")]
+    assert "Renamed artist 'talking heads' to 'TALKING HEADS' in 2 file(s)" in capsys.readouterr().out
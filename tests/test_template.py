@@ -0,0 +1,81 @@
+import pytest
+
+from krautcat.audio.library.fs.template import FIELDS, Template, TemplateError
+from krautcat.audio.metadata import Metadata
+from krautcat.audio.metadata.types import Date
+
+
+FILENAME = "[{disc_number}. ]{track_number:0>02}. {track_name}"
+
+
+@pytest.mark.parametrize("values, expected", [
+    ({"disc_number": 2, "track_number": 3, "track_name": "Intro"}, "2. 03. Intro"),
+    ({"disc_number": None, "track_number": 3, "track_name": "Intro"}, "03. Intro"),
+])
+def test_optional_section(values, expected):
+    assert Template(FILENAME).render(values) == expected
+
+
+def test_optional_section_needs_every_field():
+    template = Template("{album}[ ({year}, {artist})]")
+
+    assert template.render({"album": "A", "year": 1999, "artist": "B"}) == "A (1999, B)"
+    assert template.render({"album": "A", "year": None, "artist": "B"}) == "A"
+    assert template.render({"album": "A", "year": 1999, "artist": None}) == "A"
+
+
+def test_optional_section_without_fields_is_literal():
+    assert Template("[bonus] {track_name}").render({"track_name": "x"}) == "bonus x"
+
+
+def test_bracket_escapes():
+    template = Template("[[{year}]] {album}[ [[{artist}]]]")
+
+    assert template.render({"year": 1999, "album": "A", "artist": "B"}) == "[1999] A [B]"
+    assert template.render({"year": 1999, "album": "A", "artist": None}) == "[1999] A"
+
+
+@pytest.mark.parametrize("source, message", [
+    ("{artist} {label}", "unknown field 'label'"),
+    ("{}", "must be named"),
+    ("{0}", "must be named"),
+    ("[{artist}", "unterminated optional section"),
+    ("{artist}]", "unbalanced ']'"),
+    ("[[{artist}] [{album}]]]", "unbalanced ']'"),
+    ("[{artist} [{album}]]", "can't be nested"),
+    ("{artist:{width}}", "nested fields"),
+    ("{artist!x}", "unknown conversion"),
+    ("{artist", "Invalid template"),
+])
+def test_invalid_templates(source, message):
+    with pytest.raises(TemplateError) as e:
+        Template(source, FIELDS)
+    assert message in str(e.value)
+
+
+def test_missing_value():
+    with pytest.raises(TemplateError, match="no value for field 'track_name'"):
+        Template(FILENAME).render({"disc_number": None, "track_number": 1})
+
+
+def test_fields_outside_the_allowed_set_are_accepted_without_it():
+    assert Template("{custom}").render({"custom": "x"}) == "x"
+
+
+def test_escape_applies_to_strings_only():
+    template = Template("{track_number:0>02}. {track_name}")
+
+    rendered = template.render({"track_number": 7, "track_name": "a/b"},
+                               escape=lambda s: s.replace("/", "_"))
+    assert rendered == "07. a_b"
+
+
+def test_render_metadata():
+    metadata = Metadata(artist="Artist", album="Album", date=Date("1999-01-02"),
+                        track_number=1, track_name="Song")
+
+    assert Template("{artist} — {year} — {album}").render_metadata(metadata) == \
+        "Artist — 1999 — Album"
+    assert Template(FILENAME).render_metadata(metadata) == "01. Song"
+    assert Template("[{year}/]{album}").render_metadata(Metadata(album="Album")) == "Album"
+    assert Template("{album}/{n}").render_metadata(metadata, n=3) == "Album/3"
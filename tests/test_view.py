@@ -0,0 +1,153 @@
+import json
+import os
+
+import pytest
+
+from krautcat.audio.library.fs.view import LibraryView, ViewError, ViewLink
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "library"
+    for name in ("a/01.flac", "a/02.flac", "b/01.flac", "c/01.flac"):
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(name)
+    return root
+
+
+def _links(library, layout):
+    links = list()
+    for path, source in layout.items():
+        source = library / source
+        links.append(ViewLink(path, source, source.stat().st_ino))
+    return links
+
+
+LAYOUT = {
+    "Artist/Album/01.flac": "a/01.flac",
+    "Artist/Album/02.flac": "a/02.flac",
+    "Other/01.flac": "b/01.flac",
+}
+
+
+def _tree(root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root)
+                  for directory, _, names in os.walk(root) for name in names
+                  if name != LibraryView.MANIFEST_NAME)
+
+
+@pytest.mark.parametrize("symlink", [False, True])
+def test_build(tmp_path, library, symlink):
+    view = LibraryView(tmp_path / "view", symlink=symlink)
+
+    result = view.update(_links(library, LAYOUT))
+
+    assert (result.created, result.removed, result.unchanged) == (3, 0, 0)
+    assert result.errors == [] and result.conflicts == []
+    assert _tree(view.root) == sorted(LAYOUT)
+    for path, source in LAYOUT.items():
+        assert (view.root / path).read_text() == source
+        assert (view.root / path).is_symlink() == symlink
+    manifest = json.loads(view.manifest_path.read_text())
+    assert manifest["mode"] == view.mode and sorted(manifest["links"]) == sorted(LAYOUT)
+
+
+def test_rebuild_without_changes(tmp_path, library):
+    view = LibraryView(tmp_path / "view")
+    view.update(_links(library, LAYOUT))
+    manifest_mtime = view.manifest_path.stat().st_mtime_ns
+
+    result = view.update(_links(library, LAYOUT))
+
+    assert (result.created, result.removed, result.unchanged) == (0, 0, 3)
+    assert view.manifest_path.stat().st_mtime_ns == manifest_mtime
+
+
+def test_relink_and_remove(tmp_path, library):
+    view = LibraryView(tmp_path / "view")
+    view.update(_links(library, LAYOUT))
+
+    layout = {"Artist/Album/01.flac": "c/01.flac", "Artist/Album/02.flac": "a/02.flac"}
+    result = view.update(_links(library, layout))
+
+    assert (result.created, result.removed, result.unchanged) == (1, 2, 1)
+    assert _tree(view.root) == sorted(layout)
+    assert (view.root / "Artist/Album/01.flac").read_text() == "c/01.flac"
+    # Directories left empty are pruned.
+    assert not (view.root / "Other").exists()
+
+
+@pytest.mark.parametrize("symlink", [False, True])
+def test_mode_switch(tmp_path, library, symlink):
+    LibraryView(tmp_path / "view", symlink=symlink).update(_links(library, LAYOUT))
+
+    view = LibraryView(tmp_path / "view", symlink=not symlink)
+    result = view.update(_links(library, LAYOUT))
+
+    assert (result.created, result.unchanged) == (3, 0)
+    assert result.errors == []
+    for path in LAYOUT:
+        assert (view.root / path).is_symlink() == (not symlink)
+
+
+def test_foreign_files_are_left_alone(tmp_path, library):
+    view = LibraryView(tmp_path / "view")
+    (view.root / "Other").mkdir(parents=True)
+    (view.root / "Other" / "01.flac").write_text("mine")
+
+    result = view.update(_links(library, LAYOUT))
+
+    assert result.created == 2
+    assert [str(e) for e in result.errors] == [
+        f"'{view.root / 'Other' / '01.flac'}' already exists and isn't part of the view"]
+    assert "Other/01.flac" not in json.loads(view.manifest_path.read_text())["links"]
+
+    view.update(_links(library, {}))
+    assert _tree(view.root) == ["Other/01.flac"]
+    assert (view.root / "Other" / "01.flac").read_text() == "mine"
+
+
+def test_duplicate_paths_conflict(tmp_path, library):
+    view = LibraryView(tmp_path / "view")
+
+    result = view.update(_links(library, LAYOUT) + _links(library, {"Other/01.flac": "c/01.flac"}))
+
+    assert [c.source for c in result.conflicts] == [library / "c/01.flac"]
+    assert (view.root / "Other/01.flac").read_text() == "b/01.flac"
+
+
+def test_failed_unlink_stays_in_manifest(tmp_path, library, monkeypatch):
+    view = LibraryView(tmp_path / "view")
+    view.update(_links(library, LAYOUT))
+    stuck = str(view.root / "Other" / "01.flac")
+
+    unlink = os.unlink
+
+    def _unlink(path, *args, **kwargs):
+        if str(path) == stuck:
+            raise PermissionError(1, "Operation not permitted", path)
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "unlink", _unlink)
+    layout = {k: v for k, v in LAYOUT.items() if k != "Other/01.flac"}
+    result = view.update(_links(library, layout))
+
+    assert result.removed == 0
+    assert len(result.errors) == 1 and "Failed to remove" in str(result.errors[0])
+    assert "Other/01.flac" in json.loads(view.manifest_path.read_text())["links"]
+
+    # Once the link can be removed, the next update cleans it up.
+    monkeypatch.undo()
+    result = view.update(_links(library, layout))
+
+    assert (result.removed, result.errors) == (1, [])
+    assert _tree(view.root) == sorted(layout)
+
+
+def test_broken_manifest(tmp_path):
+    view = LibraryView(tmp_path / "view")
+    view.root.mkdir()
+    view.manifest_path.write_text("{")
+
+    with pytest.raises(ViewError, match="Broken view manifest"):
+        view.update([])